@@ -11,12 +11,19 @@ import matplotlib  # plotting data on graphs
 import matplotlib.pyplot
 import matplotlib.ticker as ticker  # turn off Y offset mode
 import datetime    # current date & time
-import adi         # Pyadi-iio interface to AD7124 ADC
 import numpy as np # array manipulations
-from struct import unpack  # extract words from packed binary buffer
+from adcdecode import decodeChannels  # typed NumPy view of packed binary buffer
+from adcdevice import initADC, reconfigADC, parseChannels  # AD7124 setup through Pyadi-iio
+from adcrecord import csvHeader, gapLine, readBlocks  # recorded file layout, broker stream blocks
+from adctiming import ArrivalClock  # real sample rate, lost buffers, from arrival times
+from adcstats import StageTimes  # per-stage latency, p50/p99/max
+from adcbroker import subscribe  # shared ADC: data from adcbroker.py instead of our own rx()
 import math        # for constant 'e'
 import queue         # transfer ADC data between threads
 import threading     # producer and consumer threads
+from adcplot import BlitPlot, Envelope  # fast sweep-graph renderer, min/max display decimation
+from adcacq import AcqThread, PacketQueue, DROP_OLDEST, BLOCK  # acquisition thread, bounded packet queue
+from adcproc import AcqProcess, DROP_NEWEST, OVERRUNS, BLOCKED, BLOCKED_NS, RECORDED, GAPS, LOST, STALLS, RATE_MSPS  # acquisition in a child process
 import time          # for time.sleep()
 import logging       # thread-safe log info
 
@@ -29,45 +36,23 @@ matplotlib.use('Qt5Agg')   # connect matplotlib to PyQt5
 # ----------------------------------------------------
 # Configure Program Settings
 
-version = "ADC Plot v0.22  (8-Nov-2022)"   # this particular code version number
+version = "ADC Plot v0.27  (17-Oct-2026)"   # this particular code version number
 
 
 aqTime = 1.0      # duration of 1 dataset, in seconds
 rate = 10000         # readings per second
 R = 10             # decimation ratio: points averaged together before saving
 samples = int(aqTime * rate) # record this many points at one time
-
-# ----------------------------------------------------
-# set up ADC chip through Pyadi-iio system
-
-def initADC(rate, samples, adc1_ip):
-
-    try:
-        adc1 = adi.ad7124(uri=adc1_ip)
-    except Exception as e:
-        print("Attempt to open '%s' had error: " % adc1_ip,end="")
-        print(e)
-        adc1 = None
-
-    if (adc1 is not None):
-        #phy = adc1.ctx.find_device("ad7124-8")
-        ad_channel = 0
-        sc = adc1.scale_available
-        adc1.channel[ad_channel].scale = sc[-1]  # get highest range
-        scale = adc1.channel[ad_channel].scale
-        adc1.sample_rate = rate  # sets sample rate for all channels
-        adc1.rx_buffer_size = samples
-        adc1.rx_enabled_channels = [ad_channel]
-        adc1._ctx.set_timeout(1000000)  # in what units is this?
-
-    #addr = 0x19  # CONFIG_0 register
-    #reg = phy.reg_read(addr)  # read reguster
-    #print("Before: {0:02x}: {1:02x}".format(addr, reg))
-    #phy.reg_write(addr, 0x810)  # write to register
-    #reg = phy.reg_read(addr)  # read it back
-    #print("After: {0:02x}: {1:02x}".format(addr, reg))
-
-    return adc1
+channels = [0]     # ADC input channels to acquire (interleaved in each buffer)
+blitPlot = True    # redraw only the changing artists (adcplot.py); False: full redraw each packet
+maxFPS = 20        # most graph redraws per second; packets arriving faster are merged into one frame
+plotColumns = 1000 # display columns across the graph: each shows the min/max of its points
+qDepth = 10        # most ADC packets waiting for the GUI before dropping (or blocking, when recording)
+procMode = False   # -p: acquire and record in a child process, packets come back through shared memory
+procSlots = 16     # -p: most packets waiting in the shared-memory ring
+procPolicy = DROP_NEWEST  # -p: ring full: skip displaying the packet (BLOCK: make the child wait)
+kernelBuffers = 8  # IIO buffers queued in the kernel: rides out longer GUI stalls (bench-iio.py to tune)
+prefetch = 2       # buffers read ahead by a thread while this one is plotted (0: read on demand)
 
 # ----------------------------------------------------
 # calculate temp in deg.C from ADC reading of thermistor
@@ -114,23 +99,54 @@ class MainWindow(QtWidgets.QMainWindow):
         self.bStart = 0                      # location of start of this packet on graph (batch)
         self.bEnd = int(self.samples / R)         # location of end of this packet
         self.R = R                           # decimation ratio (samples to average)
+        self.channels = channels             # ADC input channels in each packet
+        self.nChan = len(channels)           # number of interleaved channels
 
         self.adc1_ip = adc1_ip               # local LAN RPi with attached ADC
 
-        self.adc1 = initADC(self.rate, self.samples, self.adc1_ip)  # initialize ADC with configuration
-        if (self.adc1 is None):
-            print("Error: unable to connect to ADC %s" % self.adc1_ip)
-            self.close()
-            sys.exit()                       # leave entire program
+        self.proc = None                     # child acquisition process (-p), else a thread here
+        self.broker = None                   # block stream from adcbroker.py (unix:<socket>)
+        if (self.adc1_ip.startswith("unix:")):   # another process owns the ADC: subscribe to it
+            try:
+                self.broker = readBlocks(subscribe(self.adc1_ip[5:], "plot", qDepth))
+                hdr, _ = next(self.broker)   # first block tells us the stream's layout
+            except (OSError, StopIteration) as e:
+                print("Error: unable to subscribe to broker %s: %s" % (self.adc1_ip, e))
+                sys.exit()                       # leave entire program
+            self.rate = hdr['rate']
+            self.samples = hdr['samples']
+            self.aqTime = self.samples / self.rate
+            self.channels = hdr['channels']
+            self.nChan = len(self.channels)
+            if (self.samples % self.R != 0):
+                self.R = 1                   # decimation ratio must divide sample count evenly
+            self.bEnd = int(self.samples / self.R)
+        elif (procMode):   # the child opens the ADC, records, and fills a shared-memory ring
+            self.proc = AcqProcess(self.adc1_ip, self.rate, self.samples, self.channels,
+                                   nSlots=procSlots, policy=procPolicy,
+                                   kernelBuffers=kernelBuffers, prefetch=prefetch)
+        else:
+            self.adc1 = initADC(self.rate, self.samples, self.adc1_ip, self.channels,
+                                kernelBuffers, prefetch)  # initialize ADC with configuration
+            if (self.adc1 is None):
+                print("Error: unable to connect to ADC %s" % self.adc1_ip)
+                self.close()
+                sys.exit()                       # leave entire program
 
         self.c = Communicate()               # to get the custom gotData signal
         self.c.gotData.connect(self.update_plot)  # call update_plot whenever data arrives
 
-        self.q = queue.Queue()                   # create a queue for ADC data
-        self.eRun = threading.Event()            # event controls when data aq runs
-        self.eStop = threading.Event()           # event controls when data aq exits
-
-        self.rms1f = 0                       # RMS value after LP filter
+        self.q = PacketQueue(qDepth, DROP_OLDEST)  # bounded queue for ADC data; display drops oldest
+        self.late = 0                        # packets older than 2 x aqTime when taken off the queue
+        self.acq = AcqThread(self.getData)       # runs getData over and over, sleeps when paused
+        self.epoch = 0                       # configuration number the GUI expects
+        self.acqEpoch = 0                    # configuration number the acquisition thread is using
+        self.staleDrops = 0                  # packets dropped because their epoch was old
+        self.clock = ArrivalClock(self.rate)  # stamped by the acquisition thread: real rate, gaps
+        self.nextSeq = None                  # broker block expected next
+        self.times = StageTimes()            # rx wait (acquisition thread), queue wait, decode ... draw (GUI)
+
+        self.rms1f = np.zeros(self.nChan)    # RMS value after LP filter, per channel
         self.rms1Filt = 0.1                  # RMS value low-pass filter factor
 
         now = datetime.datetime.now()
@@ -144,12 +160,14 @@ class MainWindow(QtWidgets.QMainWindow):
         self.canvas = MplCanvas(self)
         #self._adc1 = initADC(rate, samples)  # initialize ADC chip
 
-        self.batch = np.zeros(int(self.samples*self.bSets/self.R))    # data points of upper plot (fixed time span)
+        self.batch = np.zeros((self.nChan, int(self.samples*self.bSets/self.R)))    # data points of upper plot (fixed time span), one row per channel
         #self.dataLog = np.array([])  # data points for lower plot, maybe sub-sampled
-        self.xdata = np.arange(0,len(self.batch))  # create an X axis vector for the plot
+        self.xdata = np.arange(0,self.batch.shape[1])  # create an X axis vector for the plot
         self.xdata = self.xdata * (self.R/self.rate)  # scale to units of seconds
 
         self._plot_ref = None
+        self.blit = blitPlot                 # renderer: keep artists and blit, or full redraw
+        self.plotter = BlitPlot(self.canvas, self.canvas.axes)
 
 
         # set up GUI layout
@@ -212,6 +230,10 @@ class MainWindow(QtWidgets.QMainWindow):
         self.b8.clicked.connect(self.setup_update)
         btnLayout.addWidget(self.b8)
 
+        self.bt = QtWidgets.QPushButton('Dump Timing')  # stage timing table to a CSV file
+        self.bt.clicked.connect(self.doDumpTimes)
+        btnLayout.addWidget(self.bt)
+
         btnLayout.addStretch(1)
         self.b5 = QtWidgets.QPushButton('Quit')  # last button is to quit
         self.b5.clicked.connect(self.doQuit)
@@ -221,6 +243,9 @@ class MainWindow(QtWidgets.QMainWindow):
         toolbar = NavigationToolbar(self.canvas, self)
         graphLayout.addWidget(toolbar)
         graphLayout.addWidget(self.canvas)
+        self.lt = QtWidgets.QLabel("Stages: no timing yet")  # p50/p99/max of each stage, once a second
+        self.lt.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        graphLayout.addWidget(self.lt)
 
         outerLayout = QtWidgets.QVBoxLayout()
         outerLayout.addLayout(btnLayout)
@@ -230,18 +255,40 @@ class MainWindow(QtWidgets.QMainWindow):
         widget.setLayout(outerLayout)
         self.setCentralWidget(widget)
 
-
-        # start thread that acquires the data
-        dataq_worker = threading.Thread(target=self.getData, daemon=True)
-        dataq_worker.start()  # start up the acquisition thread
-
-        self.eRun.set()   # enable the data aq thread
+        self.chLabels = ["ch%d" % c for c in self.channels]
+        self.env = Envelope(self.xdata, self.nChan, plotColumns)  # what is actually drawn
+        if (self.blit):
+            self.plotter.setup(self.env.x, self.nChan, self.chLabels)  # draw static parts once
+
+        self.dirty = False                   # new data since the last frame was drawn
+        self.frames = 0                      # frames drawn since the last FPS reading
+        self.fps = 0.0                       # achieved frames per second
+        self.tFps = time.monotonic()
+        self.frameTimer = QtCore.QTimer()    # redraw at a capped rate, not once per packet
+        self.frameTimer.timeout.connect(self.render_plot)
+        self.frameTimer.start(int(1000 / maxFPS))
+        self.statusTimer = QtCore.QTimer()   # refresh FPS and queue counters once a second
+        self.statusTimer.timeout.connect(self.showStatus)
+        self.statusTimer.start(1000)
+
+        # start thread (or process) that acquires the data
+        if (self.proc is not None):
+            self.proc.start()
+            self.pollTimer = QtCore.QTimer()  # collect packets from the shared-memory ring
+            self.pollTimer.timeout.connect(self.update_plot)
+            self.pollTimer.start(10)
+        else:
+            self.acq.start()  # start up the acquisition thread
 
 
-    def setup_update(self):
-        self.eRun.clear()         # stop acquisition loop
-        time.sleep(self.aqTime+0.2)   # enough time for current acquisition to finish
-        self.q.queue.clear()      # remove any old data packets in queue (of previous size)
+    def setup_update(self):   # GUI thread: never waits on the ADC
+        if (self.broker is not None):   # the broker owns the ADC: only display settings can change
+            self.sb6.setValue(self.aqTime)
+            self.sb7.setValue(self.rate)
+        if (self.proc is not None and not self.proc.fits(int(self.sb6.value() * self.sb7.value()))):
+            print("Packet too large for the -p shared-memory ring; restart with these settings")
+            self.sb6.setValue(self.aqTime)   # keep the running configuration
+            self.sb7.setValue(self.rate)
         self.aqTime = self.sb6.value()
         self.rate = self.sb7.value()
         self.samples = int(self.aqTime * self.rate) # sampling rate; this many per second
@@ -255,31 +302,69 @@ class MainWindow(QtWidgets.QMainWindow):
         self.bStart = 0                      # location of start of this packet on graph (batch)
         self.bEnd = int(self.samples / self.R)         # location of end of this packet
         self.bSets = self.sba.value()        # how many sets in upper graph batch
-        self.batch = np.zeros(int(self.samples*self.bSets/self.R))    # data points of fixed time span plot
-        self.xdata = np.arange(0,len(self.batch))  # create an X axis vector for the plot
+        self.batch = np.zeros((self.nChan, int(self.samples*self.bSets/self.R)))    # data points of fixed time span plot
+        self.xdata = np.arange(0,self.batch.shape[1])  # create an X axis vector for the plot
         self.xdata = self.xdata * (self.R/self.rate)  # scale to units of seconds
-
-        self.adc1 = initADC(self.rate, self.samples, self.adc1_ip)  # initialize ADC with configuration
-        self.eRun.set()     # restart acquistion loop
-
-    def getData(self):   # thread that acquires ADC data
-        #logging.debug('getData startup')
-        while (not self.eStop.is_set()):
-            while self.eRun.is_set():
-                data_raw = self.adc1.rx()   # retrieve one buffer of data using Pyadi-iio
-                self.q.put(data_raw)
-                self.c.gotData.emit()       # tell main thread we've now got data
-                #logging.debug('gotData...')
-        #logging.debug('now finished getData')
+        self.env = Envelope(self.xdata, self.nChan, plotColumns)
+        if (self.blit):
+            self.plotter.setup(self.env.x, self.nChan, self.chLabels)  # new X range: redraw static parts
+
+        if (self.broker is not None):
+            return                # same packets as before, nothing to reconfigure
+        self.epoch += 1           # packets tagged with an older epoch are now stale
+        if (self.proc is not None):
+            self.proc.configure(self.epoch, self.rate, self.samples)  # child applies it between rx() calls
+        else:
+            self.acq.post(lambda e=self.epoch, r=self.rate, s=self.samples: self.applyConfig(e, r, s))
+
+    def applyConfig(self, epoch, rate, samples):  # acquisition thread, between two rx() calls
+        reconfigADC(self.adc1, rate, samples)  # same IIO context, new rate and buffer size
+        self.clock.reset(rate)    # timing starts over with the new buffers
+        self.acqEpoch = epoch     # tag packets from here on with the new configuration
+
+    def getData(self):   # acquire one packet; called repeatedly by the acquisition thread
+        t = time.perf_counter_ns()
+        if (self.broker is not None):
+            try:
+                hdr, payload = next(self.broker)   # one block, as the broker read it
+            except StopIteration:
+                raise EOFError("broker closed the stream")
+            data_raw = payload.ravel()   # interleaved, as rx() would give it
+            tArrive = time.monotonic()
+            skipped = 0 if self.nextSeq is None else hdr['seq'] - self.nextSeq   # dropped by our broker queue
+            self.nextSeq = hdr['seq'] + 1
+            tRx = hdr['tStart'] + int(self.aqTime * 1E9)   # when the broker's rx() returned
+        else:
+            data_raw = self.adc1.rx()   # retrieve one buffer of data using Pyadi-iio
+            tArrive = time.monotonic()
+            skipped = 0
+            tRx = int(tArrive * 1E9)
+        self.times.add("rx", t)     # waiting for the ADC (or the broker)
+        known = None
+        if skipped > 0:
+            known = (int(skipped * self.aqTime * 1E9), skipped * self.samples)
+        # a late packet is held until the clock knows whether buffers were lost before it
+        ready = self.clock.hold((self.acqEpoch, tArrive, data_raw, known), tRx, self.samples,
+                                skipped * self.samples, keep=self.keepPacket)
+        for gap, (epoch, tArrive, data_raw, known) in ready:   # gap: None, or (ns, samples) lost before it
+            self.q.put((epoch, tArrive, data_raw, known or gap))  # tagged with configuration, arrival time, any gap
+        if ready:
+            self.c.gotData.emit()   # tell main thread we've now got data
+
+    def keepPacket(self, packet):   # a packet the clock holds back: copy a buffer rx() will reuse
+        epoch, tArrive, data_raw, known = packet
+        if isinstance(data_raw, np.ndarray):
+            data_raw = data_raw.copy()
+        return (epoch, tArrive, data_raw, known)
 
     def doPause(self):
         if self.b2.isChecked():
             self.b2.setStyleSheet("background-color : azure4")
-            #self.eRun.clear()  # stop acquisition loop
+            #self.acq.pause()  # stop acquisition loop
             self.Pause = True
         else:
             self.b2.setStyleSheet("background-color : " + self.b2baseColor)
-            #self.eRun.set()  # restart acquisition loop
+            #self.acq.resume()  # restart acquisition loop
             self.Pause = False
 
     def doRecord(self):
@@ -290,63 +375,138 @@ class MainWindow(QtWidgets.QMainWindow):
             timeString = now.strftime('%Y-%m-%d %H:%M:%S')
             fname = now.strftime('%Y%m%d_%H%M%S_log.csv')
             datfile = self.saveDir +"/" + fname        # use this file to save ADC readings
+            if (self.proc is not None):
+                self.proc.record(datfile)  # child records every packet, whatever the display does
+                return
+            self.q.setPolicy(BLOCK)        # recording: never drop packets, wait instead
             self.fout = open(datfile, "w")       # erase pre-existing file if any
-            self.fout.write("mV\n")     # column header, to read as CSV
+            self.fout.write(csvHeader(self.channels))     # column header, to read as CSV
             #self.fout.write("# Start: %s\n" % timeString)
             self.fout.flush()
 
         else:
             self.b3.setStyleSheet("background-color : " + self.b3baseColor)
             self.Record = False
+            if (self.proc is not None):
+                self.proc.record(None)     # child writes the end line and closes the file
+                return
+            self.q.setPolicy(DROP_OLDEST)  # display only: keep up with real time
             now = datetime.datetime.now()
             timeString = now.strftime('%Y-%m-%d %H:%M:%S')
             self.fout.write("# End: %s\n\n" % timeString)
             self.fout.close()
 
+    def doDumpTimes(self):   # append the stage timing table, for comparing runs later
+        fname = self.saveDir + "/" + datetime.datetime.now().strftime('%Y%m%d_timing.csv')
+        self.times.dump(fname, "%s %d sps %d samples %s" %
+                        (version, self.rate, self.samples, "proc" if self.proc is not None else "thread"))
+        print("Stage timing appended to %s" % fname)
+
     def doReset(self):
         self.dataLog = np.array([])  # zero out data log
 
     def doQuit(self):
         self.Pause = True  # stop GUI update
-        self.eRun.clear()  # stop acquisition loop
-        self.eStop.set()   # send signal closing out acquisition thread
+        self.frameTimer.stop()
+        self.statusTimer.stop()
+        if (self.proc is not None):
+            self.pollTimer.stop()
+            self.proc.stop(self.aqTime + 2.0)  # child finishes its file; shared memory is freed
+        else:
+            self.q.close()     # release acquisition thread if it is waiting on a full queue
+            self.acq.stop(self.aqTime + 1.0)  # close out acquisition thread, waits for the last rx()
         try:
             self.fout.close()  # close data logfile, if it was ever opened
         except:
             pass           # no file opened
         self.close()       # close window
 
-    def update_plot(self):
-        if self.eStop.is_set():  # no updates if stop signal set
+    def showStatus(self):   # frame rate and queue health, in the window's status bar
+        now = time.monotonic()
+        self.fps = self.frames / (now - self.tFps)
+        self.frames = 0
+        self.tFps = now
+        if (self.proc is not None):   # ring fill, overruns and backpressure from the child
+            p = self.proc
+            if (p.error()):
+                self.statusBar().showMessage("Acquisition process stopped: ADC error (see console)")
+                return
+            msg = ("%.1f FPS (max %d)   Ring %d/%d (%s)   overruns: %d   late: %d   stale: %d   blocked: %d (%.1f s)   acq CPU %.0f%%" %
+                   (self.fps, maxFPS, p.ring.used(), p.ring.nSlots, procPolicy, p.count(OVERRUNS), self.late,
+                    self.staleDrops, p.count(BLOCKED), p.count(BLOCKED_NS)/1E9, p.cpuPercent()))
+            gaps = p.count(GAPS)
+            msg += ("   %.2f sps  gaps:%d lost:%d  stalls:%d" %
+                    (p.count(RATE_MSPS)/1E3, gaps, p.count(LOST), p.count(STALLS)))
+        else:
+            msg = ("%.1f FPS (max %d)   Queue %d/%d (%s)   dropped: %d   late: %d   stale: %d   blocked: %d (%.1f s)" %
+                   (self.fps, maxFPS, self.q.qsize(), self.q.maxDepth, self.q.policy, self.q.dropped, self.late,
+                    self.staleDrops, self.q.blocked, self.q.blockedTime))
+            gaps = self.clock.gaps
+            msg += "   " + self.clock.status()
+        self.statusBar().setStyleSheet("color: red" if gaps > 0 else "")  # samples have been lost
+        self.statusBar().showMessage(msg)
+        self.lt.setText("Stages: " + self.times.status())
+
+    def stopped(self):
+        if (self.proc is not None):
+            return self.proc.stopped()
+        return self.acq.stopped()
+
+    def update_plot(self):   # new data signal (or ring poll): drain every waiting packet; drawing is done by render_plot
+        if self.stopped():  # no updates if stop signal set
             return
-        if self.q.empty():
-            self.show()          # needed to handle mouse events?
+        if (self.proc is not None):
+            packet = self.proc.get()
+            while packet is not None:
+                epoch, tArrive, yr = packet   # already (channels x samples), in shared memory; child records gaps
+                self.times.record("ring", int((time.monotonic() - tArrive) * 1E9))   # rx() return to here
+                if self.accept(epoch, tArrive):
+                    self.ingest(yr, t=time.perf_counter_ns())
+                self.proc.release()   # done with it: the child may reuse the space
+                packet = self.proc.get()
+            self.rCount = self.proc.count(RECORDED)
             return
-        data_raw = self.q.get()  # retrieve oldest data from queue
-        fmt = "%dI" % self.samples
-        yr = np.array( list(unpack(fmt, data_raw)) )
-
-        sRec = (self.rCount * aqTime)   # recorded data duration in seconds
-        now = datetime.datetime.now()
-        timeString = now.strftime('%Y-%m-%d %H:%M:%S')
-        timeString = ("Rec:%.1fs    " % sRec) + timeString  # add "Seconds Recorded" to time
-        
+        while not self.q.empty():
+            epoch, tArrive, data_raw, gap = self.q.get()  # retrieve oldest data from queue
+            self.times.record("queue", int((time.monotonic() - tArrive) * 1E9))  # rx() return to here
+            if self.accept(epoch, tArrive):
+                t = time.perf_counter_ns()
+                yr = decodeChannels(data_raw, self.samples, self.nChan)  # (channels x samples) view
+                self.ingest(yr, gap, self.times.add("decode", t))
+
+    def accept(self, epoch, tArrive):   # count late packets, reject those from an old configuration
+        if (time.monotonic() - tArrive > 2*self.aqTime):  # GUI is running behind real time
+            self.late += 1
+        if (epoch != self.epoch):  # taken before the last setup_update: wrong size, drop it
+            self.staleDrops += 1
+            return False
+        return True
+
+    def ingest(self, yr, gap=None, t=None):   # record and add one decoded (channels x samples) packet to the sweep buffer
+                                              # t: perf_counter_ns() the calcVolt stage starts from
+        if t is None:
+            t = time.perf_counter_ns()
         volts = calcVolt(yr)  # convert raw readings into Temp, deg.C
         #self.ydata = calcSeis(volts)  # integrate and filter data
         self.ydata = volts
+        t = self.times.add("calcVolt", t)
 
-        if (self.R > 1):  # decimate (average & downsample)
-            yD = self.ydata.reshape(-1, self.R).mean(axis=1) # average each set of R values
+        if (self.R > 1):  # decimate (average & downsample) all channels at once
+            yD = self.ydata.reshape(self.nChan, -1, self.R).mean(axis=2) # average each set of R values
         else:
             yD = self.ydata
+        t = self.times.add("decimate", t)
 
         # self.dataLog = np.append(self.dataLog, yD)  # add new data to ever-larger cumulative array
 
-        # save out data to a file on disk
-        if (self.Record):
-            np.savetxt(self.fout, self.ydata*1000, fmt='%0.5f')  # save out readings to disk in mV
+        # save out data to a file on disk (with -p the child process does this)
+        if (self.Record and self.proc is None):
+            if (gap is not None):
+                self.fout.write(gapLine(*gap))  # samples lost just before this packet
+            np.savetxt(self.fout, self.ydata.T*1000, fmt='%0.5f', delimiter=', ')  # save out readings to disk in mV, one column per channel
             self.fout.flush()  # update file on disk
             self.rCount += 1   # increment count of recorded data
+            t = self.times.add("savetxt", t)
             # print("Seconds Recorded: %5.1f" % (self.rCount * aqTime))  # DEBUG
 
 
@@ -354,30 +514,55 @@ class MainWindow(QtWidgets.QMainWindow):
             
             bEdge = (self.samples * self.bSets / self.R)  # right-most point on top "batch" graph
             # print("%d, %d, %d" %(self.bStart,self.bEnd, bEdge))
-            self.batch[self.bStart:self.bEnd] = yD
+            self.batch[:, self.bStart:self.bEnd] = yD
+            self.env.update(self.batch, self.bStart, self.bEnd)  # re-decimate just this segment
             self.bStart += int(self.samples / self.R)
             self.bEnd += int(self.samples / self.R)
             if (self.bEnd > bEdge):
                 self.bStart = 0
                 self.bEnd = int(self.samples / self.R)
+
+            rms1 = np.std(self.ydata, axis=1)  # instantaneous std.dev. value, per channel
+            self.rms1f = (1.0-self.rms1Filt)*self.rms1f + self.rms1Filt*rms1  # low-pass filtered value
+            self.dirty = True  # something new to draw
+            self.times.add("envelope", t)
+
+    def render_plot(self):   # QTimer, at most maxFPS per second: redraw if anything changed
+        if self.stopped() or self.Pause or not self.dirty:
+            self.show()          # needed to handle mouse events?
+            return
+        self.dirty = False
+        yEnv = self.env.y
+        t = time.perf_counter_ns()
+
+        sRec = (self.rCount * aqTime)   # recorded data duration in seconds
+        now = datetime.datetime.now()
+        timeString = now.strftime('%Y-%m-%d %H:%M:%S')
+        timeString = ("Rec:%.1fs    " % sRec) + timeString  # add "Seconds Recorded" to time
+
+        #rmsString = ("%.3f mV RMS   R:%.1fs" % (self.rms1f*1E3, sRec))
+        rmsString = "  ".join("%.3f" % r for r in self.rms1f*1E3) + ' mV RMS'
+
+        if (self.blit):   # keep artists, redraw only the plot area
+            self.plotter.update(yEnv, timeString, rmsString)
+            self.show()
+        else:             # clear and redraw everything, every frame
             ax = self.canvas.axes   # axis for first plot (upper graph)
             ax.cla()  # clear old data
             fmt=ticker.ScalarFormatter(useOffset=False)
             fmt.set_scientific(False)
             #ax.scatter(self.xdata,self.ydata,s=2, color="green")  # show samples as points
             #ax.scatter(self.xdata,self.batch,s=1, color="green")  # show samples as points
-            ax.plot(self.xdata,self.batch, linewidth=1, color="green")  # show samples as lines
+            if (self.nChan == 1):
+                ax.plot(self.env.x,yEnv[0], linewidth=1, color="green")  # show samples as lines
+            else:
+                ax.plot(self.env.x,yEnv.T, linewidth=1)  # one line per channel
+                ax.legend(self.chLabels, loc='lower right', fontsize=8)
             ax.grid(color='gray', linestyle='dotted' )
             ax.set_xlabel("seconds", fontsize = 10)
             ax.yaxis.set_major_formatter(fmt) # turn off Y offset mode
             ax.set_title('Voltage vs Time', fontsize = 15)
 
-            rms1 = np.std(self.ydata)  # instantaneous std.dev. value
-            self.rms1f = (1.0-self.rms1Filt)*self.rms1f + self.rms1Filt*rms1  # low-pass filtered value
-            
-            #rmsString = ("%.3f mV RMS   R:%.1fs" % (self.rms1f*1E3, sRec))
-            rmsString = ("%.3f mV RMS" % (self.rms1f*1E3))
-
             ymin,ymax = self.canvas.axes.get_ylim() # find range of displayed values
             xmin,xmax = self.canvas.axes.get_xlim()
             yrange = ymax-ymin
@@ -400,9 +585,11 @@ class MainWindow(QtWidgets.QMainWindow):
             self.canvas.ax2.grid(color='gray', linestyle='dotted')
             self.canvas.ax2.yaxis.set_major_formatter(fmt)
             """
-            
+        
             self.canvas.draw()   # redraw plot on canvas
             self.show()  # show the canvas
+        self.times.add("draw", t)
+        self.frames += 1
 
 # ---------------------------------------------------------------
 # logging.basicConfig(level=logging.DEBUG,format='(%(threadName)-9s) %(message)s',)
@@ -414,20 +601,31 @@ if __name__ == "__main__":
     saveDir = "."         # By default, save logged data in current directory
 
     print(version)        # this program version
+    if "-p" in sys.argv:  # acquisition in a child process, may appear anywhere on the command line
+        procMode = True
+        sys.argv.remove("-p")
     argc = len(sys.argv)
     
     #if ( False ):
     if (argc < 2):      # with no arguments, just print help message
-        print("Usage: %s <IP_address> [<output_directory>]" % sys.argv[0])
+        print("Usage: %s [-p] <IP_address> [<output_directory>] [<channels>]" % sys.argv[0])
+        print("  -p : acquire and record in a separate process (shared-memory ring to the display)")
         print("  <IP_address> : domain name, eg. 'analog.local' or IP address of host with ADC")
-        print("  <output_directory> : where to store recorded data, defaults to current directory\n")
-        print("Example:\n   %s 192.168.1.202 C:/temp \n" % sys.argv[0])
+        print("                 or unix:<socket> to plot what adcbroker.py is acquiring")
+        print("                 or fake:[realtime,latency=ms,jitter=ms,dropout=p] for a simulated ADC")
+        print("  <output_directory> : where to store recorded data, defaults to current directory")
+        print("  <channels> : comma-separated ADC channels to acquire, eg. '0,1,2' (default 0)\n")
+        print("Example:\n   %s 192.168.1.202 C:/temp 0,1\n" % sys.argv[0])
         sys.exit()
 
     if (argc > 1):
         ADC_IP = sys.argv[1]  # takes one argument, the IP address of target device
 
     adc1_ip = "ip:"+ADC_IP       # local LAN RPi with attached ADC
+    if ADC_IP.startswith("unix:"):
+        adc1_ip = ADC_IP         # adcbroker.py socket: rate, samples and channels come from the stream
+    if ADC_IP.startswith("fake:"):
+        adc1_ip = ADC_IP         # simulated ADC (adciio.py), no hardware needed
     print("Using ADC device IP:%s" % ADC_IP)
 
     if (argc > 2):
@@ -441,6 +639,10 @@ if __name__ == "__main__":
         print("Error: directory '%s' is not writable." % saveDir)
         sys.exit()
 
+    if (argc > 3):
+        channels = parseChannels(sys.argv[3])  # interleaved multi-channel acquisition
+    print("ADC channels: %s" % ",".join(str(c) for c in channels))
+
     app = QtWidgets.QApplication([])
     w = MainWindow()
 
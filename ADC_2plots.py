@@ -11,10 +11,12 @@ import matplotlib.ticker as ticker  # turn off Y offset mode
 import datetime    # current date & time
 import adi         # Pyadi-iio interface to AD7124 ADC
 import numpy as np # array manipulations
-from struct import unpack  # extract words from packed binary buffer
+from adcdecode import decodeRaw  # typed NumPy view of packed binary buffer
 import math        # for constant 'e'
 import queue         # transfer ADC data between threads
 import threading     # producer and consumer threads
+from adcacq import AcqThread  # acquisition thread state machine
+from adchistory import History  # long-term log for the lower plot, flat memory and draw cost
 import time          # for time.sleep()
 import logging       # thread-safe log info
 
@@ -34,6 +36,7 @@ aqTime = 0.50      # duration of 1 dataset, in seconds
 rate = 100         # readings per second
 R = 1             # decimation ratio: points averaged together before saving
 samples = int(aqTime * rate) # record this many points at one time
+histPoints = 1000  # most points drawn on the lower graph, however long the run
 
 # ----------------------------------------------------
 # set up ADC chip through Pyadi-iio system
@@ -141,8 +144,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.c.gotData.connect(self.update_plot)  # call update_plot whenever data arrives
 
         self.q = queue.Queue()                   # create a queue for ADC data
-        self.eRun = threading.Event()            # event controls when data aq runs
-        self.eStop = threading.Event()           # event controls when data aq exits
+        self.acq = AcqThread(self.getData)       # runs getData over and over, sleeps when paused
 
         self.rms1f = 0                       # RMS value after LP filter
         self.rms1Filt = 0.1                  # RMS value low-pass filter factor
@@ -159,7 +161,7 @@ class MainWindow(QtWidgets.QMainWindow):
         #self._adc1 = initADC(rate, samples)  # initialize ADC chip
 
         self.batch = np.zeros(self.samples*self.bSets)    # data points of upper plot (fixed time span)
-        self.dataLog = np.array([])  # data points for lower plot, maybe sub-sampled
+        self.dataLog = History()  # data points for lower plot, maybe sub-sampled
         self._plot_ref = None
 
 
@@ -243,15 +245,11 @@ class MainWindow(QtWidgets.QMainWindow):
 
 
         # start thread that acquires the data
-        dataq_worker = threading.Thread(target=self.getData, daemon=True)
-        dataq_worker.start()  # start up the acquisition thread
-
-        self.eRun.set()   # enable the data aq thread
+        self.acq.start()  # start up the acquisition thread
 
 
     def setup_update(self):
-        self.eRun.clear()         # stop acquisition loop
-        time.sleep(self.aqTime+0.2)   # enough time for current acquisition to finish
+        self.acq.pause()          # stop acquisition loop; returns once the current rx() is done
         self.q.queue.clear()      # remove any old data packets in queue (of previous size)
         self.aqTime = self.sb6.value()
         self.rate = self.sb7.value()
@@ -268,26 +266,21 @@ class MainWindow(QtWidgets.QMainWindow):
         self.bSets = self.sba.value()        # how many sets in upper graph batch
         self.batch = np.zeros(self.samples*self.bSets)    # data points of upper plot (fixed time span)
         self.adc1 = initADC(self.rate, self.samples, self.adc1_ip)  # initialize ADC with configuration
-        self.eRun.set()     # restart acquistion loop
-
-    def getData(self):   # thread that acquires ADC data
-        #logging.debug('getData startup')
-        while (not self.eStop.is_set()):
-            while self.eRun.is_set():
-                data_raw = self.adc1.rx()   # retrieve one buffer of data using Pyadi-iio
-                self.q.put(data_raw)
-                self.c.gotData.emit()       # tell main thread we've now got data
-                #logging.debug('gotData...')
-        #logging.debug('now finished getData')
+        self.acq.resume()   # restart acquistion loop
+
+    def getData(self):   # acquire one packet; called repeatedly by the acquisition thread
+        data_raw = self.adc1.rx()   # retrieve one buffer of data using Pyadi-iio
+        self.q.put(data_raw)
+        self.c.gotData.emit()       # tell main thread we've now got data
 
     def doPause(self):
         if self.b2.isChecked():
             self.b2.setStyleSheet("background-color : azure4")
-            #self.eRun.clear()  # stop acquisition loop
+            #self.acq.pause()  # stop acquisition loop
             self.Pause = True
         else:
             self.b2.setStyleSheet("background-color : " + self.b2baseColor)
-            #self.eRun.set()  # restart acquisition loop
+            #self.acq.resume()  # restart acquisition loop
             self.Pause = False
 
     def doRecord(self):
@@ -312,12 +305,11 @@ class MainWindow(QtWidgets.QMainWindow):
             self.fout.close()
 
     def doReset(self):
-        self.dataLog = np.array([])  # zero out data log
+        self.dataLog.clear()  # zero out data log
 
     def doQuit(self):
         self.Pause = True  # stop GUI update
-        self.eRun.clear()  # stop acquisition loop
-        self.eStop.set()   # send signal closing out acquisition thread
+        self.acq.stop(self.aqTime + 1.0)  # close out acquisition thread, waits for the last rx()
         try:
             self.fout.close()  # close data logfile, if it was ever opened
         except:
@@ -325,14 +317,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.close()       # close window
 
     def update_plot(self):
-        if self.eStop.is_set():  # no updates if stop signal set
+        if self.acq.stopped():  # no updates if stop signal set
             return
         if self.q.empty():
             self.show()          # needed to handle mouse events?
             return
         data_raw = self.q.get()  # retrieve oldest data from queue
-        fmt = "%dI" % self.samples
-        yr = np.array( list(unpack(fmt, data_raw)) )
+        yr = decodeRaw(data_raw, self.samples)
 
         now = datetime.datetime.now()
         timeString = now.strftime('%Y-%m-%d %H:%M:%S')
@@ -345,7 +336,7 @@ class MainWindow(QtWidgets.QMainWindow):
             yD = self.ydata.reshape(-1, self.R).mean(axis=1) # average each set of R values
         else:
             yD = self.ydata
-        self.dataLog = np.append(self.dataLog, yD)  # add new data to cumulative array
+        self.dataLog.append(yD)  # add new data to cumulative array
 
         # save out downsampled version of data to a file on disk
         if (self.Record):
@@ -390,12 +381,11 @@ class MainWindow(QtWidgets.QMainWindow):
             ax.text(xpos,ypos, timeString, style='italic', horizontalalignment='right')  # date,time string
             ax.text(xpos1,ypos, rmsString, fontsize=12)
 
-            totalPoints = len(self.dataLog)  # plot lower graph (accumulated points)
-            x2 = np.arange(totalPoints)
+            x2, yMin, yMean, yMax = self.dataLog.view(histPoints)  # plot lower graph (accumulated points)
             x2 = x2 * self.R * self.aqTime/self.samples
             self.canvas.ax2.cla()  # clear old data
-            #self.canvas.ax2.scatter(x2, self.dataLog, s=1)   # plot of accumulated past data
-            self.canvas.ax2.plot(x2, self.dataLog, linewidth=1)   # plot of accumulated past data
+            self.canvas.ax2.fill_between(x2, yMin, yMax, alpha=0.3, linewidth=0)  # min..max of each point
+            self.canvas.ax2.plot(x2, yMean, linewidth=1)   # plot of accumulated past data
             self.canvas.ax2.set_xlabel("seconds", fontsize = 10)
             self.canvas.ax2.set_ylabel("Volts", fontsize = 10)
             self.canvas.ax2.grid(color='gray', linestyle='dotted')
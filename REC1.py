@@ -8,7 +8,8 @@ import pathlib     # find current working directory
 import datetime    # current date & time
 import adi         # Pyadi-iio interface to AD7124 ADC
 import numpy as np # array manipulations
-from struct import unpack  # extract words from packed binary buffer
+from adcdecode import decodeRaw  # typed NumPy view of packed binary buffer
+from adcrecord import RecordWriter  # background writer thread
 import math        # for constant 'e'
 import queue         # transfer ADC data between threads
 import time          # for time.sleep()
@@ -26,6 +27,8 @@ aqTime = 0.50      # duration of 1 dataset, in seconds
 rate = 1000         # readings per second
 R = 1             # decimation ratio: points averaged together before saving
 totalPoints = 0                 # total points recorded so far        
+writer = None                   # background writer: file I/O never holds up rx()
+stopRec = False                 # set by control-C
 
 # ----------------------------------------------------    
 # set up ADC chip through Pyadi-iio system
@@ -53,14 +56,8 @@ def initADC(rate, samples, adc1_ip):
   return adc1
   
 def signal_handler(sig, frame):
-    now = datetime.datetime.now()
-    timeString = now.strftime('%Y-%m-%d %H:%M:%S')
-    print('\nProgram stopped at %s' % timeString)
-    fout.write('# Program stopped at %s' % timeString)
-    print("Total data points: %d" % totalPoints)
-    fout.close()    
-    print("Data filename: %s" % datfile)
-    sys.exit(0)
+    global stopRec
+    stopRec = True   # runADC finishes the current packet, drains the writer and exits
 
 
 # ----------------------------------------------------    
@@ -99,6 +96,7 @@ def calcSeis(volts):
 
 def runADC():
         global totalPoints     # how many points we've seen
+        global writer
         
         adc1 = initADC(rate, samples, adc1_ip)  # initialize ADC with configuration
         if (adc1 is None):
@@ -106,31 +104,40 @@ def runADC():
             close()
             sys.exit()                       # leave entire program
         
-        fout.write("mV\n")     # column header, to read as CSV            
-        fout.flush()
+        writer = RecordWriter(fout)   # bounded queue; waits (and counts it) rather than lose data
+        writer.put(fout.write, "mV\n")     # column header, to read as CSV
         
         packets = 0
-        while ( True ):
+        while ( not stopRec ):
           try:
             data_raw = adc1.rx()   # retrieve one buffer of data using Pyadi-iio  
-            fmt = "%dI" % samples
-            yr = np.array( list(unpack(fmt, data_raw)) )
+            yr = decodeRaw(data_raw, samples)
             vdat = calcVolt(yr)
             totalPoints += len(vdat)
             mV = vdat * 1000
-            np.savetxt(fout, mV, fmt='%0.5f')  # save out readings to disk in mV
+            writer.put(np.savetxt, fout, mV, fmt='%0.5f')  # save out readings to disk in mV
             print("%.3f" % mV[0],end=" ", flush=True)
             packets += 1
             if (packets % 10) == 0:
                 avg = np.average(mV)
                 std = np.std(mV)
                 now = datetime.datetime.now()
-                time = now.strftime('%H:%M:%S')
-                print("Time:%s avg: %.3f std: %.3f" % (time, avg, std))
+                tStr = now.strftime('%H:%M:%S')
+                print("Time:%s avg: %.3f std: %.3f" % (tStr, avg, std))
+                print("  Writer %s" % writer.status())
           except Exception as e:
             print("Had error:")
             print(e)
             break
+
+        now = datetime.datetime.now()
+        timeString = now.strftime('%Y-%m-%d %H:%M:%S')
+        print('\nProgram stopped at %s' % timeString)
+        writer.put(fout.write, '# Program stopped at %s' % timeString)
+        writer.close()       # write out whatever is still queued, then close file
+        print("Writer: %s" % writer.status())
+        print("Total data points: %d" % totalPoints)
+        print("Data filename: %s" % datfile)
         
 
 # ---------------------------------------------------------------
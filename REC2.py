@@ -8,13 +8,19 @@ import sys         # command-line arguments, if any
 import os          # test if directory is writable
 import pathlib     # find current working directory
 # import datetime    # current date & time
-import adi         # Pyadi-iio interface to AD7124 ADC
 import numpy as np # array manipulations
-from struct import unpack  # extract words from packed binary buffer
+from adcdecode import decodeChannels  # typed NumPy view of packed binary buffer
+from adcdevice import ADCSession, parseChannels  # AD7124 setup through Pyadi-iio, reconnects by itself
+from adcrecord import csvHeader, gapLine, BinWriter, RecordWriter  # recorded file layout, background writer
+from adctiming import ArrivalClock  # real sample rate, lost buffers, from arrival times
+from adcstats import StageTimes  # per-stage latency, p50/p99/max
 import math        # for constant 'e'
 import queue         # transfer ADC data between threads
 import time          # for time.sleep()
-import RPi.GPIO as GPIO   # GPIO input
+try:
+    import RPi.GPIO as GPIO   # GPIO input
+except ImportError:
+    GPIO = None      # not a Pi: record without the GPIO edge inputs
 from datetime import datetime  # for time/date timestamp on output
 
 import signal       # handle control-C
@@ -22,13 +28,22 @@ import signal       # handle control-C
 # ----------------------------------------------------
 # Configure Program Settings
 
-version = "ADC Record v0.35  (15-Dec-2023)"   # this particular code version number
+version = "ADC Record v0.39  (17-Oct-2026)"   # this particular code version number
 
 
 aqTime = 0.20       # duration of 1 dataset, in seconds
 rate = 1000         # readings per second
 R = 1               # decimation ratio: points averaged together before saving
+channels = [0]      # ADC input channels to record (interleaved in each buffer)
 totalPoints = 0     # total points recorded so far
+kernelBuffers = 8   # IIO buffers queued in the kernel: more rides out longer write stalls (bench-iio.py)
+prefetch = 2        # buffers read ahead by a thread while this one is written (0: read on demand)
+binMode = False     # True: save raw codes in binary blocks (adcrecord.py) instead of CSV text
+writer = None       # background writer thread: file I/O never holds up rx()
+stopRec = False     # set by control-C
+times = StageTimes()  # rx wait, decode, calcVolt, queue to writer, file write
+dumpTimes = False   # set by SIGUSR1: append the timing table to the _timing.csv file
+useGPIO = False     # GPIO edge inputs set up (a Pi, and not a fake: ADC)
 
 # --------------------------------------------
 
@@ -36,11 +51,6 @@ IN1_GPIO = 20    # Signal1 on RPi connector pin 38
 IN2_GPIO = 24    # Signal2 on RPi connector pin 18
 LED_GPIO = 21    # BR corner of RPi connector, pin 40
 
-# Control-C interrupt handler - program exits from here
-def signal_handler(sig, frame):
-    GPIO.cleanup()
-    sys.exit(0)
-
 # GPIO signal input handler. 'channel' param is GPIO number, eg 20
 def button_callback(channel):
     global outState1, outState2
@@ -61,40 +71,14 @@ def button_callback(channel):
         tOld2 = tNow
 
 
-# ----------------------------------------------------    
-# set up ADC chip through Pyadi-iio system
-
-def initADC(rate, samples, adc1_ip):
-
-  try:
-    adc1 = adi.ad7124(uri=adc1_ip)
-  except Exception as e:
-    print("Attempt to open '%s' had error: " % adc1_ip,end="")
-    print(e)
-    adc1 = None 
-    
-  if (adc1 is not None):  
-      #phy = adc1.ctx.find_device("ad7124-8")
-      ad_channel = 0
-      sc = adc1.scale_available
-      adc1.channel[ad_channel].scale = sc[-1]  # get highest range
-      scale = adc1.channel[ad_channel].scale
-      adc1.sample_rate = rate  # sets sample rate for all channels
-      adc1.rx_buffer_size = samples
-      adc1.rx_enabled_channels = [ad_channel]
-      adc1._ctx.set_timeout(1000000)  # in what units is this?
-  
-  return adc1
-  
 def signal_handler(sig, frame):
-    now = datetime.now()
-    timeString = now.strftime('%Y-%m-%d %H:%M:%S')
-    print('\nProgram stopped at %s' % timeString)
-    fout.write('# Program stopped at %s' % timeString)
-    print("Total data points: %d" % totalPoints)
-    fout.close()    
-    print("Data filename: %s" % datfile)
-    sys.exit(0)
+    global stopRec
+    stopRec = True   # runADC finishes the current packet, drains the writer and exits
+
+# kill -USR1 <pid>: dump the stage timing table after the current packet
+def dump_handler(sig, frame):
+    global dumpTimes
+    dumpTimes = True
 
 
 # ----------------------------------------------------    
@@ -108,73 +92,164 @@ def calcVolt(rawADC):
     return V
     
 # ----------------------------------------------------    
+# write one GPIO edge to the data file. column 0..3 = input1 high, input1 low,
+# input2 high, input2 low; in CSV these follow the data columns
+
+def logEdge(column, tDelta, gpioPad):
+    if binMode:
+        writer.put(fout.write, rec.packEvent(column, tDelta, time.time_ns()))
+    else:
+        writer.put(fout.write, gpioPad + "," * column + " " + "%5.1f\n" % tDelta) # GPIO edge time delta, to file
+
+# ----------------------------------------------------    
+# a buffer held back by the ArrivalClock: copy it, rx() will reuse its memory
+
+def keepPacket(packet):
+    data_raw, tStart, reconnect = packet
+    if isinstance(data_raw, np.ndarray):
+        data_raw = data_raw.copy()
+    return (data_raw, tStart, reconnect)
+
+# ----------------------------------------------------    
+# mark lost data in the file, just before the next packet's data
+
+def logGap(lostNs, lostSamples, attempts, tStart):
+    if binMode:
+        writer.put(fout.write, rec.packGap(lostNs, lostSamples, attempts, tStart))
+    else:
+        writer.put(fout.write, gapLine(lostNs, lostSamples, attempts))
+    print("\n" + gapLine(lostNs, lostSamples, attempts), end="")
+
+# ----------------------------------------------------    
 
 
 def runADC():
         global totalPoints     # how many points we've seen
         global outState1, outState2        # flag indicating unhandled GPIO input edge
         global outLevel1, outLevel2
+        global rec, writer
+        global dumpTimes
         
-        adc1 = initADC(rate, samples, adc1_ip)  # initialize ADC with configuration
+        session = ADCSession(adc1_ip, rate, samples, channels, stop=lambda: stopRec,
+                             kernelBuffers=kernelBuffers, prefetch=prefetch)  # retries rx() on network errors
+        adc1 = session.open()  # initialize ADC with configuration
         if (adc1 is None):
             print("Error: unable to connect to ADC %s" % adc1_ip)
             close()
             sys.exit()                       # leave entire program
         
-        fout.write("mV\n")     # column header, to read as CSV            
-        fout.flush()
+        writer = RecordWriter(fout)   # bounded queue; waits (and counts it) rather than lose data
+        if binMode:
+            rec = BinWriter(fout, rate, channels)  # every block carries its own header
+        else:
+            writer.put(fout.write, csvHeader(channels))     # column header, to read as CSV
         
+        clock = ArrivalClock(rate)   # stamps each buffer: measured rate, gaps, stalls
         packets = 0
         int1High = False
+        nChan = len(channels)
+        gpioPad = "," * nChan   # GPIO edge columns come after the data columns
+        saveTxt = times.wrap("savetxt", np.savetxt)         # timed in the writer thread
+        writeBlock = times.wrap("write", fout.write)          # binary blocks, already encoded
+
+        def recordPacket(data_raw, tStart, t):   # decode one buffer and queue it for the writer
+            global totalPoints
+            yr = decodeChannels(data_raw, samples, nChan)  # (channels x samples) view
+            t = times.add("decode", t)
+            vdat = calcVolt(yr)
+            totalPoints += vdat.shape[1]
+            mV = vdat * 1000
+            t = times.add("calcVolt", t)
+            if binMode:
+                block = rec.packData(yr, tStart)   # raw codes, copied out now: the ADC reuses
+                t = times.add("encode", t)         # its buffers long before the writer queue is full
+                writer.put(writeBlock, block)
+            else:
+                writer.put(saveTxt, fout, mV.T, fmt='%0.5f', delimiter=', ')  # save out readings to disk in mV, one column per channel
+            t = times.add("queue", t)  # waiting for room in the writer queue
+            print("%.2f" % mV[0,0],end=" ", flush=True)
+            return mV, t
 
         dispLines = 10  # how many packets per line to display on terminal while running
-        while ( True ):
+        t = time.perf_counter_ns()
+        while ( not stopRec ):
           try:
-            data_raw = adc1.rx()   # retrieve one buffer of data using Pyadi-iio  	
-
-            fmt = "%dI" % samples
-            yr = np.array( list(unpack(fmt, data_raw)) )
-            vdat = calcVolt(yr)
-            totalPoints += len(vdat)
-            mV = vdat * 1000
-            np.savetxt(fout, mV, fmt='%0.5f')  # save out readings to disk in mV
+            data_raw = session.rx()   # retrieve one buffer of data using Pyadi-iio; reconnects if needed
+            if data_raw is None:
+                break                  # control-C while reconnecting
+            t = times.add("rx", t)     # waiting for the ADC
+            tArrive = time.time_ns()
+            tStart = tArrive - int(aqTime * 1E9)
+            known = 0 if session.gap is None else session.gap[1]
+            # a late buffer waits in the clock until it is known whether buffers
+            # were dropped before it, so the gap line goes in the right place
+            for lost, (data_raw, tStart, reconnect) in clock.hold((data_raw, tStart, session.gap),
+                                                                  tArrive, samples, known, keepPacket):
+                if reconnect is not None:   # recording continues in the same file, marked
+                    logGap(reconnect[0], reconnect[1], reconnect[2], tStart)
+                if lost is not None:        # buffers dropped on the way, just before this one
+                    logGap(lost[0], lost[1], 0, tStart)
+                mV, t = recordPacket(data_raw, tStart, t)
+                packets += 1
+                if (packets % dispLines) == 0:
+                    avg = np.average(mV, axis=1)   # all channels in one pass
+                    std = np.std(mV, axis=1)
+                    now = datetime.now()
+                    tStr = now.strftime('%H:%M:%S')
+                    print("Time:%s avg: %s std: %s" % (tStr,
+                          " ".join("%.3f" % a for a in avg), " ".join("%.3f" % d for d in std)))
+                    print("  Writer %s" % writer.status())
+                    print("  Timing %s" % clock.status())
+                    print("  Stages %s" % times.status())
 
-            print("%.2f" % mV[0],end=" ", flush=True)
             if outState1:
               if outLevel1:
-                fout.write(", ")  # 2nd column: input1 went high
+                logEdge(0, tDelta1, gpioPad)  # 1st column after data: input1 went high
                 print("T1H, ",end="")
               else:
-                fout.write(",, ") # 3rd column, input1 went low
+                logEdge(1, tDelta1, gpioPad)  # 2nd column after data: input1 went low
                 print("T1L, ",end="")
 
-              fout.write("%5.1f\n" % tDelta1) # GPIO edge time delta, to file
               # print("%5.1f, " % tDelta1) # GPIO edge time delta from prior, to display
               outState1 = False
 
             if outState2:
               if outLevel2:
-                fout.write(",,, ") # 4th column: input2 went high
+                logEdge(2, tDelta2, gpioPad)  # 3rd column after data: input2 went high
                 print("T2H, ",end="")
               else:
-                fout.write(",,,, ") # 5th column: input2 went low
+                logEdge(3, tDelta2, gpioPad)  # 4th column after data: input2 went low
                 print("T2L, ",end="")
 
-              fout.write("%5.1f\n" % tDelta2) # GPIO edge time delta, to file
               # print("%5.1f, " % tDelta2) # GPIO edge time delta from prior, to display
               outState2 = False
 
-            packets += 1
-            if (packets % dispLines) == 0:
-                avg = np.average(mV)
-                std = np.std(mV)
-                now = datetime.now()
-                time = now.strftime('%H:%M:%S')
-                print("Time:%s avg: %.3f std: %.3f" % (time, avg, std))
+            if dumpTimes:
+                dumpTimes = False
+                times.dump(timingFile, datfile)
+                print("\nStage timing appended to %s" % timingFile)
+            t = time.perf_counter_ns()   # GPIO and console output are not part of any stage
           except Exception as e:
             print("Had error:")
             print(e)
             break
+
+        for lost, (data_raw, tStart, reconnect) in clock.flush():   # still waiting: record as they are
+            recordPacket(data_raw, tStart, time.perf_counter_ns())
+        now = datetime.now()
+        timeString = now.strftime('%Y-%m-%d %H:%M:%S')
+        print('\nProgram stopped at %s' % timeString)
+        if not binMode:
+            writer.put(fout.write, '# Program stopped at %s' % timeString)
+        writer.close()       # write out whatever is still queued, then close file
+        print("Writer: %s" % writer.status())
+        print("Total data points: %d" % totalPoints)
+        print("Timing: %s" % clock.status())
+        print("Stages: %s" % times.status())
+        if session.reconnects > 0:
+            print("Reconnects: %d, lost %.3f s (%d samples)" %
+                  (session.reconnects, session.lostNs / 1E9, session.lostSamples))
+        print("Data filename: %s" % datfile)
         
 
 # ---------------------------------------------------------------
@@ -182,18 +257,6 @@ def runADC():
 
 if __name__ == "__main__":
 
-    # ----- GPIO pin config ----
-    GPIO.setwarnings(False)  # avoid nag about GPIO already in use
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(IN1_GPIO, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)  # external input #1
-    GPIO.setup(IN2_GPIO, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)  # external input #2
-    GPIO.setup(LED_GPIO, GPIO.OUT)
-    GPIO.add_event_detect(IN1_GPIO, GPIO.BOTH,
-            callback=button_callback, bouncetime=20)
-    GPIO.add_event_detect(IN2_GPIO, GPIO.BOTH,
-            callback=button_callback, bouncetime=20)
-
-
     signal.signal(signal.SIGINT, signal_handler)  # control-C
     # ------------
     outState1 = False  # if this pin had a state change
@@ -212,24 +275,49 @@ if __name__ == "__main__":
     saveDir = "."         # By default, save logged data in current directory
        
     print(version)        # this program version       
+    if "-b" in sys.argv:  # binary recording, may appear anywhere on the command line
+        binMode = True
+        sys.argv.remove("-b")
     argc = len(sys.argv)
     if (argc < 2):      # with no arguments, just print help message
-        print("Usage: %s <IP_address> [<output_directory>] [<msec_aq>] [<sample_rate>]" % sys.argv[0])
+        print("Usage: %s [-b] <IP_address> [<output_directory>] [<msec_aq>] [<sample_rate>] [<channels>]" % sys.argv[0])
+        print("  -b : record raw ADC codes in compact binary blocks; convert with adcbin2csv.py")
         print("  <IP_address> : domain name, eg. 'analog.local' or IP address of host eg. '192.168.1.202'")
+        print("                 or fake:[realtime,latency=ms,jitter=ms,dropout=p] for a simulated ADC")
         print("  <output_directory> : where to store recorded data, defaults to current directory")
         print("  <msec_aq> : how many milliseconds for each acquisition (default 500 msec)")
         print("  <sample_rate> : how many samples per second (default 1000 samples per second)")
+        print("  <channels> : comma-separated ADC channels to record, eg. '0,1,2' (default 0)")
         print()
         
-        print("Example:\n   %s analog C:/temp 500 1000\n" % sys.argv[0])
+        print("Example:\n   %s analog C:/temp 500 1000 0,1\n" % sys.argv[0])
         sys.exit()
         
     if (argc > 1):
         ADC_IP = sys.argv[1]  # takes one argument, the IP address of target device            
         
     adc1_ip = "ip:"+ADC_IP       # local LAN RPi with attached ADC
+    if ADC_IP.startswith("fake:"):
+        adc1_ip = ADC_IP         # simulated ADC (adciio.py), no hardware needed
     print("Using ADC device IP:%s" % ADC_IP)
 
+    # ----- GPIO pin config ----
+    useGPIO = GPIO is not None and not ADC_IP.startswith("fake:")
+    if useGPIO:
+        GPIO.setwarnings(False)  # avoid nag about GPIO already in use
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(IN1_GPIO, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)  # external input #1
+        GPIO.setup(IN2_GPIO, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)  # external input #2
+        GPIO.setup(LED_GPIO, GPIO.OUT)
+        GPIO.add_event_detect(IN1_GPIO, GPIO.BOTH,
+                callback=button_callback, bouncetime=20)
+        GPIO.add_event_detect(IN2_GPIO, GPIO.BOTH,
+                callback=button_callback, bouncetime=20)
+    else:
+        print("No GPIO: edge inputs not recorded")
+
+    if (argc > 5):
+        channels = parseChannels(sys.argv[5])
     if (argc > 4):        
         rate = int(sys.argv[4])
     if (argc > 3):
@@ -247,6 +335,7 @@ if __name__ == "__main__":
         sys.exit()
 
     signal.signal(signal.SIGINT, signal_handler)  # handle SIGINT from Control-C
+    signal.signal(signal.SIGUSR1, dump_handler)   # kill -USR1: dump stage timing
     #signal.pause()
 
     samples = int(aqTime * rate)    # record this many points at one time
@@ -254,9 +343,15 @@ if __name__ == "__main__":
     timeString = now.strftime('%Y-%m-%d %H:%M:%S')
     fname = now.strftime('%Y%m%d_%H%M%S_log')
     datfile = saveDir +"/" + fname + ("_%d.csv" % rate)       # use this file to save ADC readings       
+    if binMode:
+        datfile = saveDir +"/" + fname + ("_%d.adcb" % rate)  # binary blocks, see adcrecord.py
+    timingFile = saveDir + "/" + fname + "_timing.csv"   # stage timing, written on kill -USR1
     print("recording to file: %s  at %d sps, dur %.3f sec"  % (datfile,rate,aqTime))
+    print("kill -USR1 %d appends stage timing to %s" % (os.getpid(), timingFile))
     print("Type control-C to stop recording")
         
-    fout = open(datfile, "w")       # erase pre-existing file if any
+    fout = open(datfile, "wb" if binMode else "w")       # erase pre-existing file if any
 
     runADC()
+    if useGPIO:
+        GPIO.cleanup()   # after the writer has drained
@@ -6,79 +6,260 @@
 # UDP part based on
 # http://sfriederichs.github.io/how-to/python/udp/2017/12/07/UDP-Communication.html
 
+# The receive loop waits in select/epoll (selectors) until a datagram is
+# there, then drains every queued datagram with recvfrom_into into one
+# reused buffer: no 10 ms sleep per datagram, no allocation per receive.
+# A large SO_RCVBUF lets the kernel hold a burst while we are busy. The
+# serial port (115200 baud, ~11 kB/s) is far slower than a fast stream,
+# so it is written by its own thread from a bounded queue: when it falls
+# behind, the oldest lines are dropped there, never datagrams here.
+#
+# Binary datagrams go through a jitter buffer (adcudp.JitterBuffer): held
+# for 'jitterDelay' seconds, put back in order, and written out at the
+# sample rate, with lost stretches filled in ('conceal': a straight line,
+# or 'nan' lines). jitterDelay = 0 writes each datagram as it arrives.
+#
+# Counters on the status line:
+#   kernel      datagrams dropped because the socket buffer was full (Linux)
+#   lost/dup/reordered/late   from sequence numbers (adcudp.SeqTracker)
+#   bad         binary datagrams that did not parse
+#   truncated   datagrams larger than rxBytes
+#   serial      chunks of text the serial port had no time for
+#   jitter      buffer depth, datagrams too late to play, samples concealed
+#
+# Several receivers can watch one sender (adcudp.UdpPublisher): with -m
+# this one joins the multicast group the sender publishes to; with -s it
+# registers with a sender started with 'sub:<port>', repeating the hello
+# every helloSec seconds and asking for at most subLimit bytes per second
+# (more than that is dropped at the sender, for this receiver only).
+#
+# Usage:
+#   UDP-Rx-test.py [-m <group>] [-s <host:port>] [<UDP port>] [<serial port> | -]
+#   ('-': no serial output, counters only)
+
 import socket                 # get UDP packets from network port
+import selectors              # wait for data without polling
+import struct                 # SO_RXQ_OVFL drop counter
 from threading import Thread  # multi-threaded
 from time import sleep        # delay the right amount
-import serial                 # send data to serial port
 import sys
+import time                   # once-a-second status line
+import queue                  # queue.Empty from PacketQueue.get
+from adcudp import isDatagram, parse, SeqTracker, JitterBuffer, CONCEAL_INTERP  # binary datagram format
+from adcudp import SUB_HELLO, SUB_BYE   # subscribing to a sender (-s)
+from adcacq import PacketQueue, DROP_OLDEST       # serial output queue
+try:
+    import serial             # send data to serial port (pyserial)
+except ImportError:
+    serial = None
 
 serPort = 'COM3'   # serial port to receive data coming from network
+statusSec = 1.0    # seconds between status lines (binary streams)
+rcvBuf = 4 * 2**20 # SO_RCVBUF: bytes the kernel may queue for us (Linux caps it at net.core.rmem_max)
+rxBytes = 2048     # receive buffer: a whole datagram up to one 1500-byte MTU, with room to spare
+serDepth = 256     # text chunks waiting for the serial port before the oldest are dropped
+jitterDelay = 0.2  # seconds datagrams are held to put them in order; 0: write them as they arrive
+maxJitter = 1.0    # buffer depth (seconds) beyond which playout skips ahead
+conceal = CONCEAL_INTERP   # lost samples: CONCEAL_INTERP (straight line) or CONCEAL_MARK ('nan')
+helloSec = 2.0     # -s: seconds between hellos (the sender forgets us after 10 s without one)
+subLimit = 0       # -s: bytes per second we ask the sender for; 0: the sender's default
+SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL", 40)   # Linux: kernel drop count with each datagram
 
 exit = False
 
-def rxThread(portNum):
+# ----------------------------------------------------
+# serial port writer: its own thread, so a slow port never stalls the receiver
+
+def serThread(s, q):
+    while not exit:
+        try:
+            data = q.get(block=True, timeout=0.5)
+        except queue.Empty:
+            continue
+        s.write(data)
+
+def rxThread(portNum, serName, group=None, server=None):
     global exit
-    
+
     #Generate a UDP socket
     rxSocket = socket.socket(socket.AF_INET, #Internet
-                             socket.SOCK_DGRAM) #UDP                             
+                             socket.SOCK_DGRAM) #UDP
+    rxSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvBuf)
+    kernelDrops = sys.platform.startswith("linux")
+    if kernelDrops:
+        rxSocket.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+    if group is not None:     # several receivers on this machine may join the same group
+        rxSocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     rxSocket.bind(("",portNum))
-    #Prevent socket from blocking while receiving specified byte count   
-    rxSocket.setblocking(0)
+    if group is not None:     # multicast: ask the kernel (and switches, IGMP) for the group
+        mreq = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton("0.0.0.0"))
+        rxSocket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    hello = None
+    if server is not None:    # subscribe: the sender replies to this socket's address
+        host, port = server.rsplit(":", 1)
+        server = (socket.gethostbyname(host), int(port))
+        hello = SUB_HELLO + (b" %d" % subLimit if subLimit else b"")
+    tHello = 0.0
+    rxSocket.setblocking(False)   # drain until empty, then wait in select again
+    sel = selectors.DefaultSelector()
+    sel.register(rxSocket, selectors.EVENT_READ)
 
-    s = serial.Serial(serPort, 115200, timeout=0.5) # serial port to receive data
-    
-    print("RX: Receiving data on UDP port " + str(portNum))
+    serQ = PacketQueue(serDepth, DROP_OLDEST)
+    s = None
+    if serName != "-":
+        s = serial.Serial(serName, 115200, timeout=0.5) # serial port to receive data
+        Thread(target=serThread, args=(s, serQ), daemon=True).start()
+
+    print("RX: Receiving data on UDP port %d, socket buffer %d bytes%s" %
+          (portNum, rxSocket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF),
+           "" if group is None else ", multicast group " + group))
+    if server is not None:
+        print("RX: subscribing to %s:%d" % server)
     print("")
-    
+
+    buf = bytearray(rxBytes)  # every datagram lands here
+    view = memoryview(buf)
+    ancSize = socket.CMSG_SPACE(4)
+    tracker = SeqTracker()    # loss, duplicates, reordering of binary datagrams
+    jb = JitterBuffer(jitterDelay, maxJitter, conceal) if jitterDelay > 0 else None
+    badGrams = 0              # binary datagrams that did not parse
+    truncated = 0             # datagrams bigger than rxBytes
+    dropped = 0               # kernel: socket buffer overflowed
+    samples = 0               # samples per channel received
+    tStatus = time.monotonic() + statusSec
+
+    def status():
+        return ("RX: %s bad:%d truncated:%d kernel:%d serial:%d  %.0f sps%s" %
+                (tracker.status(), badGrams, truncated, dropped, serQ.dropped,
+                 samples / max(time.monotonic() - tStart, 1E-3),
+                 "" if jb is None else "  " + jb.status()))
+
+    def write(mV):            # (channels x n) mV -> text lines to the serial port
+        if s is not None:
+            rowFmt = ", ".join(["%0.5f"] * mV.shape[0]) + "\n"
+            serQ.put(((rowFmt * mV.shape[1]) % tuple(mV.T.ravel())).encode())
+
+    tStart = time.monotonic()
     while not exit:
         try:
-            data,addr = rxSocket.recvfrom(1024) # request this many bytes
-            print(data.decode('UTF-8'))
-            s.write(data)  # send received bytes out serial port
+            if hello is not None and time.monotonic() > tHello:
+                tHello = time.monotonic() + helloSec
+                try:
+                    rxSocket.sendto(hello, server)
+                except OSError:
+                    pass          # sender not reachable yet: try again next time
+            if not sel.select(timeout=0.5 if jb is None else 0.02):   # playout needs a steady tick
+                if jb is not None:
+                    out = jb.take(time.monotonic())
+                    if out is not None:
+                        write(out)
+                continue
+            while True:        # everything queued in the kernel, then back to select
+                try:
+                    if kernelDrops:
+                        n, anc, flags, addr = rxSocket.recvmsg_into([buf], ancSize)
+                        for level, kind, value in anc:
+                            if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL:
+                                dropped = struct.unpack("I", value[:4])[0]   # running total
+                        if flags & socket.MSG_TRUNC:
+                            truncated += 1
+                            continue
+                    else:
+                        n, addr = rxSocket.recvfrom_into(buf)
+                        if n == rxBytes:
+                            truncated += 1
+                            continue
+                except BlockingIOError:
+                    break
+                data = view[:n]
+                if isDatagram(data):   # binary: header, then packed samples
+                    try:
+                        hdr, codes = parse(data)
+                    except ValueError:
+                        badGrams += 1
+                        continue
+                    use = tracker.add(hdr['stream'], hdr['seq'])
+                    if use in ("new", "reordered"):  # reordered ones still go out, just later
+                        samples += hdr['count']
+                        mV = codes * (hdr['scale'] * 1000)
+                        if jb is not None:
+                            jb.put(hdr, mV, time.monotonic())
+                        else:
+                            write(mV)
+                else:                  # text lines, as in-tx-udp.py sends
+                    text = bytes(data)
+                    print(text.decode('UTF-8'))
+                    if s is not None:
+                        serQ.put(text)     # send received bytes out serial port
+            if jb is not None:
+                out = jb.take(time.monotonic())
+                if out is not None:
+                    write(out)
+            if tracker.received and time.monotonic() > tStatus:
+                tStatus += statusSec
+                print(status())
 
-        except socket.error: # ignore error from no data
-            pass
         except KeyboardInterrupt:
             exit = True
             break
 
-        sleep(.01)
+    if hello is not None:
+        try:
+            rxSocket.sendto(SUB_BYE, server)   # sender stops at once instead of timing out
+        except OSError:
+            pass
+    sel.close()
+    rxSocket.close()
+    if s is not None:
+        s.close()  # now done with output serial port
+    if tracker.received:
+        print(status())
+
 
-    s.close()  # now done with output serial port
-       
-    
-def main(args):    
+def main(args):
     global exit
     print("UDP Rx Example application")
     print("Press Ctrl+C to exit")
     print("")
-    
+
     host = ""
     portNum = 8000  # an arbitrary choice of port number
-   
-    udpRxThreadHandle = Thread(target=rxThread,args=(portNum,))    
+    serName = serPort
+    group = None
+    server = None
+    if "-m" in args:          # join a multicast group
+        i = args.index("-m")
+        group = args[i+1]
+        del args[i:i+2]
+    if "-s" in args:          # register with a sender
+        i = args.index("-s")
+        server = args[i+1]
+        del args[i:i+2]
+    if len(args) > 0:
+        portNum = int(args[0])
+    if len(args) > 1:
+        serName = args[1]
+    if serial is None and serName != "-":
+        print("pyserial not installed: no serial output, counters only")
+        serName = "-"
+
+    udpRxThreadHandle = Thread(target=rxThread,args=(portNum,serName,group,server))
     udpRxThreadHandle.start()
-        
+
     sleep(.1)
-          
+
     while (not exit):
         try:
-            sleep(.2)
-            
-        except socket.error as msg:    
-            #If no data is received you end up here, but you can ignore
-            #the error and continue
-            pass   
+            sleep(.3)
+
         except KeyboardInterrupt:
             exit = True
             print("Received Ctrl+C... initiating exit")
             break
-        sleep(.1)
-         
+
     udpRxThreadHandle.join()
-        
+
     return
 
 if __name__=="__main__":
-    main(sys.argv[1:0])     
+    main(sys.argv[1:])
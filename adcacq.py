@@ -0,0 +1,217 @@
+# Acquisition thread for the ADC scripts: a small state machine that
+# sleeps on a condition variable instead of spinning while paused
+# 17-Oct-2026
+
+# States:
+#   RUNNING     call the packet function over and over (it blocks in rx())
+#   PAUSED      thread sleeps until resume() or stop()
+#   RECONFIG    like PAUSED, but reconfigure() holds it here while it runs
+#   STOPPING    stop() was called; thread exits after the current packet
+#   STOPPED     thread has exited (or never started)
+#
+# pause(), reconfigure() and stop() wait until the thread is really out of
+# its packet function, so the caller knows no rx() is in progress.
+# post() does not wait at all: it queues a function for the acquisition
+# thread to run between packets, eg. to change the buffer size.
+
+import threading   # acquisition thread and condition variable
+import time        # thread CPU time
+import queue       # queue.Empty, so PacketQueue can stand in for queue.Queue
+import collections # deque for PacketQueue
+
+RUNNING = "running"
+PAUSED = "paused"
+RECONFIG = "reconfiguring"
+STOPPING = "stopping"
+STOPPED = "stopped"
+
+class AcqThread:
+
+    def __init__(self, getPacket, name="acq"):
+        self.getPacket = getPacket       # called once per packet while RUNNING
+        self.state = PAUSED
+        self.busy = False                # True while inside getPacket()
+        self.error = None                # exception that stopped the thread, if any
+        self.packets = 0                 # packets acquired
+        self.pending = []                # functions post()ed to run between packets
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._clock = None               # CPU-time clock of the acquisition thread, once it runs
+        self._lastCpu = 0.0
+        self._lastWall = time.monotonic()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.busy = False
+                self.cond.notify_all()           # wake anyone waiting in _waitIdle()
+                while self.state in (PAUSED, RECONFIG) and not self.pending:
+                    self.cond.wait()             # sleep, no CPU used while paused
+                if self.state == STOPPING:
+                    break
+                jobs = self.pending
+                self.pending = []
+                self.busy = True
+            try:
+                for func in jobs:
+                    func()
+                if self.state != RUNNING:
+                    continue                     # woken only to run post()ed jobs
+                self.getPacket()
+                self.packets += 1
+            except Exception as e:
+                self.error = e
+                print("Acquisition stopped by error: %s" % e)
+                break
+        with self.cond:
+            self.state = STOPPED
+            self.busy = False
+            self.cond.notify_all()
+
+    def _set(self, state):
+        with self.cond:
+            if self.state != STOPPED:
+                self.state = state
+            self.cond.notify_all()
+
+    def _waitIdle(self, timeout):
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.busy, timeout)
+
+    def start(self):
+        self.state = RUNNING
+        self.thread.start()
+
+    def resume(self):
+        self._set(RUNNING)
+
+    # returns True once no packet is in progress (False on timeout)
+    def pause(self, timeout=None):
+        self._set(PAUSED)
+        return self._waitIdle(timeout)
+
+    # run func() with acquisition held idle, then resume
+    def reconfigure(self, func, timeout=None):
+        self._set(RECONFIG)
+        self._waitIdle(timeout)
+        try:
+            func()
+        finally:
+            self._set(RUNNING)
+
+    # run func() on the acquisition thread before its next packet; returns at once
+    def post(self, func):
+        with self.cond:
+            self.pending.append(func)
+            self.cond.notify_all()
+
+    def stop(self, timeout=None):
+        self._set(STOPPING)
+        if self.thread.is_alive() and threading.current_thread() is not self.thread:
+            self.thread.join(timeout)
+        return not self.thread.is_alive()
+
+    def running(self):
+        return self.state == RUNNING
+
+    def stopped(self):
+        return self.state in (STOPPING, STOPPED)
+
+    # CPU seconds the acquisition thread has used, read from the calling
+    # thread through its per-thread clock (Linux); elsewhere falls back to
+    # the CPU time of the whole process
+    def _threadCpu(self):
+        if not hasattr(time, "pthread_getcpuclockid"):
+            return time.process_time()
+        if not self.thread.is_alive():
+            return self._lastCpu             # not started or exited: no more CPU used
+        if self._clock is None:
+            self._clock = time.pthread_getcpuclockid(self.thread.ident)
+        try:
+            return time.clock_gettime(self._clock)
+        except OSError:                      # exited since is_alive()
+            return self._lastCpu
+
+    # acquisition thread CPU use in percent since the last call;
+    # about 0 while paused, since the thread is asleep on the condition
+    def cpuPercent(self):
+        now = time.monotonic()
+        cpu = self._threadCpu()
+        pct = 100.0 * (cpu - self._lastCpu) / max(now - self._lastWall, 1E-6)
+        self._lastCpu = cpu
+        self._lastWall = now
+        return pct
+
+# ----------------------------------------------------
+# Bounded packet queue between the acquisition thread and its consumer.
+# When full, put() either
+#   DROP_OLDEST : throws away the oldest waiting packet (display: stay current)
+#   BLOCK       : waits for room (recording: lose nothing, but rx() is delayed)
+# and counts it, so the GUI can show when it is not keeping up.
+
+DROP_OLDEST = "drop-oldest"
+BLOCK = "block"
+
+class PacketQueue:
+
+    def __init__(self, maxDepth=10, policy=DROP_OLDEST):
+        self.maxDepth = maxDepth
+        self.policy = policy
+        self.items = collections.deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0                 # packets discarded by DROP_OLDEST
+        self.blocked = 0                 # times put() had to wait (BLOCK)
+        self.blockedTime = 0.0           # seconds put() spent waiting
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) >= self.maxDepth:
+                if self.policy == DROP_OLDEST:
+                    self.items.popleft()
+                    self.dropped += 1
+                else:
+                    t0 = time.monotonic()
+                    self.blocked += 1
+                    self.cond.wait_for(lambda: len(self.items) < self.maxDepth or self.closed
+                                       or self.policy == DROP_OLDEST)   # setPolicy() also lets it go
+                    self.blockedTime += time.monotonic() - t0
+                    if self.closed:
+                        return
+                    if len(self.items) >= self.maxDepth:   # still full: switched to DROP_OLDEST
+                        self.items.popleft()
+                        self.dropped += 1
+            self.items.append(item)
+            self.cond.notify_all()
+
+    def get(self, block=False, timeout=None):
+        with self.cond:
+            if block and not self.cond.wait_for(lambda: self.items, timeout):
+                raise queue.Empty
+            if not self.items:
+                raise queue.Empty
+            item = self.items.popleft()
+            self.cond.notify_all()       # room for a blocked put()
+            return item
+
+    def empty(self):
+        return len(self.items) == 0
+
+    def qsize(self):
+        return len(self.items)
+
+    def clear(self):
+        with self.cond:
+            self.items.clear()
+            self.cond.notify_all()
+
+    def setPolicy(self, policy):
+        with self.cond:
+            self.policy = policy
+            self.cond.notify_all()
+
+    # release a put() blocked on a full queue, eg. when quitting
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
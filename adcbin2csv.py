@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+# Export a binary ADC recording (REC2.py -b) to the same mV CSV layout
+# that REC2.py writes in text mode
+# 17-Oct-2026
+
+import sys
+import struct
+import numpy as np
+from adcdecode import calcVolt
+from adcrecord import readBlocks, csvHeader, gapLine, KIND_DATA, KIND_EVENT, KIND_GAP, EVENT_FMT, GAP_FMT
+
+# blocks missing from the sequence (eg. dropped by adcbroker.py's queue for a
+# recorder that fell behind) get a gap line for the time between the data
+# either side of them, so the time axis stays right; a recording made by
+# joining a running broker starts at the broker's current sequence number
+
+def export(fin, fout):
+    header = False
+    nextSeq = None
+    blocks = 0
+    lastEnd = None               # ns: end of the last data block, plus any gap after it
+    missing = False              # blocks skipped since the last data block
+    for hdr, payload in readBlocks(fin):
+        if not header:           # column header from the first block's channel map
+            fout.write(csvHeader(hdr['channels']))
+            nChan = hdr['nChan']
+            gpioPad = "," * nChan
+            header = True
+        if nextSeq is not None and hdr['seq'] != nextSeq:
+            print("Warning: blocks %d to %d missing" % (nextSeq, hdr['seq']-1), file=sys.stderr)
+            missing = True
+        nextSeq = hdr['seq'] + 1
+        blocks += 1
+
+        if hdr['kind'] == KIND_DATA:
+            if missing and lastEnd is not None:
+                lostNs = max(0, hdr['tStart'] - lastEnd)
+                fout.write(gapLine(lostNs, int(round(lostNs * hdr['rate'] / 1E9))))
+            missing = False
+            mV = calcVolt(payload) * 1000        # whole block at once, samples x nChan
+            np.savetxt(fout, mV, fmt='%0.5f', delimiter=', ')  # same row format as REC2.py
+            lastEnd = hdr['tStart'] + int(hdr['samples'] * 1E9 / hdr['rate'])
+        elif hdr['kind'] == KIND_EVENT:
+            column, tDelta = struct.unpack(EVENT_FMT, payload)
+            fout.write(gpioPad + "," * column + " " + "%5.1f\n" % tDelta)
+        elif hdr['kind'] == KIND_GAP:
+            lostNs, lostSamples, attempts = struct.unpack(GAP_FMT, payload)
+            fout.write(gapLine(lostNs, lostSamples, attempts))
+            if lastEnd is not None:
+                lastEnd += lostNs        # already marked: not lost again to missing blocks
+    return blocks
+
+if __name__ == "__main__":
+
+    argc = len(sys.argv)
+    if (argc < 2):
+        print("Usage: %s <binary_file> [<csv_file>]" % sys.argv[0])
+        print("  <binary_file> : recording made with REC2.py -b")
+        print("  <csv_file> : output file, defaults to the input name ending in .csv\n")
+        sys.exit()
+
+    binfile = sys.argv[1]
+    if (argc > 2):
+        csvfile = sys.argv[2]
+    else:
+        csvfile = binfile.rsplit(".", 1)[0] + ".csv"
+
+    with open(binfile, "rb") as fin, open(csvfile, "w") as fout:
+        try:
+            blocks = export(fin, fout)
+        except ValueError as e:
+            print("Stopped at damaged data: %s" % e)   # keep what was good up to here
+            blocks = None
+    if blocks is not None:
+        print("Wrote %d blocks to %s" % (blocks, csvfile))
+    else:
+        print("Wrote partial data to %s" % csvfile)
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+
+# One process owns the AD7124 and shares its data with any number of
+# local programs (recorder, plotter, UDP forwarder) over a Unix socket
+# 17-Oct-2026
+
+# Only one program at a time can use the ADC: REC2.py and ADC1.py each
+# open their own adi.ad7124 context and fight over the IIO buffer. The
+# broker opens it once, runs rx() once per packet, encodes the packet once
+# as an adcrecord.py data block and fans those same bytes out to every
+# subscriber.
+#
+# Each subscriber has its own bounded queue (adcacq.PacketQueue,
+# drop-oldest) and its own sender thread, so a subscriber that stops
+# reading only loses its own packets: rx() and the other subscribers never
+# wait for it. Blocks carry sequence numbers, so a subscriber sees exactly
+# which packets it lost (adcbin2csv.py warns about the gap).
+#
+# Subscribing: connect to the socket and send one line
+#   <name> [<queue depth>]\n
+# then read adcrecord blocks (readBlocks) until the broker goes away.
+# subscribe() below does this for you.
+#
+# Usage:
+#   adcbroker.py <IP_address> [<msec_aq>] [<sample_rate>] [<channels>] [<socket>]
+#   adcbroker.py -r <file.adcb> [<socket>]    recorder: save the stream as a binary recording
+#   adcbroker.py -u <host:port> [<socket>]    forwarder: binary UDP datagrams (adcudp.py; udpBinary)
+#                                             host: a receiver, a multicast group, or 'sub'
+#   ADC1.py unix:<socket>                     plotter
+
+import sys
+import os          # remove a stale socket file
+import socket      # Unix socket to subscribers, UDP for the forwarder
+import threading   # accept thread, one sender thread per subscriber
+import queue       # queue.Empty from PacketQueue.get
+import signal      # handle control-C
+import time        # time.time_ns() for block time stamps
+from datetime import datetime  # for time/date timestamp on status line
+from adcacq import PacketQueue, DROP_OLDEST  # per-subscriber bounded queue
+from adcrecord import BinWriter, readBlocks  # block format shared with REC2.py -b
+from adcdecode import calcVolt
+from adcudp import UdpPacker, UdpPublisher   # binary UDP datagrams with sequence numbers, fan-out
+
+version = "ADC Broker v0.2  (17-Oct-2026)"
+
+brokerPath = "/tmp/adcbroker.sock"  # default Unix socket
+defaultDepth = 16   # packets a subscriber may fall behind before its oldest are dropped
+maxDepth = 10000    # a recorder may ask for a long queue, but not an unbounded one
+udpBinary = True    # -u: binary datagrams (adcudp.py, UDP-Rx-test.py counts loss); False: mV text lines
+stopBroker = False  # set by control-C
+
+# ----------------------------------------------------
+# one connected subscriber: its own queue and sender thread
+
+class Subscriber:
+
+    def __init__(self, conn, name, depth):
+        self.conn = conn
+        self.name = name
+        self.q = PacketQueue(depth, DROP_OLDEST)  # never blocks publish()
+        self.sent = 0                    # blocks sent
+        self.closed = False
+        self.thread = threading.Thread(target=self._send, name="sub-" + name, daemon=True)
+        self.thread.start()
+
+    def _send(self):
+        while not self.closed:
+            try:
+                blob = self.q.get(block=True, timeout=1.0)
+            except queue.Empty:
+                continue
+            try:
+                self.conn.sendall(blob)  # may take as long as the subscriber likes
+                self.sent += 1
+            except OSError:
+                break                    # subscriber went away
+        self.closed = True
+        self.conn.close()
+
+    def close(self):
+        self.closed = True
+        self.q.close()
+
+    def status(self):
+        return "%s q:%d/%d sent:%d dropped:%d" % (self.name, self.q.qsize(), self.q.maxDepth,
+                                                   self.sent, self.q.dropped)
+
+# ----------------------------------------------------
+# listening socket and the list of subscribers
+
+class Broker:
+
+    def __init__(self, path=brokerPath):
+        self.path = path
+        if os.path.exists(path):
+            os.unlink(path)              # left over from a broker that did not exit cleanly
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(8)
+        self.subs = []
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._accept, name="accept", daemon=True)
+        self.thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return                   # close() was called
+            try:
+                conn.settimeout(5.0)     # a client that never says hello is dropped
+                hello = conn.makefile("r").readline().split()
+                conn.settimeout(None)
+                name = hello[0] if hello else "anon"
+                depth = min(int(hello[1]), maxDepth) if len(hello) > 1 else defaultDepth
+            except (OSError, ValueError):
+                conn.close()
+                continue
+            sub = Subscriber(conn, name, depth)
+            with self.lock:
+                self.subs.append(sub)
+            print("\nSubscriber '%s' connected (queue %d)" % (name, depth))
+
+    # the same bytes go to every subscriber's queue: encoded once
+    def publish(self, blob):
+        with self.lock:
+            for sub in self.subs:
+                if sub.closed:
+                    print("\nSubscriber '%s' left: %s" % (sub.name, sub.status()))
+                else:
+                    sub.q.put(blob)
+            self.subs = [s for s in self.subs if not s.closed]
+
+    def status(self):
+        with self.lock:
+            return "   ".join(s.status() for s in self.subs) or "no subscribers"
+
+    def close(self):
+        self.sock.close()
+        with self.lock:
+            for sub in self.subs:
+                sub.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+# ----------------------------------------------------
+# client side: connect and return a binary file to read blocks from
+
+def subscribe(path=brokerPath, name="client", depth=defaultDepth):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    sock.sendall(("%s %d\n" % (name, depth)).encode())
+    return sock.makefile("rb")
+
+# ----------------------------------------------------
+# the broker itself: rx(), encode once, publish
+
+def runBroker(adc1_ip, rate, samples, channels, path):
+    from adcdevice import initADC      # only the broker talks to the ADC
+    from adcdecode import decodeChannels
+
+    adc1 = initADC(rate, samples, adc1_ip, channels)  # initialize ADC with configuration
+    if (adc1 is None):
+        print("Error: unable to connect to ADC %s" % adc1_ip)
+        sys.exit()
+    rec = BinWriter(None, rate, channels)  # used only to encode blocks
+    broker = Broker(path)
+    nChan = len(channels)
+    aqNs = int(samples / rate * 1E9)
+    print("Serving %d sps, %d samples per packet, channels %s on %s" %
+          (rate, samples, ",".join(str(c) for c in channels), path))
+    print("Type control-C to stop")
+
+    packets = 0
+    dispLines = 10  # how many packets between status lines
+    while not stopBroker:
+        try:
+            data_raw = adc1.rx()         # the one and only rx()
+            tArrive = time.time_ns()
+            yr = decodeChannels(data_raw, samples, nChan)  # (channels x samples) view
+            broker.publish(rec.packData(yr, tArrive - aqNs))
+            packets += 1
+            if (packets % dispLines) == 0:
+                print("Time:%s packets:%d   %s" % (datetime.now().strftime('%H:%M:%S'),
+                                                   packets, broker.status()))
+        except Exception as e:
+            print("Had error:")
+            print(e)
+            break
+    broker.close()
+    print("\nBroker stopped after %d packets" % packets)
+
+# ----------------------------------------------------
+# recorder subscriber: blocks straight to a file (same as REC2.py -b)
+
+def runRecorder(fname, path):
+    fin = subscribe(path, "recorder", maxDepth)  # long queue: rather late than lost
+    with open(fname, "wb") as fout:
+        blocks = 0
+        for hdr, blob in readBlocks(fin, raw=True):   # checked, then written as received
+            fout.write(blob)
+            blocks += 1
+            if stopBroker:
+                break
+    print("Recorded %d blocks to %s" % (blocks, fname))
+
+# ----------------------------------------------------
+# UDP forwarder subscriber: binary datagrams, or mV text lines, one sample
+# per line, as in-tx-udp.py sends
+
+def runForwarder(dest, path, maxBytes=1400):
+    pub = UdpPublisher(dest)         # one receiver, a multicast group, or subscribers
+    print("Forwarding to %s" % pub.mode)
+    fin = subscribe(path, "udp", defaultDepth)  # live data: drop rather than fall behind
+    packer = None
+    nextSeq = None
+    for hdr, payload in readBlocks(fin):
+        if udpBinary:
+            if packer is None:
+                packer = UdpPacker(hdr['rate'], hdr['nChan'])
+            if nextSeq is not None and hdr['seq'] > nextSeq:   # our broker queue dropped blocks
+                packer.skip((hdr['seq'] - nextSeq) * hdr['samples'])
+            nextSeq = hdr['seq'] + 1
+            for gram in packer.pack(payload.ravel(), hdr['tStart']):   # payload is interleaved
+                pub.send(gram)
+            if stopBroker:
+                break
+            continue
+        rowFmt = ", ".join(["%0.5f"] * hdr['nChan']) + "\n"
+        mV = calcVolt(payload) * 1000
+        data = ((rowFmt * len(mV)) % tuple(mV.ravel())).encode()  # one format op per block
+        start = 0
+        while start < len(data):         # split at line ends to fit a datagram
+            end = data.rfind(b"\n", start, start + maxBytes) + 1
+            if end <= start:
+                end = start + maxBytes
+            pub.send(data[start:end])
+            start = end
+        if stopBroker:
+            break
+
+def signal_handler(sig, frame):
+    global stopBroker
+    stopBroker = True
+
+if __name__ == "__main__":
+
+    print(version)
+    argc = len(sys.argv)
+    if (argc < 2):
+        print("Usage: %s <IP_address> [<msec_aq>] [<sample_rate>] [<channels>] [<socket>]" % sys.argv[0])
+        print("       %s -r <file.adcb> [<socket>]" % sys.argv[0])
+        print("       %s -u <host:port> [<socket>]" % sys.argv[0])
+        print("  <IP_address> : domain name or IP address of host with ADC; this process owns the ADC")
+        print("  -r : subscribe and record the stream in binary blocks; convert with adcbin2csv.py")
+        print("  -u : subscribe and forward the data over UDP (binary datagrams, see UDP-Rx-test.py)")
+        print("       <host:port> may be a multicast group, or sub:<port> for receivers that register")
+        print("  <socket> : Unix socket path (default %s)" % brokerPath)
+        print("Plot from the broker with:  ADC1.py unix:%s\n" % brokerPath)
+        sys.exit()
+
+    if sys.argv[1] in ("-r", "-u"):  # subscriber modes
+        if (argc < 3):
+            print("Error: %s needs an argument" % sys.argv[1])
+            sys.exit()
+        path = sys.argv[3] if argc > 3 else brokerPath
+        if sys.argv[1] == "-r":
+            signal.signal(signal.SIGINT, signal_handler)  # finish the current block, then close
+            runRecorder(sys.argv[2], path)
+        else:
+            runForwarder(sys.argv[2], path)
+        sys.exit()
+
+    from adcdevice import parseChannels
+    aqTime = 0.20       # duration of 1 dataset, in seconds
+    rate = 1000         # readings per second
+    channels = [0]
+    path = brokerPath
+    adc1_ip = "ip:" + sys.argv[1]
+    if sys.argv[1].startswith("fake:"):
+        adc1_ip = sys.argv[1]           # simulated ADC (adciio.py)
+    if (argc > 2):
+        aqTime = int(sys.argv[2]) / 1000.0
+    if (argc > 3):
+        rate = int(sys.argv[3])
+    if (argc > 4):
+        channels = parseChannels(sys.argv[4])
+    if (argc > 5):
+        path = sys.argv[5]
+
+    signal.signal(signal.SIGINT, signal_handler)  # handle SIGINT from Control-C
+    runBroker(adc1_ip, rate, int(aqTime * rate), channels, path)
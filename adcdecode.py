@@ -0,0 +1,89 @@
+# Decode raw AD7124 buffers from Pyadi-iio into NumPy arrays
+# shared by ADC1, REC1/REC2, queue1 and the plotting scripts
+# 17-Oct-2026
+
+# The patched adi/rx_tx.py (see adi-fixes.txt) hands back the raw IIO buffer
+# as bytes. Older code did np.array(list(unpack("%dI" % n, data_raw))), which
+# builds one Python int per sample. Here we lay a typed NumPy view directly
+# over the buffer memory instead, so no per-sample Python objects are made.
+#
+# AD7124 samples are 24 bits stored in 32-bit words. With the DATA_STATUS
+# bit set in ADC_CONTROL the chip appends its 8-bit status register, and the
+# word holds (code << 8) | status instead.
+
+import numpy as np  # array manipulations
+
+FULL_SCALE = 2**24       # AD7124 code range (24 bits)
+CODE_MASK = 0xFFFFFF     # low 24 bits of a storage word hold the ADC code
+STATUS_MASK = 0xFF       # status byte, when appended to the data word
+Vref = 2.500             # voltage of ADC reference
+
+# byte order names accepted by decodeRaw(), same letters as the struct module
+byteOrders = {'=': '=', 'native': '=', '<': '<', 'little': '<', '>': '>', 'big': '>'}
+
+# ----------------------------------------------------
+# ADC codes (any shape) to volts
+
+def calcVolt(rawADC):
+    V = Vref * rawADC / FULL_SCALE    # ADC as fraction of full-scale
+    return V
+
+# ----------------------------------------------------
+# return uint32 view of one rx() buffer, no copy when possible
+
+def rawView(data_raw, samples=None, byteOrder='='):
+    order = byteOrders[byteOrder]
+    if isinstance(data_raw, np.ndarray):  # unpatched Pyadi-iio has already decoded it
+        words = data_raw
+    else:
+        words = np.frombuffer(data_raw, dtype=np.dtype(order + 'u4'))  # bytes, bytearray or memoryview
+    if samples is not None:
+        if len(words) < samples:
+            raise ValueError("buffer has %d words, expected %d" % (len(words), samples))
+        words = words[:samples]
+    return words
+
+# ----------------------------------------------------
+# decode one rx() buffer into ADC codes (and status bytes, if appended)
+#   status=False : words are plain 24-bit codes; returned as a view (no copy)
+#   status=True  : words are (code << 8) | status; returns (codes, status)
+#   mask=True    : force the upper 8 bits to zero (costs one vectorized copy)
+
+def decodeRaw(data_raw, samples=None, byteOrder='=', status=False, mask=False):
+    words = rawView(data_raw, samples, byteOrder)
+    if status:
+        codes = words >> 8
+        stat = (words & STATUS_MASK).astype(np.uint8)
+        return codes, stat
+    if mask:
+        return words & CODE_MASK
+    return words
+
+# ----------------------------------------------------
+# status byte fields (AD7124 datasheet, STATUS register 0x00)
+
+def statusChannel(stat):
+    return stat & 0x0F          # CH_ACTIVE: channel that produced this sample
+
+def statusError(stat):
+    return (stat & 0x40) != 0   # ERROR_FLAG: overflow/underflow or config error
+
+# ----------------------------------------------------
+# split an interleaved multi-channel buffer into (channels x samples)
+# rows are strided views into the same memory, nothing is copied
+
+def deinterleave(words, nChan):
+    if isinstance(words, (list, tuple)):  # unpatched Pyadi-iio: one array per channel
+        return np.vstack(words)
+    if len(words) % nChan != 0:
+        raise ValueError("%d words do not split into %d channels" % (len(words), nChan))
+    return words.reshape(-1, nChan).T
+
+# ----------------------------------------------------
+# decode + de-interleave in one step: returns (nChan x samples) array
+
+def decodeChannels(data_raw, samples, nChan=1, byteOrder='=', mask=False):
+    if isinstance(data_raw, (list, tuple)):
+        return deinterleave(data_raw, nChan)[:, :samples]
+    words = decodeRaw(data_raw, samples*nChan, byteOrder, mask=mask)
+    return deinterleave(words, nChan)
@@ -0,0 +1,197 @@
+# Set up the AD7124 ADC chip through the Pyadi-iio system
+# shared by ADC1.py and REC2.py
+# 17-Oct-2026
+
+import time        # backoff delays, arrival times
+try:
+    import adi     # Pyadi-iio interface to AD7124 ADC
+except ImportError:
+    adi = None     # fake: ADCs (adciio.py) still work without it
+import adciio      # our own raw-buffer libiio backend, no patched Pyadi-iio needed
+
+maxChannels = 8    # AD7124-8: up to 8 differential inputs in the sequencer
+rawIIO = True      # open the ADC as adciio.RawADC; False: adi.ad7124 (raw bytes need adi-fixes.txt)
+stopPoll = 0.1     # seconds between stop() checks while waiting to reconnect
+
+# ----------------------------------------------------
+# the ADC object all the setup below works on.
+#   kernelBuffers : IIO blocks queued in the kernel / iiod (None: libiio default, 4)
+#   prefetch      : buffers read ahead by a thread while the caller works
+#                   on the current one (RawADC only; 0: read on demand)
+#   zeroCopy      : rx() returns a view of the IIO buffer itself, valid only
+#                   until the next rx() (RawADC only, no prefetch)
+
+def openADC(uri, kernelBuffers=None, prefetch=0, zeroCopy=False):
+    if uri.startswith("fake:") or (rawIIO and adciio.iio is not None):
+        return adciio.RawADC(uri, kernelBuffers=kernelBuffers, prefetch=prefetch, zeroCopy=zeroCopy)
+    if adi is None:
+        raise ImportError("Pyadi-iio (module 'adi') not installed")
+    adc1 = adi.ad7124(uri=uri)
+    if kernelBuffers is not None:
+        adc1._rxadc.set_kernel_buffers_count(kernelBuffers)  # before the first rx() makes the buffer
+    if prefetch > 0:
+        print("Note: prefetch needs the raw IIO backend (adciio.py); reading on demand")
+    return adc1
+
+# libiio timeout, in milliseconds: long enough for one buffer to fill
+# plus network delay, short enough that a dead link raises an error
+# (ADCSession then reconnects) instead of hanging
+
+def rxTimeout(rate, samples):
+    return int(1000 * samples / rate) * 3 + 2000
+
+# ----------------------------------------------------
+# turn a command-line string like "0,1,3" into a list of channel numbers
+
+def parseChannels(chString):
+    channels = [int(c) for c in chString.split(",") if c.strip() != ""]
+    if len(channels) == 0 or len(channels) > maxChannels:
+        raise ValueError("need 1 to %d channels, got '%s'" % (maxChannels, chString))
+    if len(set(channels)) != len(channels):
+        raise ValueError("channel listed twice in '%s'" % chString)
+    return channels
+
+# ----------------------------------------------------
+# open and configure the ADC. 'samples' is per channel: with N channels
+# enabled, each rx() buffer holds samples*N words, interleaved
+# ch0,ch1,..chN-1,ch0,ch1,... (see adcdecode.deinterleave)
+# Note the chip's sequencer shares 'rate' between enabled channels.
+
+def initADC(rate, samples, adc1_ip, channels=(0,), kernelBuffers=None, prefetch=0, zeroCopy=False):
+
+    try:
+        adc1 = openADC(adc1_ip, kernelBuffers, prefetch, zeroCopy)
+    except Exception as e:
+        print("Attempt to open '%s' had error: " % adc1_ip,end="")
+        print(e)
+        adc1 = None
+
+    if (adc1 is not None):
+        sc = adc1.scale_available
+        configADC(adc1, rate, samples, channels, sc[-1])  # get highest range
+
+    return adc1
+
+# settings initADC makes; 'scale' already known, so nothing is read back from the device
+def configADC(adc1, rate, samples, channels, scale):
+    for ad_channel in channels:
+        adc1.channel[ad_channel].scale = scale
+    adc1.sample_rate = rate  # sets sample rate for all channels
+    adc1.rx_buffer_size = samples
+    adc1.rx_enabled_channels = list(channels)
+    adc1._ctx.set_timeout(rxTimeout(rate, samples))  # milliseconds
+
+# ----------------------------------------------------
+# change rate and buffer size on an open ADC, keeping its IIO context
+# (much quicker than a new initADC). Call between rx() calls only, eg.
+# from the acquisition thread via AcqThread.post()
+
+def reconfigADC(adc1, rate, samples):
+    adc1.rx_destroy_buffer()     # next rx() creates a buffer of the new size
+    adc1.sample_rate = rate      # sets sample rate for all channels
+    adc1.rx_buffer_size = samples
+    adc1._ctx.set_timeout(rxTimeout(rate, samples))
+
+# ----------------------------------------------------
+# ADC that survives a network drop, for unattended recording (REC2.py).
+# rx() retries instead of raising: first on the same IIO context with a
+# fresh buffer, then with new contexts, waiting baseDelay, 2*baseDelay, ...
+# up to maxDelay between attempts, until it works or stop() returns True.
+# Attributes read once at open() (scale) are reused, so a reconnect only
+# writes settings. After a recovery, 'gap' holds what was lost:
+#   (lost ns, lost samples per channel, attempts) ; None when nothing was lost
+
+class ADCSession:
+
+    def __init__(self, adc1_ip, rate, samples, channels=(0,), baseDelay=0.5, maxDelay=60.0, stop=None,
+                 kernelBuffers=None, prefetch=0, zeroCopy=False):
+        self.adc1_ip = adc1_ip
+        self.rate = rate
+        self.samples = samples
+        self.channels = list(channels)
+        self.kernelBuffers = kernelBuffers
+        self.prefetch = prefetch
+        self.zeroCopy = zeroCopy
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.stop = stop if stop is not None else (lambda: False)
+        self.adc1 = None
+        self.scale = None                # cached from scale_available on the first open
+        self.gap = None
+        self.tLast = None                # time.time_ns() when the last good rx() returned
+        self.reconnects = 0              # successful recoveries
+        self.lostNs = 0                  # total time lost to them
+        self.lostSamples = 0
+
+    def open(self):
+        try:
+            adc1 = openADC(self.adc1_ip, self.kernelBuffers, self.prefetch, self.zeroCopy)
+        except Exception as e:
+            print("Attempt to open '%s' had error: %s" % (self.adc1_ip, e))
+            return None
+        self.scale = adc1.scale_available[-1]   # the only read; reconnects reuse it
+        configADC(adc1, self.rate, self.samples, self.channels, self.scale)
+        self.adc1 = adc1
+        return adc1
+
+    def _reopen(self):
+        adc1 = openADC(self.adc1_ip, self.kernelBuffers, self.prefetch, self.zeroCopy)
+        configADC(adc1, self.rate, self.samples, self.channels, self.scale)
+        self.adc1 = adc1
+
+    # one buffer, like adc1.rx(); None only if stop() ended the retries
+    def rx(self):
+        self.gap = None
+        try:
+            data_raw = self.adc1.rx()
+        except Exception as e:
+            print("\nrx() failed: %s ... reconnecting" % e)
+            data_raw = self._recover()
+            if data_raw is None:
+                return None
+        tNow = time.time_ns()
+        if self.gap is not None:
+            self._measureGap(tNow)
+        self.tLast = tNow
+        return data_raw
+
+    def _recover(self):
+        attempts = 0
+        delay = self.baseDelay
+        while not self.stop():
+            attempts += 1
+            try:
+                if attempts == 1:
+                    self.adc1.rx_destroy_buffer()   # same context, fresh kernel buffer
+                else:
+                    self._reopen()                  # new context, cached settings
+                data_raw = self.adc1.rx()
+                self.gap = (0, 0, attempts)         # filled in by _measureGap
+                return data_raw
+            except Exception as e:
+                print("  attempt %d failed: %s; next in %.1f s" % (attempts, e, delay))
+            self._wait(delay)
+            delay = min(2 * delay, self.maxDelay)
+        return None
+
+    # sleep between attempts in short slices, so stop() ends a long backoff at once
+    def _wait(self, delay):
+        tEnd = time.monotonic() + delay
+        while not self.stop():
+            left = tEnd - time.monotonic()
+            if left <= 0:
+                break
+            time.sleep(min(left, stopPoll))
+
+    # this buffer ended at tNow and holds samples/rate seconds; whatever is
+    # between the end of the last good buffer and its start was lost
+    def _measureGap(self, tNow):
+        attempts = self.gap[2]
+        lostNs = 0
+        if self.tLast is not None:
+            lostNs = max(0, tNow - int(self.samples / self.rate * 1E9) - self.tLast)
+        lostSamples = int(round(lostNs * self.rate / 1E9))
+        self.gap = (lostNs, lostSamples, attempts)
+        self.reconnects += 1
+        self.lostNs += lostNs
+        self.lostSamples += lostSamples
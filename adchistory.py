@@ -0,0 +1,120 @@
+# Long-term data log for the lower ("accumulated") plot of ADC_2plots.py,
+# Seis1.py, plotQt_01.py and plot3.py
+# 17-Oct-2026
+
+# The scripts used to keep every decimated point with
+#   dataLog = np.append(dataLog, yD)
+# which copies the whole log on every packet and redraws all of it, so both
+# memory and draw time grow without limit over a multi-day run.
+#
+# History keeps a pyramid of fixed-size ring buffers instead:
+#   level 0      the points themselves (the last 'capacity' of them)
+#   level 1      min/mean/max of each group of 'factor' level-0 points
+#   level 2      min/mean/max of each group of 'factor' level-1 entries
+#   ...
+# Each level is summarised into the next as soon as a group is complete,
+# so appending costs about the same whatever the length of the run. Old
+# detail falls off the fine levels while the coarse levels still cover the
+# whole session; with the defaults (float32, 2^18 entries, factor 16,
+# 5 levels) that is ~13 MB and 1.7E10 points, years at 100 points/sec.
+#
+# view() returns at most about 'points' entries for any span, read from
+# the coarsest level that still has enough detail, so the plot cost stays
+# flat. Draw the mean as the line and min..max as a band, so short spikes
+# stay visible when zoomed out.
+
+import numpy as np
+
+class History:
+
+    def __init__(self, capacity=2**18, factor=16, levels=5, dtype=np.float32):
+        if capacity % factor != 0:
+            raise ValueError("capacity must be a multiple of factor")
+        self.capacity = capacity         # entries kept per level
+        self.factor = factor             # entries summarised per entry of the next level
+        self.levels = levels
+        self.dtype = dtype
+        self.clear()
+
+    # throw away all data (the scripts' Reset button)
+    def clear(self):
+        self.data = [np.zeros((1, self.capacity), self.dtype)]   # level 0: values only
+        for k in range(1, self.levels):
+            self.data.append(np.zeros((3, self.capacity), self.dtype))  # min, mean, max
+        self.counts = [0] * self.levels  # entries ever written to each level
+
+    def __len__(self):
+        return self.counts[0]
+
+    # oldest level-0 point number still covered at level k
+    def _oldest(self, k):
+        return max(0, self.counts[k] - self.capacity) * self.factor**k
+
+    def _write(self, k, rows):
+        n = rows.shape[1]
+        idx = np.arange(self.counts[k], self.counts[k] + n) % self.capacity
+        self.data[k][:, idx] = rows
+        self.counts[k] += n
+
+    # entries e0..e1-1 of level k, as (first point number, min, mean, max)
+    def _read(self, k, e0, e1):
+        rows = self.data[k][:, np.arange(e0, e1) % self.capacity]
+        idx = np.arange(e0, e1) * self.factor**k
+        if k == 0:
+            return idx, rows[0], rows[0], rows[0]
+        return idx, rows[0], rows[1], rows[2]
+
+    # add new points (1-D array) at the end of the log
+    def append(self, values):
+        values = np.asarray(values, dtype=self.dtype).ravel()
+        step = self.capacity // 2        # a block must never overwrite itself
+        for i in range(0, len(values), step):
+            self._write(0, values[np.newaxis, i:i+step])
+            self._summarise()
+
+    # fold every newly completed group of level k into level k+1
+    def _summarise(self):
+        f = self.factor
+        for k in range(self.levels - 1):
+            g0 = self.counts[k+1]
+            g1 = self.counts[k] // f
+            if g1 == g0:
+                break                    # nothing new here, so nothing above either
+            _, lo, mean, hi = self._read(k, g0*f, g1*f)
+            self._write(k+1, np.vstack((lo.reshape(-1, f).min(axis=1),
+                                        mean.reshape(-1, f).mean(axis=1),
+                                        hi.reshape(-1, f).max(axis=1))))
+
+    # at most about 'points' entries covering point numbers start..end-1
+    # (default: everything still held). Returns (x, min, mean, max) where x
+    # is the centre of each entry in point numbers; multiply by the time per
+    # point to get seconds.
+    def view(self, points=1000, start=None, end=None):
+        n = self.counts[0]
+        end = n if end is None else min(end, n)
+        oldest = self._oldest(self.levels - 1)
+        start = oldest if start is None else max(start, oldest)
+        f = self.factor
+
+        k = 0                            # finest level that is short enough and old enough
+        while k < self.levels - 1 and ((end - start) > points * f**k or start < self._oldest(k)):
+            k += 1
+
+        # whole entries from level k, then the part not yet summarised from
+        # the finer levels (at most factor entries from each)
+        parts = []
+        pos = start
+        for j in range(k, -1, -1):
+            span = f**j
+            e0 = pos // span
+            e1 = min(self.counts[j], -(-end // span))
+            if e1 > e0:
+                idx, lo, mean, hi = self._read(j, e0, e1)
+                parts.append((idx + 0.5*(span - 1), lo, mean, hi))
+                pos = e1 * span
+            if pos >= end:
+                break
+        if not parts:
+            empty = np.zeros(0)
+            return empty, empty, empty, empty
+        return tuple(np.concatenate(p) for p in zip(*parts))
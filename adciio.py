@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+
+# AD7124 through the libiio Python bindings directly, returning raw codes
+# with no patched Pyadi-iio (see adi-fixes.txt) and no per-packet allocation
+# 17-Oct-2026
+
+# adi-fixes.txt edits site-packages so that adi.ad7124.rx() hands back the
+# raw buffer. RawADC does the same job itself: it owns an iio.Buffer,
+# refills it, and puts a uint32 NumPy view over the buffer memory libiio
+# just filled. It has the attributes and methods our scripts use on an
+# adi.ad7124 (sample_rate, rx_buffer_size, rx_enabled_channels, channel[n].
+# scale, scale_available, rx(), rx_destroy_buffer(), _ctx), so
+# adcdevice.initADC() can hand it out instead (adcdevice.rawIIO).
+#
+# rx() returns interleaved uint32 codes ch0,ch1,..,ch0,ch1,.. (exactly what
+# decodeChannels expects) in one of two ways:
+#   zeroCopy=True   a view of libiio's own buffer: no copy at all, but only
+#                   valid until the next rx(). For loops that finish with a
+#                   packet before reading the next one.
+#   zeroCopy=False  (default) copied once into the next of 'pool'
+#                   preallocated arrays, so a packet stays intact until
+#                   'pool' more have been read. Still no allocation.
+#                   Enough for a queue shorter than the pool (ADC1
+#                   qDepth); a deeper queue must copy what it keeps
+#                   (REC2.py -b encodes each block before queueing it,
+#                   as its RecordWriter holds up to 64).
+#
+# Keeping data in flight:
+#   kernelBuffers   blocks the kernel (or iiod, over the network) queues
+#                   for this device; more rides out longer stalls.
+#                   None leaves the libiio default (4).
+#   prefetch        >0: a thread keeps refilling ahead of rx(), up to
+#                   this many buffers, so the next one is already on its
+#                   way while the caller processes the current one.
+#                   Needs the copy mode (a view would be refilled under
+#                   the caller), so zeroCopy is ignored.
+#
+# FakeContext stands in for iio.Context so all of this runs without
+# hardware: each refill delivers a known ramp (FakeContext(realTime=True):
+# at the sample rate, losing buffers when the kernel queue overflows, as
+# bench-iio.py uses it). It can also add latency, jitter and random
+# dropouts (lost buffers) to every refill, from a seeded generator so a
+# run repeats exactly. RawADC("fake:...") opens one, so every script that
+# goes through adcdevice.py runs on it as on a real ADC:
+#   fake:                               ramp as fast as it is read
+#   fake:realtime,latency=5,jitter=2,dropout=0.01,seed=1
+#                                       at the sample rate, +5..7 ms per
+#                                       buffer, 1% of buffers lost
+# The ramp is checked by running
+#   python3 adciio.py               (fake context)
+#   python3 adciio.py ip:analog.local   (real ADC: reports packet rate)
+
+import ctypes       # view of the libiio buffer memory
+import time         # timing in the self-check
+import threading    # prefetch thread
+import queue        # buffers prefetched and ready
+import numpy as np  # array manipulations
+
+try:
+    import iio      # libiio Python bindings (pylibiio), installed with Pyadi-iio
+except ImportError:
+    iio = None
+
+deviceNames = ("ad7124-8", "ad7124-4")
+BYTES_PER_SAMPLE = 4        # AD7124 scan elements: 32-bit storage per channel
+
+# ----------------------------------------------------
+# one ADC input, as adi.ad7124.channel[n]
+
+class RawChannel:
+
+    def __init__(self, chan):
+        self._chan = chan
+        self.name = chan.id
+
+    @property
+    def scale(self):
+        return float(self._chan.attrs["scale"].value)
+
+    @scale.setter
+    def scale(self, value):
+        self._chan.attrs["scale"].value = str(value)
+
+# ----------------------------------------------------
+
+class RawADC:
+
+    def __init__(self, uri="", ctx=None, zeroCopy=False, pool=16, kernelBuffers=None, prefetch=0):
+        if ctx is None and uri.startswith("fake:"):
+            ctx = fakeContext(uri)
+        if ctx is None:
+            if iio is None:
+                raise ImportError("libiio Python bindings (module 'iio') not installed")
+            ctx = iio.Context(uri)
+        self._ctx = ctx
+        self._dev = None
+        for name in deviceNames:
+            self._dev = ctx.find_device(name)
+            if self._dev is not None:
+                break
+        if self._dev is None:
+            raise IOError("no AD7124 found in context '%s'" % uri)
+        self._chans = [c for c in self._dev.channels if not c.output]
+        self.channel = [RawChannel(c) for c in self._chans]
+        self.kernelBuffers = kernelBuffers
+        self.prefetch = prefetch
+        self.zeroCopy = zeroCopy and prefetch == 0
+        self.pool = pool + prefetch      # prefetched buffers hold pool slots too
+        self._fetcher = None             # prefetch thread
+        self._ready = None               # queue of prefetched arrays (or the exception that stopped it)
+        self._stopFetch = False
+        self._bufferSize = 1024
+        self._enabled = [0]
+        self._buf = None
+        self._out = None                 # preallocated outputs (zeroCopy=False)
+        self._next = 0
+        self.refills = 0                 # buffers read
+
+    def _attr(self, name):
+        return self._chans[0].attrs[name].value
+
+    @property
+    def sample_rate(self):
+        return float(self._attr("sampling_frequency"))
+
+    @sample_rate.setter
+    def sample_rate(self, value):
+        for c in self._chans:            # the sequencer shares one rate
+            c.attrs["sampling_frequency"].value = str(int(value))
+
+    @property
+    def scale_available(self):
+        return [float(s) for s in self._attr("scale_available").split()]
+
+    @property
+    def rx_buffer_size(self):
+        return self._bufferSize
+
+    @rx_buffer_size.setter
+    def rx_buffer_size(self, value):
+        self.rx_destroy_buffer()
+        self._bufferSize = int(value)
+
+    @property
+    def rx_enabled_channels(self):
+        return list(self._enabled)
+
+    @rx_enabled_channels.setter
+    def rx_enabled_channels(self, value):
+        self.rx_destroy_buffer()
+        self._enabled = list(value)
+
+    def rx_destroy_buffer(self):
+        if self._fetcher is not None:    # let the prefetch thread finish its refill and exit
+            self._stopFetch = True
+            while self._fetcher.is_alive():
+                try:
+                    self._ready.get(timeout=0.1)   # make room if it waits to hand one over
+                except queue.Empty:
+                    pass
+            self._fetcher = None
+        self._buf = None                 # libiio frees it; next rx() makes a new one
+        self._out = None
+
+    def _createBuffer(self):
+        for i, c in enumerate(self._chans):
+            c.enabled = i in self._enabled
+        if self.kernelBuffers is not None:
+            self._dev.set_kernel_buffers_count(self.kernelBuffers)
+        Buffer = getattr(self._ctx, "Buffer", None) or iio.Buffer   # FakeContext brings its own
+        self._buf = Buffer(self._dev, self._bufferSize, False)
+        words = self._bufferSize * len(self._enabled)
+        if not self.zeroCopy:
+            self._out = np.empty((self.pool, words), dtype=np.uint32)
+            self._next = 0
+
+    # uint32 view of what the last refill() put in the buffer
+    def _view(self, words):
+        if hasattr(self._buf, "view"):   # FakeBuffer
+            return self._buf.view(words)
+        start = iio._buffer_start(self._buf._buffer)
+        end = iio._buffer_end(self._buf._buffer)
+        if end - start < words * BYTES_PER_SAMPLE:
+            raise IOError("IIO buffer holds %d bytes, expected %d" % (end - start, words * BYTES_PER_SAMPLE))
+        return np.ctypeslib.as_array((ctypes.c_uint32 * words).from_address(start))
+
+    # refill and copy into the next pool array (or return the view)
+    def _read(self):
+        self._buf.refill()               # blocks until the ADC has filled it
+        self.refills += 1
+        words = self._view(self._bufferSize * len(self._enabled))
+        if self.zeroCopy:
+            return words
+        out = self._out[self._next]
+        np.copyto(out, words)            # the one copy, into memory we already own
+        self._next = (self._next + 1) % self.pool
+        return out
+
+    def _fetch(self):
+        try:
+            while not self._stopFetch:
+                self._ready.put(self._read())   # waits while 'prefetch' buffers are ready
+        except Exception as e:
+            self._ready.put(e)           # rx() raises it in the caller's thread
+
+    def rx(self):
+        if self._buf is None:
+            self._createBuffer()
+        if self.prefetch == 0:
+            return self._read()
+        if self._fetcher is None:
+            self._stopFetch = False
+            self._ready = queue.Queue(maxsize=self.prefetch)
+            self._fetcher = threading.Thread(target=self._fetch, name="prefetch", daemon=True)
+            self._fetcher.start()
+        item = self._ready.get()
+        if isinstance(item, Exception):
+            self._fetcher = None
+            self._buf = None
+            raise item
+        return item
+
+# ----------------------------------------------------
+# test double for iio.Context: an AD7124-8 whose buffers hold a ramp,
+# sample k of channel c = (k * 8 + c) & 0xFFFFFF, continuing across refills
+
+class FakeAttr:
+
+    def __init__(self, value):
+        self.value = value
+
+class FakeChannel:
+
+    def __init__(self, index):
+        self.id = "voltage%d-voltage%d" % (2*index, 2*index + 1)
+        self.index = index
+        self.output = False
+        self.enabled = False
+        self.attrs = {"scale": FakeAttr("0.000149011"),
+                      "scale_available": FakeAttr("0.000149011 0.000074505 0.000037252"),
+                      "sampling_frequency": FakeAttr("1000")}
+
+class FakeDevice:
+
+    def __init__(self, name):
+        self.name = name
+        self.channels = [FakeChannel(i) for i in range(8)]
+        self.kernelBuffers = 4           # libiio default
+        self.realTime = False            # see FakeBuffer
+        self.latency = 0.0               # seconds added to every refill
+        self.jitter = 0.0                # up to this many more seconds, at random
+        self.dropout = 0.0               # chance that a buffer is lost
+        self.rng = np.random.default_rng(1)
+
+    def set_kernel_buffers_count(self, count):
+        self.kernelBuffers = count
+
+class FakeBuffer:
+
+    def __init__(self, dev, samples, cyclic=False):
+        self.dev = dev
+        self.samples = samples
+        self.chans = [c.index for c in dev.channels if c.enabled]
+        self.mem = np.zeros(samples * len(self.chans), dtype=np.uint32)
+        self.sample = 0                  # running sample counter
+        self.rate = float(dev.channels[0].attrs["sampling_frequency"].value)
+        self.realTime = dev.realTime     # True: buffers fill at the sample rate, as on the real ADC
+        self.t0 = None                   # realTime: when sampling started
+        self.dropped = 0                 # buffers lost: kernel queue full, or dropout
+
+    # realTime: the ADC keeps sampling whether we read or not. Buffer n is
+    # complete at t0 + (n+1) * T; the kernel holds at most kernelBuffers of
+    # them, so a reader further behind than that loses the oldest.
+    def _wait(self):
+        T = self.samples / self.rate
+        now = time.monotonic()
+        if self.t0 is None:
+            self.t0 = now
+        n = self.sample // self.samples
+        newest = int((now - self.t0) / T) - 1          # last buffer completed by now
+        if newest - n >= self.dev.kernelBuffers:       # queue overflowed: skip what was lost
+            lost = newest - n - self.dev.kernelBuffers + 1
+            self.dropped += lost
+            self.sample += lost * self.samples
+            n += lost
+        ready = self.t0 + (n + 1) * T
+        if ready > now:
+            time.sleep(ready - now)
+
+    def refill(self):
+        dev = self.dev
+        if self.realTime:
+            self._wait()
+        while dev.dropout > 0 and dev.rng.random() < dev.dropout:
+            self.sample += self.samples  # this one never arrives: the next does
+            self.dropped += 1
+            if self.realTime:
+                self._wait()
+        delay = dev.latency + (dev.rng.uniform(0, dev.jitter) if dev.jitter > 0 else 0)
+        if delay > 0:
+            time.sleep(delay)
+        k = np.arange(self.sample, self.sample + self.samples, dtype=np.uint64)[:, np.newaxis]
+        codes = (k * 8 + np.array(self.chans, dtype=np.uint64)) & 0xFFFFFF
+        self.mem[:] = codes.ravel()      # interleaved, as the kernel lays it out
+        self.sample += self.samples
+
+    def view(self, words):
+        return self.mem[:words]
+
+class FakeContext:
+
+    Buffer = FakeBuffer
+
+    def __init__(self, name="ad7124-8", realTime=False, latency=0.0, jitter=0.0, dropout=0.0, seed=1):
+        dev = FakeDevice(name)
+        dev.realTime = realTime
+        dev.latency = latency
+        dev.jitter = jitter
+        dev.dropout = dropout
+        dev.rng = np.random.default_rng(seed)
+        self.devices = [dev]
+        self.timeout = 0
+
+    def find_device(self, name):
+        for d in self.devices:
+            if d.name == name:
+                return d
+        return None
+
+    def set_timeout(self, timeout):
+        self.timeout = timeout
+
+# "fake:realtime,latency=5,jitter=2,dropout=0.01,seed=1" (times in ms)
+def fakeContext(uri):
+    opts = {"realTime": False}
+    for item in uri[len("fake:"):].split(","):
+        key, _, value = item.strip().partition("=")
+        if key == "":
+            continue
+        elif key == "realtime":
+            opts["realTime"] = True
+        elif key in ("latency", "jitter"):
+            opts[key] = float(value) / 1000.0
+        elif key == "dropout":
+            opts[key] = float(value)
+        elif key == "seed":
+            opts[key] = int(value)
+        else:
+            raise ValueError("unknown fake ADC option '%s' in '%s'" % (key, uri))
+    return FakeContext(**opts)
+
+# ----------------------------------------------------
+# self-check on the fake context, or a rate check on a real ADC
+
+if __name__ == "__main__":
+    import sys
+    from adcdecode import decodeChannels
+
+    channels = [0, 2, 5]
+    samples = 1000
+    uri = sys.argv[1] if len(sys.argv) > 1 else None
+    for zeroCopy in (False, True):
+        adc = RawADC(uri, ctx=None if uri else FakeContext(), zeroCopy=zeroCopy)
+        adc.sample_rate = 1000
+        adc.rx_buffer_size = samples
+        adc.rx_enabled_channels = channels
+        adc.channel[0].scale = adc.scale_available[-1]
+        t0 = time.perf_counter()
+        first = adc.rx()
+        for i in range(99):
+            last = adc.rx()
+        dt = time.perf_counter() - t0
+        yr = decodeChannels(last, samples, len(channels))
+        mode = "zero-copy" if zeroCopy else "pool copy"
+        print("%-9s 100 buffers in %.3f s (%.1f us each)" % (mode, dt, dt / 100 * 1E6))
+        if uri is None:
+            k = np.arange(99 * samples, 100 * samples)
+            ok = all(np.array_equal(yr[i], (k * 8 + c) & 0xFFFFFF) for i, c in enumerate(channels))
+            ok = ok and (np.shares_memory(first, last) == zeroCopy)   # pool arrays rotate, the view does not
+            print("  decoded data %s" % ("OK" if ok else "WRONG"))
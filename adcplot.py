@@ -0,0 +1,123 @@
+# Fast redraw of the sweep graph in ADC1.py: keep the line and text
+# artists, change only their data, and blit the plot area
+# 17-Oct-2026
+
+# update_plot used to clear the axes and rebuild everything each packet
+# (ax.cla, new formatter, plot, grid, labels, title, text, full draw).
+# Here the static parts (axes, grid, labels, title) are drawn once into a
+# cached background. Each packet restores that background, draws the
+# lines and the two text strings, and blits just that region. A full
+# redraw only happens when the Y range must change, on resize, or after
+# the toolbar zooms/pans (any full draw re-caches the background).
+#
+# Envelope reduces a sweep of up to ~2M points to min/max pairs, one pair
+# per pixel column, so spikes stay visible but only ~2 points per column
+# are drawn. It is incremental: only the columns under the segment just
+# written are recomputed.
+
+import numpy as np
+import matplotlib.ticker as ticker  # turn off Y offset mode
+from matplotlib.transforms import Bbox
+
+class BlitPlot:
+
+    def __init__(self, canvas, ax):
+        self.canvas = canvas
+        self.ax = ax
+        self.lines = []
+        self.background = None
+        self.fullDraws = 0               # full redraws (range change, resize, ...)
+        self.canvas.mpl_connect('draw_event', self._onDraw)
+
+    # (re)build the static parts: call at start and after a configuration change
+    def setup(self, xdata, nChan, labels=None):
+        ax = self.ax
+        ax.cla()
+        fmt = ticker.ScalarFormatter(useOffset=False)
+        fmt.set_scientific(False)
+        ax.yaxis.set_major_formatter(fmt) # turn off Y offset mode
+        ax.grid(color='gray', linestyle='dotted' )
+        ax.set_xlabel("seconds", fontsize = 10)
+        ax.set_title('Voltage vs Time', fontsize = 15)
+        empty = np.zeros(len(xdata))
+        if (nChan == 1):
+            self.lines = ax.plot(xdata, empty, linewidth=1, color="green", animated=True)
+        else:
+            self.lines = ax.plot(xdata, np.zeros((len(xdata), nChan)), linewidth=1, animated=True)
+            if labels is not None:
+                ax.legend(self.lines, labels, loc='lower right', fontsize=8)
+        ax.set_xlim(xdata[0], xdata[-1])
+        # text above the plot area, in axes coordinates so it never needs moving
+        self.tTime = ax.text(1.0, 1.01, "", style='italic', horizontalalignment='right',
+                             transform=ax.transAxes, animated=True)  # date,time string
+        self.tRms = ax.text(0.01, 1.01, "", fontsize=12, transform=ax.transAxes, animated=True)
+        self.canvas.draw()
+
+    # cache the static background after any full draw (ours, resize, toolbar)
+    def _onDraw(self, event):
+        fig = self.canvas.figure
+        axb = self.ax.bbox
+        self.region = Bbox.from_extents(axb.x0, axb.y0, axb.x1, min(axb.y1 + 30, fig.bbox.y1))
+        self.background = self.canvas.copy_from_bbox(self.region)
+        self._drawArtists()
+
+    def _drawArtists(self):
+        for line in self.lines:
+            self.ax.draw_artist(line)
+        self.ax.draw_artist(self.tTime)
+        self.ax.draw_artist(self.tRms)
+
+    # expand the Y range to fit, or shrink it when the data use under a quarter of it
+    def _rescale(self, ymin, ymax):
+        lo, hi = self.ax.get_ylim()
+        span = hi - lo
+        if (ymin >= lo) and (ymax <= hi) and ((ymax - ymin) > 0.25*span):
+            return False
+        margin = 0.05 * max(ymax - ymin, 1E-9)
+        self.ax.set_ylim(ymin - margin, ymax + margin)
+        return True
+
+    # new data: batch is (channels x points), same length as xdata given to setup()
+    def update(self, batch, timeString, rmsString):
+        for line, y in zip(self.lines, batch):
+            line.set_ydata(y)
+        self.tTime.set_text(timeString)
+        self.tRms.set_text(rmsString)
+        if self._rescale(np.min(batch), np.max(batch)) or self.background is None:
+            self.fullDraws += 1
+            self.canvas.draw()           # _onDraw re-caches background and draws the artists
+        else:
+            self.canvas.restore_region(self.background)
+            self._drawArtists()
+        self.canvas.blit(self.region)
+
+# ----------------------------------------------------
+# min/max envelope of a (channels x points) sweep buffer, for display
+
+class Envelope:
+
+    def __init__(self, xdata, nChan, columns=1000):
+        n = len(xdata)
+        self.bucket = max(1, -(-n // columns))     # points per column, rounded up
+        self.starts = np.arange(0, n, self.bucket)  # first point of each column
+        self.passThrough = (self.bucket == 1)      # few enough points: draw them all
+        if self.passThrough:
+            self.x = xdata
+        else:
+            self.x = np.repeat(xdata[self.starts], 2)  # vertical min-max stroke per column
+        self.y = np.zeros((nChan, len(self.x)))
+
+    # batch[:, start:end] was just written: recompute the columns it touches
+    def update(self, batch, start, end):
+        if self.passThrough:
+            self.y = batch
+            return self.y
+        b0 = start // self.bucket
+        b1 = -(-end // self.bucket)                  # last column touched, rounded up
+        lo = self.starts[b0]
+        hi = min(b1 * self.bucket, batch.shape[1])
+        seg = batch[:, lo:hi]
+        offsets = self.starts[b0:b1] - lo
+        self.y[:, 2*b0:2*b1:2] = np.minimum.reduceat(seg, offsets, axis=1)
+        self.y[:, 2*b0+1:2*b1:2] = np.maximum.reduceat(seg, offsets, axis=1)
+        return self.y
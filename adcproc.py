@@ -0,0 +1,318 @@
+# Acquisition and recording in a child process, for ADC1.py -p
+# decoded packets come back to the GUI through a shared-memory ring
+# 17-Oct-2026
+
+# With the acquisition thread (adcacq.py) rx(), decoding, drawing and CSV
+# writing all share one interpreter and its GIL: a slow redraw delays
+# rx(), a slow rx() stalls the GUI. AcqProcess moves rx(), decoding and
+# recording to a separate process. Each packet is de-interleaved straight
+# into a multiprocessing.shared_memory ring, and the GUI process reads it
+# there as a (channels x samples) uint32 array: no pickling, no copy.
+#
+# Shared memory layout (one block):
+#   header   HDR_FIELDS int64 counters (HEAD, TAIL, OVERRUNS, ...)
+#   meta     nSlots x META_FIELDS int64: where each packet is and its tags
+#   data     'words' uint32: packets, each contiguous (channels x samples)
+#
+# One writer per counter: the child advances HEAD after a packet is
+# complete, the GUI advances TAIL after it is done with one (release()),
+# so the child never overwrites a packet the GUI is still reading.
+# A packet that would not fit at the end of the data area starts again at
+# 0, so every packet is one contiguous view.
+#
+# HEAD and TAIL are only written and read holding a multiprocessing lock.
+# That is for memory ordering, not exclusion: taking and releasing the
+# lock is a full barrier, so the packet data written before HEAD += 1 is
+# visible to the GUI by the time it sees the new HEAD, and the GUI's reads
+# are done before the child sees TAIL move. x86 keeps stores in order by
+# itself, but the Pi's ARM cores do not.
+#
+# The data area holds nSlots packets of the size AcqProcess starts with
+# (at least 'words'). A later configuration whose packet would not fit at
+# all is refused by AcqProcess.configure() (see fits()); the child never
+# gets one.
+#
+# When the ring is full the child either
+#   DROP_NEWEST : skips the display copy of this packet (counted as an overrun)
+#   BLOCK       : waits for the GUI to release a packet (counted, with time)
+# Recording happens in the child before the ring, so it never waits on
+# the GUI and a ring overrun never costs recorded samples.
+
+import time                      # monotonic clock, thread CPU time
+import contextlib                # no lock when used in one process
+import queue                     # queue.Empty from the command queue
+import multiprocessing           # child process and its command queue
+from multiprocessing import shared_memory
+import numpy as np               # array manipulations
+from adcacq import BLOCK         # same policy name as PacketQueue
+
+DROP_NEWEST = "drop-newest"
+
+# header fields
+HEAD = 0         # packets written by the child
+TAIL = 1         # packets released by the GUI
+OVERRUNS = 2     # packets not passed to the GUI because the ring was full
+BLOCKED = 3      # times the child waited for room
+BLOCKED_NS = 4   # total time it waited
+WPOS = 5         # where the next packet goes in the data area
+PACKETS = 6      # packets acquired
+RECORDED = 7     # packets recorded to file
+CPU_US = 8       # child process CPU time, microseconds
+STOP = 9         # set by the GUI: leave any wait and exit
+ERROR = 10       # set by the child when it has stopped on an error
+GAPS = 11        # lost buffers found from arrival times (adctiming.py)
+LOST = 12        # samples per channel lost in them
+STALLS = 13      # late buffers that caught up, nothing lost
+RATE_MSPS = 14   # measured sample rate, in 1/1000 samples per second
+HDR_FIELDS = 16
+
+# meta fields, one row per slot
+M_OFFSET = 0     # first word in the data area
+M_NCHAN = 1
+M_SAMPLES = 2    # samples per channel
+M_EPOCH = 3      # configuration number (see ADC1.setup_update)
+M_ARRIVE = 4     # time.monotonic_ns() when rx() returned
+META_FIELDS = 5
+
+# ----------------------------------------------------
+# the ring itself: create=True in the GUI, attach by name in the child
+
+class ShmRing:
+
+    def __init__(self, name=None, nSlots=16, words=2**23, create=False, lock=None):
+        size = 8 * (HDR_FIELDS + nSlots * META_FIELDS) + 4 * words
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.nSlots = nSlots
+        self.words = words
+        self.lock = lock if lock is not None else contextlib.nullcontext()   # barrier around HEAD/TAIL
+        buf = self.shm.buf
+        self.hdr = np.ndarray(HDR_FIELDS, dtype=np.int64, buffer=buf)
+        self.meta = np.ndarray((nSlots, META_FIELDS), dtype=np.int64, buffer=buf,
+                               offset=8 * HDR_FIELDS)
+        self.data = np.ndarray(words, dtype=np.uint32, buffer=buf,
+                               offset=8 * (HDR_FIELDS + nSlots * META_FIELDS))
+        if create:
+            self.hdr[:] = 0
+
+    def used(self):
+        with self.lock:
+            return int(self.hdr[HEAD] - self.hdr[TAIL])
+
+    # child: where a packet of n words can go, or None if the ring is too full
+    def _place(self, n):
+        with self.lock:                  # the GUI is done reading everything before TAIL
+            head, tail = int(self.hdr[HEAD]), int(self.hdr[TAIL])
+        if head - tail >= self.nSlots:
+            return None                  # no free slot
+        pos = int(self.hdr[WPOS])
+        if head == tail:
+            return pos if pos + n <= self.words else 0   # empty: anywhere fits
+        oldest = int(self.meta[tail % self.nSlots, M_OFFSET])
+        if pos > oldest:                 # unread data is oldest..pos, not wrapped
+            if pos + n <= self.words:
+                return pos
+            return 0 if n <= oldest else None
+        return pos if pos + n <= oldest else None   # unread data wraps past the end
+
+    # child: copy one (channels x samples) packet in, de-interleaving on the way.
+    # Returns False if the packet was dropped (DROP_NEWEST) or stop was asked.
+    def put(self, codes, epoch, tArrive, policy=DROP_NEWEST):
+        nChan, samples = codes.shape
+        n = nChan * samples
+        if n > self.words:
+            raise ValueError("packet of %d words is larger than the ring" % n)
+        pos = self._place(n)
+        if pos is None:
+            if policy != BLOCK:
+                self.hdr[OVERRUNS] += 1
+                return False
+            t0 = time.monotonic_ns()
+            self.hdr[BLOCKED] += 1
+            while pos is None and not self.hdr[STOP]:
+                time.sleep(0.001)        # GUI frees space at its frame rate; 1 ms is plenty
+                pos = self._place(n)
+            self.hdr[BLOCKED_NS] += time.monotonic_ns() - t0
+            if pos is None:
+                return False
+        self.data[pos:pos+n].reshape(nChan, samples)[:] = codes
+        slot = self.meta[self.hdr[HEAD] % self.nSlots]
+        slot[:] = (pos, nChan, samples, epoch, tArrive)
+        self.hdr[WPOS] = pos + n
+        with self.lock:
+            self.hdr[HEAD] += 1          # publish: only now, data and meta in place, can the GUI see it
+        return True
+
+    # GUI: oldest unreleased packet as (epoch, tArrive seconds, codes view), or None
+    def get(self):
+        with self.lock:                  # everything the child wrote before HEAD is visible after this
+            head, tail = int(self.hdr[HEAD]), int(self.hdr[TAIL])
+        if head == tail:
+            return None
+        pos, nChan, samples, epoch, tArrive = (int(v) for v in self.meta[tail % self.nSlots])
+        codes = self.data[pos:pos + nChan*samples].reshape(nChan, samples)
+        return epoch, tArrive / 1E9, codes
+
+    # GUI: done with the packet from get(); its space may now be reused
+    def release(self):
+        with self.lock:
+            self.hdr[TAIL] += 1
+
+    def close(self, unlink=False):
+        del self.hdr, self.meta, self.data   # views must go before the buffer can close
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+# ----------------------------------------------------
+# a buffer the clock holds back: copy it, rx() will reuse its memory
+
+def _keepPacket(packet):
+    data_raw, tArrive = packet
+    if isinstance(data_raw, np.ndarray):
+        data_raw = data_raw.copy()
+    return (data_raw, tArrive)
+
+# ----------------------------------------------------
+# child process: open the ADC, then rx() / record / copy into the ring
+# until told to stop. Commands arrive on cmdQ between rx() calls:
+#   ("config", epoch, rate, samples)   new rate and buffer size
+#   ("record", filename)               start recording (None: stop)
+#   ("stop",)
+
+def _acqMain(ringName, nSlots, words, lock, cmdQ, policy, adc1_ip, rate, samples, channels,
+             kernelBuffers=None, prefetch=0):
+    from adcdevice import initADC, reconfigADC   # only the child talks to the ADC
+    from adcdecode import decodeChannels, calcVolt
+    from adcrecord import RecordWriter, csvHeader, gapLine
+    from adctiming import ArrivalClock
+
+    ring = ShmRing(ringName, nSlots, words, lock=lock)
+    nChan = len(channels)
+    epoch = 0
+    writer = None
+    clock = ArrivalClock(rate)
+    adc1 = initADC(rate, samples, adc1_ip, channels, kernelBuffers, prefetch)
+    if adc1 is None:
+        ring.hdr[ERROR] = 1
+        ring.close()
+        return
+
+    try:
+        while not ring.hdr[STOP]:
+            while True:                  # commands queued since the last packet
+                try:
+                    cmd = cmdQ.get_nowait()
+                except queue.Empty:
+                    break
+                if cmd[0] == "stop":
+                    ring.hdr[STOP] = 1
+                elif cmd[0] == "config":
+                    epoch, rate, samples = cmd[1:]
+                    reconfigADC(adc1, rate, samples)
+                    clock.reset(rate)
+                elif cmd[0] == "record":
+                    if writer is not None:
+                        writer.put(writer.fout.write, "# End: %s\n\n" % time.strftime('%Y-%m-%d %H:%M:%S'))
+                        writer.close()
+                        writer = None
+                    if cmd[1] is not None:
+                        writer = RecordWriter(open(cmd[1], "w"))
+                        writer.put(writer.fout.write, csvHeader(channels))  # column header, to read as CSV
+            if ring.hdr[STOP]:
+                break
+
+            data_raw = adc1.rx()         # retrieve one buffer of data using Pyadi-iio
+            tArrive = time.monotonic_ns()
+            ring.hdr[PACKETS] += 1
+            # a late buffer is held until the clock knows whether buffers were lost before it
+            for gap, (data_raw, tArrive) in clock.hold((data_raw, tArrive), tArrive, samples, keep=_keepPacket):
+                yr = decodeChannels(data_raw, samples, nChan)  # (channels x samples) view
+                if writer is not None:   # record first: the display may drop, the file never does
+                    if gap is not None:  # (ns, samples) lost just before this buffer
+                        writer.put(writer.fout.write, gapLine(*gap))
+                    mV = calcVolt(yr) * 1000
+                    writer.put(np.savetxt, writer.fout, mV.T, fmt='%0.5f', delimiter=', ')
+                    ring.hdr[RECORDED] += 1
+                ring.put(yr, epoch, tArrive, policy)
+            ring.hdr[GAPS:RATE_MSPS+1] = (clock.gaps, clock.lostSamples, clock.stalls, int(clock.rate() * 1E3))
+            ring.hdr[CPU_US] = int(time.process_time() * 1E6)
+    except Exception as e:
+        print("Acquisition process stopped by error: %s" % e)
+        ring.hdr[ERROR] = 1
+    finally:
+        if writer is not None:
+            writer.close()               # write out whatever is still queued, then close file
+        ring.close()
+
+# ----------------------------------------------------
+# GUI side: start the child, send it commands, read its packets
+
+class AcqProcess:
+
+    def __init__(self, adc1_ip, rate, samples, channels, nSlots=16, words=2**23, policy=DROP_NEWEST,
+                 kernelBuffers=None, prefetch=0):
+        self.nChan = len(channels)
+        words = max(words, nSlots * samples * self.nChan)   # room for nSlots packets as configured
+        ctx = multiprocessing.get_context("spawn")   # no fork of a running Qt process
+        lock = ctx.Lock()
+        self.ring = ShmRing(nSlots=nSlots, words=words, create=True, lock=lock)
+        self.cmdQ = ctx.Queue()
+        self.proc = ctx.Process(target=_acqMain, name="acq",
+                                args=(self.ring.name, nSlots, words, lock, self.cmdQ, policy,
+                                      adc1_ip, rate, samples, list(channels),
+                                      kernelBuffers, prefetch), daemon=True)
+        self._lastCpu = 0
+        self._lastWall = time.monotonic()
+
+    def start(self):
+        self.proc.start()
+
+    # can a packet of this many samples per channel go through the ring?
+    def fits(self, samples):
+        return samples * self.nChan <= self.ring.words
+
+    def configure(self, epoch, rate, samples):
+        if not self.fits(samples):       # the child would have to stop on it
+            raise ValueError("%d samples x %d channels do not fit the %d-word ring" %
+                             (samples, self.nChan, self.ring.words))
+        self.cmdQ.put(("config", epoch, rate, samples))
+
+    def record(self, filename):   # None stops recording
+        self.cmdQ.put(("record", filename))
+
+    def get(self):
+        return self.ring.get()
+
+    def release(self):
+        self.ring.release()
+
+    def stopped(self):
+        return bool(self.ring.hdr[STOP]) or bool(self.ring.hdr[ERROR]) or not self.proc.is_alive()
+
+    def error(self):
+        return bool(self.ring.hdr[ERROR])
+
+    def count(self, field):
+        return int(self.ring.hdr[field])
+
+    def stop(self, timeout=None):
+        self.ring.hdr[STOP] = 1          # leaves a BLOCK wait at once
+        self.cmdQ.put(("stop",))
+        if self.proc.is_alive():
+            self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.ring.close(unlink=True)
+
+    # child CPU use in percent since the last call
+    def cpuPercent(self):
+        now = time.monotonic()
+        cpu = self.count(CPU_US)
+        pct = 100.0 * (cpu - self._lastCpu) / 1E6 / max(now - self._lastWall, 1E-6)
+        self._lastCpu = cpu
+        self._lastWall = now
+        return pct
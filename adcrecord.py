@@ -0,0 +1,255 @@
+# Compact binary recording of raw AD7124 codes, in self-describing blocks
+# written by REC2.py (-b option), turned back into mV CSV by adcbin2csv.py
+# 17-Oct-2026
+
+# Each rx() packet becomes one block: a 40-byte header followed by the raw
+# uint32 codes, little-endian, interleaved ch0,ch1,..,ch0,ch1,.. as received.
+#
+#   magic     4s  b'ADCB'
+#   version   B   format version (1)
+#   kind      B   KIND_DATA, KIND_EVENT, ...
+#   nChan     H   channels interleaved in this block
+#   rate      I   sample rate, samples per second
+#   seq       I   packet sequence number, counts up from 0
+#   samples   I   samples per channel (KIND_DATA) or payload bytes (others)
+#   tStart    q   time of first sample, ns since the epoch
+#   chanMap   8s  ADC channel number of each column, 0xFF = unused
+#   crc       I   zlib.crc32 of the header bytes above plus the payload
+#
+# Any block can be read on its own, so a file cut short by a crash or a
+# full SD card is still readable up to the last complete block.
+
+import struct
+import zlib          # crc32 checksum
+import os            # fsync
+import time          # monotonic clock for rate and blocked-time stats
+import queue         # bounded hand-off between acquisition and writer
+import threading     # background writer thread
+import numpy as np   # array manipulations
+
+MAGIC = b'ADCB'
+VERSION = 1
+KIND_DATA = 0        # payload: uint32 ADC codes
+KIND_EVENT = 1       # payload: GPIO edge, struct EVENT_FMT
+KIND_GAP = 2         # payload: data lost (reconnect, dropped buffers), struct GAP_FMT
+
+HEADER_FMT = '<4sBBHIIIq8sI'
+HEADER_SIZE = struct.calcsize(HEADER_FMT)   # 40 bytes
+EVENT_FMT = '<Bf'    # output column after the data (0..3), time delta in msec
+GAP_FMT = '<qqI'     # ns lost, samples per channel lost, reconnect attempts (0: found by arrival times)
+
+# ----------------------------------------------------
+# CSV column header for recorded data: one mV column per channel
+
+def csvHeader(channels):
+    if len(channels) == 1:
+        return "mV\n"        # same header as single-channel recordings always had
+    return ", ".join("ch%d_mV" % c for c in channels) + "\n"
+
+# ----------------------------------------------------
+# gap marker line, the same in a CSV recording and in adcbin2csv.py output
+
+def gapLine(lostNs, lostSamples, attempts=0):
+    line = "# Gap: %.3f s lost (%d samples)" % (lostNs / 1E9, lostSamples)
+    if attempts > 0:
+        line += ", reconnected after %d attempts" % attempts
+    return line + "\n"
+
+# ----------------------------------------------------
+# write blocks to an open binary file
+
+class BinWriter:
+
+    def __init__(self, fout, rate, channels):
+        self.fout = fout                 # file opened with "wb"
+        self.rate = int(rate)            # samples per second
+        self.channels = list(channels)   # ADC channel of each interleaved column
+        self.nChan = len(self.channels)
+        self.chanMap = bytes(self.channels + [0xFF] * (8 - self.nChan))
+        self.seq = 0                     # sequence number of next block
+        self.bytesOut = 0                # total bytes written
+
+    # header (with crc) for the next block; counts it in seq
+    def _head(self, kind, count, tStart, payload):
+        head = struct.pack(HEADER_FMT[:-1], MAGIC, VERSION, kind, self.nChan,
+                           self.rate, self.seq, count, int(tStart), self.chanMap)
+        crc = zlib.crc32(payload, zlib.crc32(head))
+        self.seq += 1
+        return head + struct.pack('<I', crc)
+
+    def _block(self, kind, count, tStart, payload):
+        self.fout.write(self._head(kind, count, tStart, payload))
+        self.fout.write(payload)
+        self.bytesOut += HEADER_SIZE + len(payload)
+
+    def _dataPayload(self, words):
+        if words.ndim == 2:
+            words = words.T              # back to interleaved order, still a view
+        data = np.ascontiguousarray(words, dtype='<u4')  # no copy on the Pi (little-endian)
+        return data.size // self.nChan, memoryview(data).cast('B')
+
+    # one rx() packet of raw codes, either as received or as the
+    # (channels x samples) view from decodeChannels; tStart in ns since the epoch
+    def writeData(self, words, tStart):
+        count, payload = self._dataPayload(words)
+        self._block(KIND_DATA, count, tStart, payload)
+
+    # data lost between the previous block and the next (see adcdevice.ADCSession)
+    def writeGap(self, lostNs, lostSamples, attempts, tStart):
+        self._block(KIND_GAP, struct.calcsize(GAP_FMT), tStart,
+                    struct.pack(GAP_FMT, lostNs, lostSamples, attempts))
+
+    # same blocks as writeData/writeGap/writeEvent, returned as bytes instead
+    # of written: a copy made now, while 'words' is still valid (REC2.py
+    # queues them for its writer thread; adcbroker.py encodes each packet
+    # once for all its subscribers)
+    def packData(self, words, tStart):
+        count, payload = self._dataPayload(words)
+        return self._head(KIND_DATA, count, tStart, payload) + payload
+
+    def packGap(self, lostNs, lostSamples, attempts, tStart):
+        payload = struct.pack(GAP_FMT, lostNs, lostSamples, attempts)
+        return self._head(KIND_GAP, len(payload), tStart, payload) + payload
+
+    def packEvent(self, column, tDelta, tStart):
+        payload = struct.pack(EVENT_FMT, column, tDelta)
+        return self._head(KIND_EVENT, len(payload), tStart, payload) + payload
+
+    # GPIO input edge, as REC2.py logs it
+    def writeEvent(self, column, tDelta, tStart):
+        self._block(KIND_EVENT, struct.calcsize(EVENT_FMT), tStart,
+                    struct.pack(EVENT_FMT, column, tDelta))
+
+    def close(self):
+        self.fout.close()
+
+# ----------------------------------------------------
+# read blocks back: yields (header dict, payload), payload is a
+# (samples x nChan) uint32 array for data blocks, raw bytes otherwise
+# (raw=True: the whole block, header included, as bytes, to pass on unchanged)
+# a bad checksum or a truncated block raises ValueError
+
+def readBlocks(fin, raw=False):
+    while True:
+        head = fin.read(HEADER_SIZE)
+        if len(head) == 0:
+            return                       # clean end of file
+        if len(head) < HEADER_SIZE:
+            raise ValueError("truncated block header at end of file")
+        (magic, version, kind, nChan, rate, seq, count, tStart,
+         chanMap, crc) = struct.unpack(HEADER_FMT, head)
+        if magic != MAGIC:
+            raise ValueError("bad block magic %r" % magic)
+        size = count * nChan * 4 if kind == KIND_DATA else count
+        payload = fin.read(size)
+        if len(payload) < size:
+            raise ValueError("truncated block %d" % seq)
+        if zlib.crc32(payload, zlib.crc32(head[:-4])) != crc:
+            raise ValueError("checksum error in block %d" % seq)
+        hdr = {'version': version, 'kind': kind, 'nChan': nChan, 'rate': rate,
+               'seq': seq, 'samples': count, 'tStart': tStart,
+               'channels': [c for c in chanMap if c != 0xFF]}
+        if raw:
+            payload = head + payload
+        elif kind == KIND_DATA:
+            payload = np.frombuffer(payload, dtype='<u4').reshape(-1, nChan)
+        yield hdr, payload
+
+# ----------------------------------------------------
+# Background writer: rx() never waits on the SD card.
+# The acquisition loop hands each write job (a function plus its arguments)
+# to a bounded queue; a writer thread runs the jobs in order and commits
+# them in groups, one flush() (and optionally fsync) for everything that was
+# waiting, instead of one per packet.
+#   policy='block' : a full queue makes put() wait (nothing lost; wait is counted)
+#   policy='drop'  : a full queue makes put() discard the job (counted)
+
+class RecordWriter:
+
+    def __init__(self, fout, maxDepth=64, policy='block', maxGroup=32, sync=False):
+        self.fout = fout
+        self.q = queue.Queue(maxsize=maxDepth)
+        self.policy = policy
+        self.maxGroup = maxGroup         # most jobs committed with one flush
+        self.sync = sync                 # also fsync() each group to the card
+        self.blocked = 0                 # times put() had to wait for room
+        self.blockedTime = 0.0           # total seconds put() spent waiting
+        self.dropped = 0                 # jobs discarded with policy 'drop'
+        self.groups = 0                  # group commits done
+        self.maxSeen = 0                 # deepest the queue has been
+        self.error = None                # exception from the writer, if any
+        self.bytesOut = 0
+        self._start = fout.tell()
+        self._lastBytes = 0
+        self._lastTime = time.monotonic()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    # queue one write job: func(*args, **kwargs) runs on the writer thread
+    def put(self, func, *args, **kwargs):
+        job = (func, args, kwargs)
+        try:
+            self.q.put_nowait(job)
+        except queue.Full:
+            if self.policy == 'drop':
+                self.dropped += 1
+                return False
+            t0 = time.monotonic()
+            self.q.put(job)              # wait for the writer to catch up
+            self.blocked += 1
+            self.blockedTime += time.monotonic() - t0
+        self.maxSeen = max(self.maxSeen, self.q.qsize())
+        return True
+
+    def _run(self):
+        while True:
+            group = [self.q.get()]       # sleep until there is work
+            while len(group) < self.maxGroup:
+                try:
+                    group.append(self.q.get_nowait())  # everything else already waiting
+                except queue.Empty:
+                    break
+            for job in group:
+                if job is None:          # close() was called
+                    self._commit()
+                    return
+                func, args, kwargs = job
+                try:
+                    func(*args, **kwargs)
+                except Exception as e:   # keep draining so put() never deadlocks
+                    self.error = e
+            self._commit()
+
+    def _commit(self):
+        try:
+            self.fout.flush()
+            if self.sync:
+                os.fsync(self.fout.fileno())
+            self.bytesOut = self.fout.tell() - self._start
+        except Exception as e:
+            self.error = e
+        self.groups += 1
+
+    # write everything still queued, then close the file
+    def close(self):
+        self.q.put(None)
+        self.worker.join()
+        self.fout.close()
+
+    # bytes per second written since the last call
+    def rate(self):
+        now = time.monotonic()
+        bytesOut = self.bytesOut
+        bps = (bytesOut - self._lastBytes) / max(now - self._lastTime, 1E-6)
+        self._lastBytes = bytesOut
+        self._lastTime = now
+        return bps
+
+    # one-line status for the periodic display
+    def status(self):
+        s = ("q:%d/%d (max %d) %.1f kB/s blocked:%d (%.2fs) dropped:%d" %
+             (self.q.qsize(), self.q.maxsize, self.maxSeen, self.rate()/1E3,
+              self.blocked, self.blockedTime, self.dropped))
+        if self.error is not None:
+            s += " WRITE ERROR: %s" % self.error
+        return s
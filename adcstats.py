@@ -0,0 +1,82 @@
+# Where the time goes in each packet: per-stage latency with rolling
+# p50/p99/max, for ADC1.py's status line and REC2.py's console status
+# 17-Oct-2026
+
+# Each stage keeps the durations of its last 'window' runs in a fixed
+# int64 ring, so timing one stage costs one perf_counter_ns() call and one
+# array store. Percentiles are only computed when status() or dump() asks.
+# Chain stages by passing back the time add() returns:
+#
+#   t = time.perf_counter_ns()
+#   data_raw = adc1.rx()
+#   t = times.add("rx", t)           # rx wait
+#   yr = decodeChannels(...)
+#   t = times.add("decode", t)
+#
+# wrap() times a function wherever it runs, eg. np.savetxt in the
+# RecordWriter thread. Each stage should be timed from one thread only.
+# dump() appends a summary table to a CSV file (comment lines start with
+# '#', as in our recordings), so runs can be compared later.
+
+import time          # perf_counter_ns
+import numpy as np   # percentiles
+
+class StageTimes:
+
+    def __init__(self, window=1024):
+        self.window = window             # runs kept per stage
+        self.names = []                  # in the order first seen
+        self.ns = {}                     # stage -> ring of durations, ns
+        self.count = {}                  # stage -> runs ever timed
+
+    def record(self, stage, ns):
+        ring = self.ns.get(stage)
+        if ring is None:
+            ring = self.ns[stage] = np.zeros(self.window, dtype=np.int64)
+            self.count[stage] = 0
+            self.names.append(stage)
+        ring[self.count[stage] % self.window] = ns
+        self.count[stage] += 1
+
+    # stage ran from t0 (perf_counter_ns) until now; returns now, to start the next stage
+    def add(self, stage, t0):
+        now = time.perf_counter_ns()
+        self.record(stage, now - t0)
+        return now
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, t0)
+        return timed
+
+    def clear(self):
+        self.names, self.ns, self.count = [], {}, {}
+
+    # (runs, p50, p99, max, mean) in ms over the last 'window' runs
+    def summary(self, stage):
+        n = min(self.count[stage], self.window)
+        ms = self.ns[stage][:n] / 1E6
+        p50, p99 = np.percentile(ms, (50, 99))
+        return self.count[stage], p50, p99, ms.max(), ms.mean()
+
+    # one line: "rx 200.1/201.4/230.2  decode 0.05/0.09/0.30 ... ms p50/p99/max"
+    def status(self):
+        if not self.names:
+            return "no timing yet"
+        parts = []
+        for stage in self.names:
+            n, p50, p99, top, mean = self.summary(stage)
+            parts.append("%s %.2f/%.2f/%.2f" % (stage, p50, p99, top))
+        return "  ".join(parts) + " ms p50/p99/max"
+
+    def dump(self, filename, label=""):
+        with open(filename, "a") as f:
+            f.write("# Timing: %s %s\n" % (time.strftime('%Y-%m-%d %H:%M:%S'), label))
+            f.write("stage, runs, p50_ms, p99_ms, max_ms, mean_ms\n")
+            for stage in self.names:
+                f.write("%s, %d, %.4f, %.4f, %.4f, %.4f\n" % ((stage,) + self.summary(stage)))
+            f.write("\n")
@@ -0,0 +1,213 @@
+# Check from arrival times that no ADC samples went missing
+# used by REC2.py, ADC1.py and the adcproc.py child
+# 17-Oct-2026
+
+# Each rx() buffer is stamped with its arrival time (monotonic or epoch ns,
+# as long as it is always the same clock) and the running sample counter.
+# A straight-line fit of arrival time against sample index over the last
+# 'window' packets gives the real sample rate (slope) and where the next
+# packet should arrive. Then, per packet:
+#
+#   lag  = arrival - predicted arrival
+#
+#   on time   |lag| small                    normal, added to the fit
+#   late      lag > gapTol packets           reader stalled, or samples lost
+#   burst     late, then packets closer      reader is catching up from the
+#             than burstTol packets apart    kernel's queued buffers
+#
+# If the lag is gone once the packets are back to normal spacing, nothing
+# was lost: counted as a stall (the kernel buffers absorbed it; more
+# stalls mean it is time for more buffers or less work per packet). If
+# the lag is still there, the samples for that time never arrived: a gap
+# of round(lag * rate) samples (rounded to whole buffers when close, since
+# IIO drops whole buffers). 'index' counts lost samples too, so it is the
+# true index of the first sample of the next packet.
+#
+# The lost samples belong before the first late packet, but that is only
+# known one packet (or a burst) later. stamp() reports the gap when it is
+# confirmed; hold() is for callers that record or send the data: it keeps
+# late packets back until the clock has decided, then hands them out in
+# order with the gap attached to the packet it comes before.
+
+import collections  # fixed-length history for the fit
+import numpy as np  # least-squares fit
+
+class ArrivalClock:
+
+    def __init__(self, rate, window=64, gapTol=0.5, burstTol=0.5):
+        self.nominal = float(rate)       # configured samples per second
+        self.window = window             # packets in the rate fit
+        self.gapTol = gapTol             # lag, in packets, that makes a packet late
+        self.burstTol = burstTol         # spacing, in packets, that makes it a burst
+        self.reset()
+
+    # start over, eg. after a change of rate or buffer size
+    def reset(self, rate=None):
+        if rate is not None:
+            self.nominal = float(rate)
+        self.times = collections.deque(maxlen=self.window)   # arrival ns of fitted packets
+        self.ends = collections.deque(maxlen=self.window)    # sample index at each one's end
+        self.index = 0                   # first sample of the next packet, lost samples included
+        self.received = 0                # samples actually received
+        self.tLast = None
+        self.late = False                # waiting to see if a late packet catches up
+        self.packets = 0
+        self.gaps = 0                    # confirmed losses
+        self.lostSamples = 0
+        self.lostNs = 0
+        self.stalls = 0                  # late packets that caught up: nothing lost
+        self.maxLag = 0                  # worst lag of an on-time packet, ns
+        self.slope = 1E9 / self.nominal  # ns per sample, from the fit
+        self.held = []                   # hold(): packets waiting for a decision (dropped here)
+
+    # expected arrival (ns) of a packet ending at sample 'end'
+    def _predict(self, end):
+        if len(self.times) >= 3:
+            return self.times[-1] + (end - self.ends[-1]) * self.slope
+        if self.times:                   # too few for a fit: last on-time packet, nominal rate
+            return self.times[-1] + (end - self.ends[-1]) * 1E9 / self.nominal
+        return self.tLast + (end - self.index) * 1E9 / self.nominal
+
+    def _fit(self):
+        if len(self.times) >= 3:
+            t = np.array(self.times, dtype=np.float64)
+            n = np.array(self.ends, dtype=np.float64)
+            self.slope = np.polyfit(n - n[0], t - t[0], 1)[0]
+
+    # one buffer of 'samples' (per channel) arrived at tArrive ns.
+    # known: samples already known to be lost just before it (eg. a reconnect).
+    # Returns (lost ns, lost samples) if this packet confirms a gap, else None.
+    def stamp(self, tArrive, samples, known=0):
+        self.packets += 1
+        self.index += known
+        gap = None
+        end = self.index + samples
+        if self.tLast is None or known:
+            self.times.clear()           # no useful prediction across a known gap
+            self.ends.clear()
+            self.late = False            # the known gap explains any lag
+        else:
+            packetNs = samples * self.slope
+            lag = tArrive - self._predict(end)
+            spacing = tArrive - self.tLast
+            if lag > self.gapTol * packetNs:
+                if spacing < self.burstTol * packetNs:
+                    self.late = True     # catching up from queued buffers
+                elif self.late:          # back to normal spacing, still behind: lost before the first late one
+                    extra = spacing - packetNs
+                    again = extra > self.gapTol * packetNs   # late after the last one too: lost again, before this one
+                    if again:
+                        lag -= extra
+                    if lag > self.gapTol * packetNs:
+                        gap = self._gap(lag, samples)
+                    else:
+                        self.stalls += 1 # the wait was a stall; the loss is just before this one
+                        self.late = False
+                    end = self.index + samples
+                    if again:            # previous packet, where it really belongs, is the reference now
+                        self.times.clear()
+                        self.ends.clear()
+                        self.times.append(self.tLast)
+                        self.ends.append(self.index)
+                        self.late = True # and this one waits for the next
+                else:
+                    self.late = True     # first late packet: see what the next one does
+            else:
+                if self.late:
+                    self.stalls += 1     # caught up, nothing lost
+                    self.late = False
+                self.maxLag = max(self.maxLag, lag)
+        if not self.late:
+            self.times.append(tArrive)
+            self.ends.append(end)
+            self._fit()
+        self.index = end
+        self.received += samples
+        self.tLast = tArrive
+        return gap
+
+    # stamp() one packet ('item': anything the caller needs to pass it on)
+    # and return the list of (gap, item) now ready, in arrival order. gap is
+    # None, or (lost ns, lost samples) just before that item. A late packet
+    # is held, and returned later with the ones that decided it. keep(item)
+    # makes a held item safe to keep, eg. copies a buffer rx() will reuse.
+    # With 'known' lost samples (a reconnect) the held packets go out first:
+    # the caller marks the known gap before this item itself.
+    def hold(self, item, tArrive, samples, known=0, keep=None):
+        ready = self.flush() if known else []
+        gap = self.stamp(tArrive, samples, known)
+        if gap is not None or not self.late:   # decided: the held packets go out
+            ready += [(None, it) for it in self.held]
+            if gap is not None:
+                ready[-len(self.held)] = (gap, self.held[0])   # lost before the first late packet
+            self.held = []
+        if self.late:                    # this one waits for the next
+            self.held.append(item if keep is None else keep(item))
+        else:
+            ready.append((None, item))
+        return ready
+
+    # held packets, undecided (eg. when stopping), as (None, item)
+    def flush(self):
+        out = [(None, it) for it in self.held]
+        self.held = []
+        self.late = False
+        return out
+
+    def _gap(self, lag, samples):
+        lost = int(round(lag / self.slope))
+        whole = int(round(lost / samples)) * samples
+        if abs(lost - whole) < samples // 4:
+            lost = whole                 # IIO drops whole buffers: take out the jitter
+        lostNs = int(lost * self.slope)
+        self.index += lost
+        self.gaps += 1
+        self.lostSamples += lost
+        self.lostNs += lostNs
+        self.late = False
+        self.times.clear()               # new line after the gap
+        self.ends.clear()
+        return (lostNs, lost)
+
+    # measured samples per second
+    def rate(self):
+        return 1E9 / self.slope
+
+    def ppm(self):
+        return 1E6 * (self.rate() - self.nominal) / self.nominal
+
+    def status(self):
+        return ("%.2f sps (%+.0f ppm)  gaps:%d lost:%d  stalls:%d" %
+                (self.rate(), self.ppm(), self.gaps, self.lostSamples, self.stalls))
+
+# ----------------------------------------------------
+# self-check: buffers of 100 samples at 1000 sps, some lost, some delayed;
+# the gap must come out just before the first buffer after the loss
+
+if __name__ == "__main__":
+    samples = 100
+    packetNs = int(samples / 1000 * 1E9)
+    ok = True
+    for lost, delayed in (((10, 11), ()), ((), (10,)), ((20,), (40,)), ((10, 12), ())):
+        clock = ArrivalClock(1000)
+        out = []
+        for k in range(60):
+            if k in lost:
+                continue
+            tArrive = (k + 1) * packetNs
+            if k in delayed:            # reader stalled: this one late, the next in a burst
+                tArrive += 3 * packetNs
+            elif k - 1 in delayed:
+                tArrive = max(tArrive, k * packetNs + 3 * packetNs + packetNs // 10)
+            out += clock.hold(k, tArrive, samples)
+        out += clock.flush()
+        items = [k for gap, k in out]
+        marks = [(k, gap[1]) for gap, k in out if gap is not None]
+        want = [(k + 1, samples) for k in lost if k + 1 not in lost]
+        if lost == (10, 11):
+            want = [(12, 2 * samples)]
+        good = items == [k for k in range(60) if k not in lost] and marks == want
+        ok = ok and good
+        print("lost %s, delayed %s: gaps at %s  %s  %s" %
+              (list(lost), list(delayed), marks, clock.status(), "OK" if good else "WRONG"))
+    print("gap placement %s" % ("OK" if ok else "WRONG"))
@@ -0,0 +1,566 @@
+# Binary UDP datagrams for live ADC data, sent to one receiver, a multicast
+# group or registered subscribers (UdpPublisher); on the receiving side,
+# loss, duplicate and reorder accounting and a jitter buffer that plays the
+# samples out at the nominal rate
+# used by adcbroker.py -u, in-tx-udp.py, iio-tx-udp.py and UDP-Rx-test.py
+# 17-Oct-2026
+
+# The text stream (in-tx-udp.py) costs about 10 bytes per sample and says
+# nothing about what was lost. Here each datagram is a 44-byte header and
+# packed samples, interleaved ch0,ch1,..,ch0,ch1,..:
+#
+#   magic     4s  b'ADCU'
+#   version   B   format version (1)
+#   format    B   FMT_INT24: 3 bytes per sample, FMT_INT32: 4 bytes
+#   nChan     B   channels interleaved
+#   flags     B   reserved, 0
+#   stream    I   stream id: new value when the sender restarts
+#   seq       I   datagram sequence number, counts up from 0 (wraps at 2^32)
+#   first     q   index of the first sample (per channel) since the stream began
+#   tStart    q   time of the first sample, ns since the epoch
+#   rate      I   sample rate, samples per second
+#   scale     f   volts per count
+#   count     H   samples per channel in this datagram
+#
+# all little-endian. FMT_INT24 holds the AD7124's unsigned 24-bit codes as
+# they come from the buffer (volts = code * scale, scale = Vref / 2^24, as
+# calcVolt); FMT_INT32 holds signed values, eg. mV text converted to counts
+# of 10 nV. Datagrams are sized to fit one Ethernet frame ('mtu'), so none
+# is ever fragmented, and 'first' lets the receiver place every sample on
+# the time axis even when datagrams are lost or arrive out of order.
+
+import struct
+import bisect        # jitter buffer: chunks sorted by first sample
+import time          # tStart when the caller gives none
+import socket        # UdpPublisher
+import select        # publisher thread: hellos, and queued datagrams as tokens come back
+import ipaddress     # is the destination a multicast group?
+import threading     # publisher thread
+import collections   # per-subscriber queue
+import numpy as np   # packing and unpacking the samples
+from adcdecode import Vref, FULL_SCALE   # code scale, as calcVolt
+
+MAGIC = b'ADCU'
+VERSION = 1
+FMT_INT32 = 0
+FMT_INT24 = 1
+SAMPLE_BYTES = {FMT_INT32: 4, FMT_INT24: 3}
+
+HEADER_FMT = '<4sBBBBIIqqIfHxx'
+HEADER_SIZE = struct.calcsize(HEADER_FMT)   # 44 bytes
+IP_UDP_BYTES = 28    # IPv4 + UDP headers in every datagram
+MAX_DATAGRAM = 65507 # largest UDP payload: any receive buffer this size never truncates
+
+ADC_SCALE = Vref / FULL_SCALE   # volts per code, as adcdecode.calcVolt
+
+# ----------------------------------------------------
+# sending side: split (channels x samples) packets into datagrams
+
+class UdpPacker:
+
+    def __init__(self, rate, nChan, fmt=FMT_INT24, scale=ADC_SCALE, mtu=1500, stream=None):
+        self.rate = rate
+        self.nChan = nChan
+        self.fmt = fmt
+        self.scale = scale
+        self.stream = stream if stream is not None else int(time.time()) & 0xFFFFFFFF
+        self.seq = 0
+        self.first = 0               # index of the next sample to send
+        room = mtu - IP_UDP_BYTES - HEADER_SIZE
+        self.maxSamples = min(room // (SAMPLE_BYTES[fmt] * nChan), 0xFFFF)   # per channel, per datagram
+
+    def header(self, count, tStart):
+        return struct.pack(HEADER_FMT, MAGIC, VERSION, self.fmt, self.nChan, 0, self.stream,
+                           self.seq & 0xFFFFFFFF, self.first, tStart, int(self.rate), self.scale, count)
+
+    # sample bytes of interleaved words (1-D, already in ch0,ch1,.. order)
+    def payload(self, words):
+        if self.fmt == FMT_INT24:    # low 3 bytes of each little-endian uint32
+            return np.ascontiguousarray(words, dtype='<u4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+        return np.ascontiguousarray(words, dtype='<i4').tobytes()
+
+    # one packet as a list of (header, payload) per datagram, to send with
+    # sock.sendmsg([header, payload], [], 0, addr). With FMT_INT32 and
+    # interleaved little-endian words (an rx() buffer) each payload is a
+    # memoryview of 'words' itself: the samples go from the buffer to the
+    # socket with no copy, so send them before the buffer is reused.
+    # tStart: ns time of the first sample (default: now)
+    def parts(self, codes, tStart=None):
+        if tStart is None:
+            tStart = time.time_ns()
+        words = codes.T.ravel() if codes.ndim == 2 else codes   # interleave, as on the wire
+        direct = (self.fmt == FMT_INT32 and words.dtype.itemsize == 4 and words.dtype.byteorder in "<=|"
+                  and words.flags.c_contiguous)
+        samples = len(words) // self.nChan
+        out = []
+        for s0 in range(0, samples, self.maxSamples):
+            n = min(self.maxSamples, samples - s0)
+            t = tStart + int(s0 * 1E9 / self.rate)
+            chunk = words[s0*self.nChan:(s0+n)*self.nChan]
+            out.append((self.header(n, t), memoryview(chunk).cast("B") if direct else self.payload(chunk)))
+            self.seq += 1
+            self.first += n
+        return out
+
+    # the same, as one bytes object per datagram
+    def pack(self, codes, tStart=None):
+        return [head + bytes(payload) for head, payload in self.parts(codes, tStart)]
+
+    # count samples the sender knows were lost (eg. an ADC reconnect), so 'first' stays true
+    def skip(self, samples):
+        self.first += samples
+
+# ----------------------------------------------------
+# sending side: every datagram, encoded once, to any number of receivers.
+# The destination 'host:port' says how:
+#   192.168.1.154:8000  one receiver (unicast)
+#   239.1.2.3:8000      a multicast group: one send reaches every receiver
+#                       that joined it (UDP-Rx-test.py -m 239.1.2.3), the
+#                       network does the copying, so nothing is limited here
+#   sub:8000            subscribers: a receiver registers by sending
+#                       'ADCSUB [<bytes per second>]' to this port
+#                       (UDP-Rx-test.py -s <host>:8000 repeats it every few
+#                       seconds) and gets its own unicast copy, sent to the
+#                       address the hello came from. One that says 'ADCBYE',
+#                       or nothing for 'timeout' seconds, is dropped.
+#
+# Each subscriber has a token bucket: it is sent at most the bytes per
+# second it asked for ('limit' if it did not say; 0: no limit), in bursts
+# of up to 'burst' seconds' worth. Datagrams over its limit wait in its own
+# queue and are sent by the publisher thread as tokens come back. The queue
+# is short ('depth' datagrams, the oldest dropped first) so that what does
+# get through is still live. The caller and the other subscribers never
+# wait for it. What it never gets shows up as lost sequence numbers at its
+# receiver, and the jitter buffer conceals it.
+
+SUB_HELLO = b"ADCSUB"
+SUB_BYE = b"ADCBYE"
+
+class UdpSubscriber:
+
+    def __init__(self, addr, limit, burst, now, fixed=False):
+        self.addr = addr
+        self.limit = limit           # bytes per second, 0: no limit
+        self.burst = limit * burst   # most tokens saved up, bytes
+        self.tokens = self.burst     # may go negative: a datagram is sent whole
+        self.tRefill = now
+        self.heard = now             # last hello
+        self.fixed = fixed           # unicast/multicast destination: never expires
+        self.q = collections.deque() # datagrams over the limit, as bytes
+        self.sent = 0
+        self.dropped = 0             # queue full: oldest discarded
+        self.errors = 0              # send failed, eg. no route
+
+    def refill(self, now):
+        if self.limit:
+            self.tokens = min(self.burst, self.tokens + (now - self.tRefill) * self.limit)
+        self.tRefill = now
+
+    def status(self):
+        return "%s:%d %s q:%d sent:%d dropped:%d" % (self.addr[0], self.addr[1],
+            "%.0f kB/s" % (self.limit / 1000) if self.limit else "no limit",
+            len(self.q), self.sent, self.dropped + self.errors)
+
+class UdpPublisher:
+
+    def __init__(self, dest, limit=0, burst=0.1, depth=8, timeout=10.0, ttl=1):
+        host, port = dest.rsplit(":", 1)
+        self.limit = limit
+        self.burst = burst
+        self.depth = depth
+        self.timeout = timeout
+        self.subs = {}               # address -> UdpSubscriber
+        self.lock = threading.Lock()
+        self.closed = False
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False) # a full send buffer loses a datagram, never stalls the sender
+        now = time.monotonic()
+        if host == "sub":
+            self.mode = "subscribers on port %s" % port
+            self.sock.bind(("", int(port)))
+            self.thread = threading.Thread(target=self._serve, name="publisher", daemon=True)
+            self.thread.start()
+        else:
+            addr = (socket.gethostbyname(host), int(port))   # resolve once, not per datagram
+            if ipaddress.ip_address(addr[0]).is_multicast:
+                self.mode = "multicast group %s:%s" % addr
+                self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            else:
+                self.mode = "%s:%s" % addr
+            self.subs[addr] = UdpSubscriber(addr, 0, burst, now, fixed=True)
+            self.thread = None
+
+    # one datagram: bytes, or a list of buffers for sendmsg (UdpPacker.parts)
+    def send(self, parts):
+        if isinstance(parts, (bytes, bytearray)):
+            parts = [parts]
+        blob = None                  # joined only if some subscriber has to queue it
+        now = time.monotonic()
+        with self.lock:
+            for sub in self.subs.values():
+                sub.refill(now)
+                if not sub.q and sub.tokens >= 0:
+                    self._sendTo(sub, parts)
+                    continue
+                if blob is None:
+                    blob = b"".join(parts)   # 'parts' may be a view of a buffer about to be reused
+                if len(sub.q) >= self.depth:
+                    sub.q.popleft()
+                    sub.dropped += 1
+                sub.q.append(blob)
+                self._pump(sub)
+
+    def _sendTo(self, sub, parts):
+        try:
+            n = self.sock.sendmsg(parts, [], 0, sub.addr)
+            if sub.limit:
+                sub.tokens -= n
+            sub.sent += 1
+        except OSError:              # eg. no route, or the send buffer is full
+            sub.errors += 1
+
+    # queued datagrams, as far as the subscriber's tokens allow
+    def _pump(self, sub):
+        while sub.q and sub.tokens >= 0:
+            self._sendTo(sub, [sub.q.popleft()])
+
+    # publisher thread: hellos and goodbyes, queued datagrams, expiry
+    def _serve(self):
+        while not self.closed:
+            with self.lock:
+                waiting = any(sub.q for sub in self.subs.values())
+            try:
+                ready, _, _ = select.select([self.sock], [], [], 0.01 if waiting else 0.5)
+            except (OSError, ValueError):
+                return               # close() was called
+            now = time.monotonic()
+            with self.lock:
+                while ready:
+                    try:
+                        data, addr = self.sock.recvfrom(256)
+                    except BlockingIOError:
+                        break
+                    except OSError:
+                        return
+                    self._hello(data.split(), addr, now)
+                for addr, sub in list(self.subs.items()):
+                    sub.refill(now)
+                    self._pump(sub)
+                    if not sub.fixed and now - sub.heard > self.timeout:
+                        print("\nSubscriber %s timed out: %s" % ("%s:%d" % addr, sub.status()))
+                        del self.subs[addr]
+
+    def _hello(self, words, addr, now):
+        if not words:
+            return
+        if words[0] == SUB_BYE and addr in self.subs:
+            print("\nSubscriber %s left: %s" % ("%s:%d" % addr, self.subs[addr].status()))
+            del self.subs[addr]
+        elif words[0] == SUB_HELLO:
+            try:
+                limit = int(words[1]) if len(words) > 1 else self.limit
+            except ValueError:
+                return
+            sub = self.subs.get(addr)
+            if sub is None:
+                print("\nSubscriber %s:%d joined (%s)" % (addr[0], addr[1],
+                      "%d bytes/s" % limit if limit else "no limit"))
+                sub = UdpSubscriber(addr, limit, self.burst, now)
+                self.subs[addr] = sub
+            elif sub.limit != limit:     # asked for a new limit
+                sub.limit = limit
+                sub.burst = limit * self.burst
+            sub.heard = now
+
+    def status(self):
+        with self.lock:
+            if self.thread is not None and not self.subs:
+                return "no subscribers"
+            return "   ".join(sub.status() for sub in self.subs.values())
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+
+# ----------------------------------------------------
+# receiving side
+
+def isDatagram(data):
+    return len(data) >= HEADER_SIZE and data[:4] == MAGIC
+
+# header dict and samples as (channels x count) int64 codes; raises ValueError if malformed
+def parse(data):
+    if not isDatagram(data):
+        raise ValueError("not an ADC datagram")
+    fields = struct.unpack_from(HEADER_FMT, data)
+    hdr = dict(zip(('magic', 'version', 'fmt', 'nChan', 'flags', 'stream', 'seq', 'first',
+                    'tStart', 'rate', 'scale', 'count'), fields))
+    if hdr['version'] != VERSION or hdr['fmt'] not in SAMPLE_BYTES:
+        raise ValueError("unsupported datagram version %d format %d" % (hdr['version'], hdr['fmt']))
+    nWords = hdr['count'] * hdr['nChan']
+    size = SAMPLE_BYTES[hdr['fmt']]
+    if len(data) < HEADER_SIZE + nWords * size:
+        raise ValueError("datagram truncated: %d bytes" % len(data))
+    raw = np.frombuffer(data, dtype=np.uint8, count=nWords * size, offset=HEADER_SIZE)
+    if hdr['fmt'] == FMT_INT24:
+        b = raw.reshape(-1, 3).astype(np.int64)
+        words = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+    else:
+        words = raw.view('<i4').astype(np.int64)
+    return hdr, words.reshape(-1, hdr['nChan']).T
+
+# ----------------------------------------------------
+# what happened to each stream's sequence numbers:
+#   lost        never arrived (so far: a late arrival takes it off again)
+#   duplicates  same seq seen twice
+#   reordered   arrived after a later seq (filled a hole)
+#   late        too old to tell (more than 'window' behind): dropped
+#   restarts    new stream id (the sender started again)
+# seq is 32 bits on the wire; it is unwrapped here, so the counts go on
+# past 2^32 datagrams.
+
+class SeqTracker:
+
+    def __init__(self, window=1024):
+        self.window = window
+        self.stream = None
+        self.received = 0
+        self.lost = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.late = 0
+        self.restarts = 0
+        self.top = None              # highest seq seen in this stream
+        self.seen = np.zeros(window, dtype=np.int64) - 1   # seq last seen in each slot
+
+    # returns "new", "reordered", "duplicate" or "late": whether to use the datagram
+    def add(self, stream, seq):
+        self.received += 1
+        if stream != self.stream:
+            if self.stream is not None:
+                self.restarts += 1
+            self.stream = stream
+            self.seen[:] = -1
+            self.top = seq - 1
+        else:
+            seq = self.top + ((seq - self.top + 2**31) % 2**32 - 2**31)   # nearest to top
+        slot = seq % self.window
+        if seq > self.top:
+            self.lost += seq - self.top - 1    # holes for now; late arrivals fill them
+            for s in range(max(self.top + 1, seq - self.window + 1), seq):
+                self.seen[s % self.window] = -1
+            self.top = seq
+            self.seen[slot] = seq
+            return "new"
+        if self.top - seq >= self.window:
+            self.late += 1
+            return "late"
+        if self.seen[slot] == seq:
+            self.duplicates += 1
+            return "duplicate"
+        self.seen[slot] = seq
+        self.lost -= 1
+        self.reordered += 1
+        return "reordered"
+
+    def status(self):
+        return ("datagrams:%d lost:%d dup:%d reordered:%d late:%d restarts:%d" %
+                (self.received, self.lost, self.duplicates, self.reordered, self.late, self.restarts))
+
+# ----------------------------------------------------
+# jitter buffer: put() datagrams in any order, take() samples at the
+# nominal rate. Samples are placed by their 'first' index, so reordered
+# datagrams land where they belong and duplicates are ignored. Playout
+# starts 'delay' seconds after the first datagram; that much data is kept
+# in hand to ride out bursts. A hole still missing when its turn comes is
+# concealed:
+#   CONCEAL_MARK     NaN samples (printed as 'nan'), so the gap is visible
+#   CONCEAL_INTERP   straight line from the last value played to the first
+#                    value after the hole (held level if that has not
+#                    arrived either)
+# A datagram that arrives after its samples were played is counted late
+# and dropped. If the buffer grows past 'maxDelay' (sender clock faster
+# than ours, or a burst after a stall) playout skips ahead to 'delay' again
+# (a resync). When nothing has arrived for 'idle' seconds and nothing is
+# left to play, playout stops and starts over with the next datagram.
+
+CONCEAL_MARK = "mark"
+CONCEAL_INTERP = "interp"
+
+class JitterBuffer:
+
+    def __init__(self, delay=0.2, maxDelay=1.0, conceal=CONCEAL_INTERP, idle=2.0):
+        self.delay = delay
+        self.maxDelay = maxDelay
+        self.conceal = conceal
+        self.idle = idle
+        self.late = 0                # datagrams that came after their samples were played
+        self.duplicates = 0          # datagrams already in the buffer
+        self.concealed = 0           # samples (per channel) made up
+        self.holes = 0               # separate runs of made-up samples
+        self.resyncs = 0             # times playout jumped ahead
+        self.restarts = 0            # times playout started over (new stream, or idle)
+        self.stream = None
+        self.reset()
+
+    def reset(self):
+        self.chunks = {}             # first sample index -> (channels x count) values
+        self.starts = []             # sorted keys of chunks
+        self.playPos = None          # index of the next sample to play
+        self.tPlay0 = None           # when sample 'pos0' is due
+        self.last = None             # last value played, per channel
+        self.inHole = False
+        self.tArrive = 0.0
+
+    # samples buffered ahead of the play position
+    def depth(self):
+        if self.playPos is None or not self.starts:
+            return 0
+        k = self.starts[-1]
+        return max(0, k + self.chunks[k].shape[1] - self.playPos)
+
+    def put(self, hdr, values, now):
+        if hdr['stream'] != self.stream:
+            if self.stream is not None:
+                self.restarts += 1
+            self.stream = hdr['stream']
+            self.reset()
+        self.rate = hdr['rate']
+        self.nChan = hdr['nChan']
+        first, count = hdr['first'], hdr['count']
+        self.tArrive = now
+        if self.playPos is None:     # first datagram: start playing 'delay' from now
+            self.playPos = self.pos0 = first
+            self.tPlay0 = now + self.delay
+            self.last = values[:, 0].astype(np.float64)
+        if first + count <= self.playPos:
+            self.late += 1
+            return
+        if first in self.chunks:
+            self.duplicates += 1
+            return
+        self.chunks[first] = values
+        bisect.insort(self.starts, first)
+        if self.depth() > self.maxDelay * self.rate:   # too far behind: jump to 'delay' before the newest
+            newPos = self.starts[-1] + self.chunks[self.starts[-1]].shape[1] - int(self.delay * self.rate)
+            self.pos0 += newPos - self.playPos
+            self.playPos = newPos
+            self.resyncs += 1
+            self._discard()
+
+    # drop chunks entirely before the play position
+    def _discard(self):
+        while self.starts and self.starts[0] + self.chunks[self.starts[0]].shape[1] <= self.playPos:
+            del self.chunks[self.starts.pop(0)]
+
+    # samples due by 'now', as (channels x n) float64, or None
+    def take(self, now):
+        if self.playPos is None or now < self.tPlay0:
+            return None
+        if not self.starts and now - self.tArrive > self.idle:
+            self.reset()             # sender stopped: wait for it without making up data
+            self.restarts += 1
+            return None
+        due = self.pos0 + int((now - self.tPlay0) * self.rate)
+        n = due - self.playPos
+        if n <= 0:
+            return None
+        out = np.empty((self.nChan, n))
+        pos = self.playPos
+        while pos < due:
+            i = bisect.bisect_right(self.starts, pos) - 1   # chunk starting at or before pos
+            if i >= 0 and self.starts[i] + self.chunks[self.starts[i]].shape[1] > pos:
+                k = self.starts[i]
+                chunk = self.chunks[k]
+                m = min(k + chunk.shape[1], due) - pos
+                out[:, pos - self.playPos:pos - self.playPos + m] = chunk[:, pos - k:pos - k + m]
+                self.inHole = False
+            else:                    # hole: up to the next chunk, or everything due
+                nxt = self.starts[i + 1] if i + 1 < len(self.starts) else None
+                m = (min(nxt, due) if nxt is not None else due) - pos
+                seg = out[:, pos - self.playPos:pos - self.playPos + m]
+                if self.conceal == CONCEAL_MARK:
+                    seg[:] = np.nan
+                elif nxt is not None:    # line from the last value to the next real one
+                    span = nxt - pos + 1
+                    frac = np.arange(1, m + 1) / span
+                    seg[:] = self.last[:, np.newaxis] + np.outer(self.chunks[nxt][:, 0] - self.last, frac)
+                else:
+                    seg[:] = self.last[:, np.newaxis]
+                if not self.inHole:
+                    self.holes += 1
+                    self.inHole = True
+                self.concealed += m
+            pos += m
+            if self.conceal != CONCEAL_MARK or not self.inHole:
+                self.last = out[:, pos - self.playPos - 1].copy()
+        self.playPos = due
+        self._discard()
+        return out
+
+    def status(self):
+        depthMs = 1000.0 * self.depth() / self.rate if self.stream is not None else 0.0
+        return ("jitter depth:%.0f ms late:%d concealed:%d (%d holes) resyncs:%d restarts:%d" %
+                (depthMs, self.late, self.concealed, self.holes, self.resyncs, self.restarts))
+
+# ----------------------------------------------------
+# self-check: pack, shuffle, duplicate and drop datagrams, then parse and count
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(1)
+    ok = True
+    for fmt in (FMT_INT24, FMT_INT32):
+        p = UdpPacker(1000, 3, fmt)
+        codes = rng.integers(0, 2**24, (3, 2000), dtype=np.uint32)
+        grams = p.pack(codes, 0)
+        got = np.zeros(codes.shape, dtype=np.int64)
+        for g in grams:
+            hdr, s = parse(g)
+            got[:, hdr['first']:hdr['first'] + hdr['count']] = s
+            ok = ok and len(g) <= 1500 - IP_UDP_BYTES
+        ok = ok and np.array_equal(got, codes)
+        print("format %d: %d datagrams of up to %d samples, round trip %s" %
+              (fmt, len(grams), p.maxSamples, "OK" if np.array_equal(got, codes) else "WRONG"))
+
+    t = SeqTracker()
+    order = list(range(100))
+    del order[40]                    # lost
+    order[10], order[12] = order[12], order[10]   # 11 and 10 arrive after 12
+    order.insert(20, 19)             # duplicate
+    for seq in order:
+        t.add(7, seq)
+    print(t.status())
+    ok = ok and (t.lost, t.duplicates, t.reordered) == (1, 1, 2)
+    print("sequence accounting %s" % ("OK" if ok else "WRONG"))
+
+    # jitter buffer: a ramp, one datagram lost, two swapped, one duplicated,
+    # each arriving up to 150 ms late; interpolation rebuilds the ramp exactly
+    p = UdpPacker(1000, 2, FMT_INT32, scale=1.0)
+    ramp = np.arange(5000) * 3
+    grams = p.pack(np.vstack((ramp, -ramp)), 0)
+    order = list(range(len(grams)))
+    order[3], order[5] = order[5], order[3]
+    del order[8]
+    order.insert(12, 11)
+    arrivals = sorted((parse(grams[i])[0]['first'] / 1000 + 0.15 * rng.random(), i) for i in order)
+    for conceal in (CONCEAL_INTERP, CONCEAL_MARK):
+        jb = JitterBuffer(delay=0.4, conceal=conceal)
+        out = []
+        a = 0
+        for tick in range(560):      # take() every 10 ms
+            now = tick * 0.01
+            while a < len(arrivals) and arrivals[a][0] <= now:
+                hdr, s = parse(grams[arrivals[a][1]])
+                jb.put(hdr, s.astype(np.float64), now)
+                a += 1
+            got = jb.take(now)
+            if got is not None:
+                out.append(got)
+        out = np.hstack(out)[0, :len(ramp)]
+        if conceal == CONCEAL_INTERP:
+            good = np.array_equal(out, ramp)
+        else:
+            good = np.isnan(out).sum() == p.maxSamples and np.array_equal(out[~np.isnan(out)], ramp[~np.isnan(out)])
+        ok = ok and good and jb.duplicates == 1 and jb.late == 0
+        print("%s  duplicates:%d, %s" % (jb.status(), jb.duplicates, "OK" if good else "WRONG"))
+    print("jitter buffer %s" % ("OK" if ok else "WRONG"))
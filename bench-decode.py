@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+# Benchmark: decode one rx() buffer with struct.unpack + list (old way)
+# versus the typed NumPy view in adcdecode.py
+# does not need the ADC; uses random 24-bit codes in a packed buffer
+# 17-Oct-2026
+
+import sys
+import timeit
+from struct import unpack  # the old decode path, for comparison
+import numpy as np
+from adcdecode import decodeRaw, calcVolt
+
+def oldDecode(data_raw, samples):
+    fmt = "%dI" % samples
+    yr = np.array( list(unpack(fmt, data_raw)) )
+    return calcVolt(yr)
+
+def newDecode(data_raw, samples):
+    yr = decodeRaw(data_raw, samples)
+    return calcVolt(yr)
+
+def bench(samples, reps):
+    codes = np.random.default_rng(1).integers(0, 2**24, samples, dtype=np.uint32)
+    data_raw = codes.tobytes()   # same layout rx() returns with the patched Pyadi-iio
+    if not np.array_equal(oldDecode(data_raw, samples), newDecode(data_raw, samples)):
+        print("Error: decode results differ at %d samples" % samples)
+        sys.exit(1)
+    tOld = min(timeit.repeat(lambda: oldDecode(data_raw, samples), number=reps, repeat=3)) / reps
+    tNew = min(timeit.repeat(lambda: newDecode(data_raw, samples), number=reps, repeat=3)) / reps
+    return tOld, tNew
+
+if __name__ == "__main__":
+
+    reps = 20
+    if len(sys.argv) > 1:
+        reps = int(sys.argv[1])  # optional: how many decodes per timing run
+
+    print("samples    unpack(ms)   numpy(ms)   speedup")
+    for samples in (1000, 10000, 19200, 100000):
+        tOld, tNew = bench(samples, reps)
+        print("%7d  %11.3f  %10.3f  %8.1fx" % (samples, tOld*1E3, tNew*1E3, tOld/tNew))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# Benchmark: highest sample rate the ADC link delivers with no lost buffers,
+# for each buffer size (msec per rx()), kernel buffer count and prefetch depth
+# uses a simulated ADC (adciio.FakeContext) when no address is given
+# 17-Oct-2026
+
+# Each configuration runs for a few seconds at rising sample rates while
+# adctiming.ArrivalClock watches the arrival times; the first rate with a
+# lost buffer ends that configuration. Optional per-packet work and a
+# once-a-second stall (ms; sleeps, like file or plot I/O that releases the
+# GIL) stand in for what REC2.py or ADC1.py do with each packet and for an
+# occasional slow redraw or disk flush: the kernel buffers and prefetch
+# have to carry the reader through the stall. Use the result to pick
+# kernelBuffers, prefetch and aqTime in those scripts.
+#
+# Usage:
+#   bench-iio.py [<IP_address> | -] [<seconds per run>] [<work ms per packet>] [<stall ms per second>]
+
+import sys
+import time
+from adciio import RawADC, FakeContext
+from adcdecode import decodeChannels
+from adctiming import ArrivalClock
+
+rates = (500, 1000, 2000, 4800, 9600, 19200)  # sample rates tried, in order
+aqTimes = (0.05, 0.2, 0.5)   # seconds of data per rx() buffer
+kernelCounts = (2, 4, 8, 16) # IIO buffers queued in the kernel
+prefetches = (0, 2)          # buffers read ahead by a thread
+channels = [0]
+
+# one run: returns (gaps, lost samples, stalls, measured sps)
+def run(uri, rate, aqTime, kernelBuffers, prefetch, seconds, workMs, stallMs):
+    ctx = FakeContext(realTime=True) if uri is None else None
+    adc = RawADC(uri, ctx=ctx, kernelBuffers=kernelBuffers, prefetch=prefetch)
+    samples = int(aqTime * rate)
+    adc.sample_rate = rate
+    adc.rx_buffer_size = samples
+    adc.rx_enabled_channels = channels
+    adc._ctx.set_timeout(int(1000 * aqTime) * 3 + 2000)   # milliseconds, as adcdevice.rxTimeout
+    clock = ArrivalClock(rate)
+    tEnd = time.monotonic() + seconds
+    tStall = time.monotonic() + 1.0
+    try:
+        while time.monotonic() < tEnd:
+            data_raw = adc.rx()
+            clock.stamp(time.monotonic_ns(), samples)
+            decodeChannels(data_raw, samples, len(channels))
+            if workMs > 0:
+                time.sleep(workMs / 1000.0)
+            if stallMs > 0 and time.monotonic() > tStall:
+                time.sleep(stallMs / 1000.0)
+                tStall += 1.0
+    finally:
+        adc.rx_destroy_buffer()
+    return clock.gaps, clock.lostSamples, clock.stalls, clock.rate()
+
+if __name__ == "__main__":
+
+    uri = None
+    seconds = 5.0
+    workMs = 0.0
+    stallMs = 0.0
+    if len(sys.argv) > 1 and sys.argv[1] != "-":
+        uri = "ip:" + sys.argv[1]
+    if len(sys.argv) > 2:
+        seconds = float(sys.argv[2])
+    if len(sys.argv) > 3:
+        workMs = float(sys.argv[3])
+    if len(sys.argv) > 4:
+        stallMs = float(sys.argv[4])
+
+    print("ADC: %s   %.1f s per run   work %.1f ms per packet   stall %.1f ms per second" %
+          (uri or "simulated", seconds, workMs, stallMs))
+    print("aq(ms)  kbufs  prefetch   max sps   measured  stalls   first lost at")
+    for aqTime in aqTimes:
+        for kernelBuffers in kernelCounts:
+            for prefetch in prefetches:
+                best = None
+                fail = "-"
+                for rate in rates:
+                    gaps, lost, stalls, measured = run(uri, rate, aqTime, kernelBuffers,
+                                                       prefetch, seconds, workMs, stallMs)
+                    if gaps > 0:
+                        fail = "%d sps (%d gaps)" % (rate, gaps)
+                        break
+                    best = (rate, measured, stalls)
+                if best is None:
+                    print("%6d  %5d  %8d   %7s  %9s  %6s   %s" %
+                          (aqTime*1000, kernelBuffers, prefetch, "none", "-", "-", fail))
+                else:
+                    print("%6d  %5d  %8d   %7d  %9.1f  %6d   %s" %
+                          (aqTime*1000, kernelBuffers, prefetch, best[0], best[1], best[2], fail))
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Benchmark: end-to-end throughput of the record-only, plot-only and
+# record+plot pipelines, with CPU time per stage
+# does not need the ADC; runs on the simulated one in adciio.py
+# 17-Oct-2026
+
+# Each pipeline does what REC2.py / ADC1.py do with a packet, in one
+# thread, as fast as the fake ADC hands out buffers:
+#   rx       RawADC.rx() on "fake:" (copy into the buffer pool)
+#   decode   decodeChannels + calcVolt
+#   record   mV CSV text to a file, as REC2.py (np.savetxt)
+#   plot     decimate into the sweep buffer and its Envelope, as ADC1.ingest
+#   render   BlitPlot.update on an off-screen canvas, at most maxFPS per second
+# so samples per second of wall time is the most that pipeline can keep up
+# with on this machine. CPU per stage is time.thread_time() around each.
+#
+# Give a baseline file to catch regressions: the first run writes it, later
+# runs compare against it and flag any pipeline more than 'tolerance' slower.
+#
+# Usage:
+#   bench-pipeline.py [<seconds per run>] [<baseline.json>]
+
+import sys
+import os
+import json          # baseline file
+import tempfile      # recorded CSV goes here, then is deleted
+import time
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # off-screen: measures drawing, not the window system
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from adciio import RawADC
+from adcdecode import decodeChannels, calcVolt
+from adcplot import BlitPlot, Envelope
+
+pipelines = {"record": ("record",),
+             "plot":   ("plot", "render"),
+             "both":   ("record", "plot", "render")}
+stages = ("rx", "decode", "record", "plot", "render")
+packetSizes = (200, 1000, 10000)   # samples per channel per rx()
+channels = [0, 1]
+rate = 1000          # sets only the time axis: the fake ADC does not wait
+R = 1                # decimation ratio, as ADC1.py
+bSets = 5            # packets across the sweep graph, as ADC1.py
+maxFPS = 20          # render cap, as ADC1.py
+plotColumns = 1000
+tolerance = 0.15     # baseline: flag a pipeline this much slower
+
+# ----------------------------------------------------
+# one pipeline at one packet size: returns (samples/sec, {stage: CPU ms per packet})
+
+def run(pipeline, samples, seconds, saveDir):
+    use = pipelines[pipeline]
+    nChan = len(channels)
+    adc = RawADC("fake:")
+    adc.sample_rate = rate
+    adc.rx_buffer_size = samples
+    adc.rx_enabled_channels = channels
+
+    points = samples * bSets // R
+    xdata = np.arange(points) * R / rate
+    batch = np.zeros((nChan, points))
+    env = Envelope(xdata, nChan, plotColumns)
+    fig = Figure(figsize=(10, 4))
+    canvas = FigureCanvasAgg(fig)
+    plotter = BlitPlot(canvas, fig.add_subplot(111))
+    plotter.setup(env.x, nChan)
+    fout = open(os.path.join(saveDir, "bench.csv"), "w")
+
+    cpu = dict.fromkeys(stages, 0.0)
+    bStart = 0
+    packets = 0
+    tFrame = 0.0
+    t0 = time.perf_counter()
+    tEnd = t0 + seconds
+    while time.perf_counter() < tEnd:
+        c0 = time.thread_time()
+        data_raw = adc.rx()
+        c1 = time.thread_time()
+        volts = calcVolt(decodeChannels(data_raw, samples, nChan))
+        c2 = time.thread_time()
+        cpu["rx"] += c1 - c0
+        cpu["decode"] += c2 - c1
+        if "record" in use:
+            np.savetxt(fout, volts.T*1000, fmt='%0.5f', delimiter=', ')
+            c3 = time.thread_time()
+            cpu["record"] += c3 - c2
+            c2 = c3
+        if "plot" in use:
+            yD = volts.reshape(nChan, -1, R).mean(axis=2) if R > 1 else volts
+            bEnd = bStart + samples // R
+            batch[:, bStart:bEnd] = yD
+            env.update(batch, bStart, bEnd)
+            bStart = bEnd % points
+            c3 = time.thread_time()
+            cpu["plot"] += c3 - c2
+            c2 = c3
+        if "render" in use and time.perf_counter() - tFrame >= 1.0 / maxFPS:
+            tFrame = time.perf_counter()
+            rms = np.std(volts, axis=1)
+            plotter.update(env.y, time.strftime('%Y-%m-%d %H:%M:%S'),
+                           "  ".join("%.3f" % r for r in rms*1E3) + ' mV RMS')
+            cpu["render"] += time.thread_time() - c2
+        packets += 1
+    wall = time.perf_counter() - t0
+    fout.close()
+    adc.rx_destroy_buffer()
+    return packets * samples / wall, {s: 1E3 * cpu[s] / packets for s in stages}
+
+if __name__ == "__main__":
+
+    seconds = 3.0
+    baseline = None
+    if len(sys.argv) > 1:
+        seconds = float(sys.argv[1])
+    if len(sys.argv) > 2:
+        baseline = sys.argv[2]
+
+    old = {}
+    if baseline is not None and os.path.exists(baseline):
+        with open(baseline) as f:
+            old = json.load(f)
+
+    print("%d channels, %.1f s per run, CPU in ms per packet" % (len(channels), seconds))
+    print("pipeline  samples     max sps  " + "".join("%9s" % s for s in stages) + "   vs baseline")
+    results = {}
+    slower = []
+    with tempfile.TemporaryDirectory() as saveDir:
+        for pipeline in pipelines:
+            for samples in packetSizes:
+                sps, cpu = run(pipeline, samples, seconds, saveDir)
+                key = "%s/%d" % (pipeline, samples)
+                results[key] = sps
+                change = ""
+                if key in old:
+                    ratio = sps / old[key]
+                    change = "%+6.1f%%" % (100 * (ratio - 1))
+                    if ratio < 1 - tolerance:
+                        change += "  SLOWER"
+                        slower.append(key)
+                print("%-8s  %7d  %10.0f  " % (pipeline, samples, sps) +
+                      "".join("%9.3f" % cpu[s] for s in stages) + "   " + change)
+
+    if baseline is not None and not old:
+        with open(baseline, "w") as f:
+            json.dump(results, f, indent=1)
+        print("Baseline written to %s" % baseline)
+    if slower:
+        print("Slower than baseline by more than %d%%: %s" % (tolerance * 100, ", ".join(slower)))
+        sys.exit(1)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+# Benchmark: ADC to UDP on loopback, the three-process pipe
+#   iio_readdev | adi_bin2csv | in-tx-udp.py -c
+# against the one-process streamer iio-tx-udp.py
+# does not need the ADC: 'cat' of a file of raw words stands in for
+# iio_readdev, and iio-tx-udp.py runs on the simulated ADC (fake:)
+# 17-Oct-2026
+
+# Both send as fast as they can; this script receives on 127.0.0.1 and
+# reports values (samples x channels) per second delivered and the CPU
+# time all the sender processes used (getrusage of the children). The
+# pipe sends one value per line, so its datagrams say 1 channel; counting
+# values keeps the two comparable.
+# adi_bin2csv.c is compiled into a temporary directory if it is not on PATH.
+#
+# Usage:
+#   bench-udp.py [<seconds of data>] [<sample_rate>] [<channels>]
+
+import sys
+import os
+import shutil        # find adi_bin2csv, cc
+import socket
+import subprocess
+import resource      # CPU time of finished child processes
+import tempfile
+import time
+import numpy as np
+from adcudp import parse
+
+port = 8193
+aqTime = 0.2         # seconds per ADC buffer, for iio-tx-udp.py
+here = os.path.dirname(os.path.abspath(__file__))
+python = sys.executable
+
+# receive until the sender is done and nothing has arrived for 'idle' seconds
+def receive(rxSocket, proc, idle=1.0):
+    values = 0
+    grams = 0
+    tFirst = tLast = None
+    while True:
+        try:
+            data = rxSocket.recv(65536)
+        except socket.timeout:
+            if proc.poll() is not None and (tLast is None or time.perf_counter() - tLast > idle):
+                break
+            continue
+        hdr, codes = parse(data)
+        tLast = time.perf_counter()
+        if tFirst is None:
+            tFirst = tLast
+        values += hdr['count'] * hdr['nChan']
+        grams += 1
+    proc.wait()
+    return values, grams, (tLast - tFirst) if tFirst is not None else 0.0
+
+def run(name, cmd, rxSocket, total):
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, shell=True, cwd=here, stdout=subprocess.DEVNULL)
+    values, grams, span = receive(rxSocket, proc)
+    wall = time.perf_counter() - t0
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    print("%-30s %9d  %9d  %10.0f  %7.2f  %13.3f%s" %
+          (name, values, grams, values / max(wall, 1E-6), cpu, cpu / max(values, 1) * 1E6,
+           "" if values == total else "   (expected %d)" % total))
+
+if __name__ == "__main__":
+
+    seconds = 60         # seconds of ADC data to send
+    rate = 19200
+    nChan = 2
+    if len(sys.argv) > 1:
+        seconds = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        rate = int(sys.argv[2])
+    if len(sys.argv) > 3:
+        nChan = int(sys.argv[3])
+    total = seconds * rate   # samples per channel
+    samples = int(aqTime * rate)
+    channels = ",".join(str(c) for c in range(nChan))
+
+    rxSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rxSocket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 2**20)
+    rxSocket.bind(("127.0.0.1", port))
+    rxSocket.settimeout(0.2)
+
+    print("%d s of %d sps x %d channels (%d samples per channel), loopback UDP" %
+          (seconds, rate, nChan, total))
+    print("sender                            values  datagrams   values/s   CPU(s)   CPU us/value")
+    with tempfile.TemporaryDirectory() as tmp:
+        conv = shutil.which("adi_bin2csv")
+        if conv is None and shutil.which("cc"):
+            conv = os.path.join(tmp, "adi_bin2csv")
+            subprocess.run(["cc", "-O2", "-o", conv, os.path.join(here, "adi_bin2csv.c")],
+                           check=True, stderr=subprocess.DEVNULL)
+        if conv is None:
+            print("adi_bin2csv not found and no C compiler: skipping the pipe")
+        else:
+            raw = os.path.join(tmp, "raw.bin")   # what iio_readdev would write: uint32 words
+            k = np.arange(total * nChan, dtype=np.uint32)
+            (k & 0xFFFFFF).tofile(raw)
+            run("cat | adi_bin2csv | in-tx-udp", "cat %s | %s | %s in-tx-udp.py -c 127.0.0.1 %d %d" %
+                (raw, conv, python, port, rate), rxSocket, total * nChan)
+        run("iio-tx-udp.py (one process)", "%s iio-tx-udp.py fake: 127.0.0.1:%d %d %d %s -n %d" %
+            (python, port, int(aqTime * 1000), rate, channels, total // samples), rxSocket, total * nChan)
@@ -7,7 +7,7 @@
 import adi
 import matplotlib.pyplot as plt
 import numpy as np
-from struct import unpack
+from adcdecode import decodeRaw
 import sys
 import datetime
 import csv      # write data to CSV file
@@ -80,8 +80,7 @@ with open(datfile, "a") as fout:  # append each batch of readings
   while ( True ):
     data_raw = my_ad7124.rx()
 
-    fmt = "%dI" % samples
-    yr = np.array( list(unpack(fmt, data_raw)) )
+    yr = decodeRaw(data_raw, samples)
     y = calcTemp(yr)  # convert raw readings into Temp, deg.C
     
     yD = y.reshape(-1, R).mean(axis=1) # average each set of R values
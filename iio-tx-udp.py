@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+# Stream the AD7124 to a remote host as binary UDP datagrams, in one process
+# replaces  iio_readdev | adi_bin2csv | in-tx-udp.py
+# 17-Oct-2026
+
+# The shell pipeline reads the raw buffer, prints every sample as decimal
+# text (adi_bin2csv), then parses the text again in Python to send it.
+# Here the ADC is opened with the same adcdevice.py settings as REC2.py
+# and ADC1.py (ADCSession: reconnects by itself), each rx() buffer is a
+# view of the IIO buffer memory (zeroCopy), and its samples go to the
+# socket straight from that memory with sendmsg (adcudp.UdpPacker.parts,
+# FMT_INT32): no decode, no text, no copy. Lost buffers (from arrival
+# times, adctiming.py) and reconnects advance the datagram 'first' sample
+# index, so the receiver (UDP-Rx-test.py) sees exactly where data is missing.
+#
+# <host:port> may be a multicast group, or sub:<port> for receivers that
+# register (UDP-Rx-test.py -s): one ADC, one encoding, N receivers, each
+# subscriber limited to its own rate so a slow link only loses its own data.
+#
+# Usage:
+#   iio-tx-udp.py <IP_address> <host:port | group:port | sub:port> [<msec_aq>] [<sample_rate>] [<channels>] [-n <packets>]
+#   IP_address may be fake:... for the simulated ADC (adciio.py); -n stops after that many buffers
+
+import sys
+import signal       # handle control-C
+import time
+import numpy as np  # copy of a held buffer
+from datetime import datetime  # for time/date timestamp on status line
+from adcdevice import ADCSession, parseChannels  # same ADC setup as REC2.py
+from adctiming import ArrivalClock  # lost buffers, from arrival times
+from adcudp import UdpPacker, UdpPublisher, FMT_INT32, ADC_SCALE  # binary datagram format, fan-out
+
+version = "IIO UDP Tx v0.1  (17-Oct-2026)"
+
+aqTime = 0.20       # duration of 1 dataset, in seconds
+rate = 1000         # readings per second
+channels = [0]      # ADC input channels to send (interleaved in each datagram)
+kernelBuffers = 8   # IIO buffers queued in the kernel (see bench-iio.py)
+mtu = 1500          # datagrams are sized to fit one frame
+stopTx = False      # set by control-C
+
+def signal_handler(sig, frame):
+    global stopTx
+    stopTx = True
+
+# ----------------------------------------------------
+# a buffer the clock holds back: copy it, the view is only good until the next rx()
+
+def keepPacket(packet):
+    data_raw, tArrive, known = packet
+    if isinstance(data_raw, np.ndarray):
+        data_raw = data_raw.copy()
+    return (data_raw, tArrive, known)
+
+# ----------------------------------------------------
+# one buffer as datagrams; lost: None, or (ns, samples) lost just before it
+
+def send(packer, pub, lost, packet, aqNs):
+    data_raw, tArrive, known = packet
+    if lost is not None:
+        known += lost[1]
+    packer.skip(known)                # receiver sees the hole in 'first', before this buffer
+    parts = packer.parts(data_raw, tArrive - aqNs)
+    for head, payload in parts:
+        pub.send([head, payload])     # straight from buffer memory; a failed send shows in seq
+    return len(parts)
+
+# ----------------------------------------------------
+
+def stream(adc1_ip, rate, samples, channels, dest, maxPackets=None):
+    session = ADCSession(adc1_ip, rate, samples, channels, stop=lambda: stopTx,
+                         kernelBuffers=kernelBuffers, zeroCopy=True)  # retries rx() on network errors
+    adc1 = session.open()
+    if (adc1 is None):
+        print("Error: unable to connect to ADC %s" % adc1_ip)
+        return
+    pub = UdpPublisher(dest)          # one receiver, a multicast group, or subscribers
+    packer = UdpPacker(rate, len(channels), FMT_INT32, scale=ADC_SCALE, mtu=mtu)
+    clock = ArrivalClock(rate)
+    aqNs = int(samples / rate * 1E9)
+    print("Sending %d sps, channels %s to %s, %d samples per datagram" %
+          (rate, ",".join(str(c) for c in channels), pub.mode, packer.maxSamples))
+
+    packets = 0
+    sent = 0
+    dispLines = 25  # how many buffers between status lines
+    while not stopTx and (maxPackets is None or packets < maxPackets):
+        data_raw = session.rx()       # view of the IIO buffer, valid until the next rx()
+        if data_raw is None:
+            break                     # control-C while reconnecting
+        tArrive = time.time_ns()
+        known = 0
+        if session.gap is not None:   # reconnected: samples lost meanwhile
+            known = session.gap[1]
+        # a late buffer waits until the clock knows whether buffers were lost before it
+        for lost, packet in clock.hold((data_raw, tArrive, known), tArrive, samples, known, keepPacket):
+            sent += send(packer, pub, lost, packet, aqNs)
+        packets += 1
+        if (packets % dispLines) == 0:
+            print("Time:%s buffers:%d datagrams:%d  %s  %s" % (datetime.now().strftime('%H:%M:%S'),
+                                                               packets, sent, clock.status(), pub.status()))
+    for lost, packet in clock.flush():   # still held when stopped
+        sent += send(packer, pub, lost, packet, aqNs)
+    print("Sent %d buffers in %d datagrams;  %s" % (packets, sent, clock.status()))
+    print(pub.status())
+    pub.close()
+    if session.reconnects > 0:
+        print("Reconnects: %d, lost %.3f s (%d samples)" %
+              (session.reconnects, session.lostNs / 1E9, session.lostSamples))
+
+if __name__ == "__main__":
+
+    print(version)
+    maxPackets = None
+    if "-n" in sys.argv:
+        i = sys.argv.index("-n")
+        maxPackets = int(sys.argv[i+1])
+        del sys.argv[i:i+2]
+    argc = len(sys.argv)
+    if (argc < 3):
+        print("Usage: %s <IP_address> <host:port> [<msec_aq>] [<sample_rate>] [<channels>] [-n <packets>]" % sys.argv[0])
+        print("  <IP_address> : domain name or IP address of host with ADC, or fake:... (simulated)")
+        print("  <host:port> : where to send the datagrams (receive with UDP-Rx-test.py);")
+        print("                a multicast group:port, or sub:port for receivers that register (-s)")
+        print("  -n : stop after this many ADC buffers")
+        print("Example:\n   %s analog.local 192.168.1.154:8000 200 1000 0,1\n" % sys.argv[0])
+        sys.exit()
+
+    adc1_ip = "ip:" + sys.argv[1]
+    if sys.argv[1].startswith("fake:"):
+        adc1_ip = sys.argv[1]       # simulated ADC (adciio.py)
+    if (argc > 3):
+        aqTime = int(sys.argv[3]) / 1000.0
+    if (argc > 4):
+        rate = int(sys.argv[4])
+    if (argc > 5):
+        channels = parseChannels(sys.argv[5])
+
+    signal.signal(signal.SIGINT, signal_handler)  # handle SIGINT from Control-C
+    stream(adc1_ip, rate, int(aqTime * rate), channels, sys.argv[2], maxPackets)
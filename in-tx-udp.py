@@ -6,62 +6,150 @@
 # example pipeline from local iio device:
 #   sudo iio_readdev -u local: -b 256 -s 25000 -T 0 ad7124-8 voltage0-voltage1 | ./read3 | ./in-tx-udp.py
 
+# Input: text lines of one or more numbers (comma or space separated, one
+# column per channel), as read3 or adi_bin2csv print them. The first line
+# of numbers sets the number of channels; any other line (a header, a
+# status message, a row with too few or too many columns) is skipped and
+# counted, never sent and never allowed to shift the columns. stdin is read
+# in large blocks as soon as anything is there, never line by line, and
+# never with a fixed sleep: the sender keeps up with whatever rate the
+# pipe delivers. Values are packed into binary datagrams (int32 counts of
+# 'step' input units, see adcudp.py). A datagram goes out as soon as it is
+# full, or when its oldest value has waited 'maxLatency' seconds, so a
+# slow stream still arrives promptly and a fast one in full datagrams.
+#
+# remote_host may be a multicast group (224.0.0.0 - 239.255.255.255), so
+# any number of receivers can join, or 'sub': receivers register on <port>
+# (UDP-Rx-test.py -s) and each gets its own copy, rate limited to what it
+# asked for. Either way each datagram is encoded once.
+#
+# Usage:
+#   in-tx-udp.py [-c] [<remote_host> | <group> | sub] [<port>] [<sample_rate>]
+#   -c : input is raw ADC codes (adi_bin2csv), sent unchanged with volts per code in the header
+
 import socket
-from threading import Thread
-from time import sleep
-import math     # for generating sine wave
+import select   # wait for stdin, with the latency deadline as timeout
+import os       # read stdin in blocks
+import time
 import sys
+import numpy as np   # text to numbers, a block at a time
+from adcudp import UdpPacker, UdpPublisher, FMT_INT32, ADC_SCALE   # binary datagram format, fan-out
 
 
 exit = False
 remote_host = "192.168.1.154" # JPB laptop
 portNum = 8000  # an arbitrary choice of port number
-packetSize = 20   # how many values to send at one time
-
-
-points = 300  # how many data points in one wave
-pi2 = 2 * 3.14159265358979323  #  2 * Pi
-off = 0.0;  # phase offset #1
-off2 = 0.0; # phase offset #2
-
-def newValue(i):
-        global off, off2
-
-        x = i * (pi2 / points)
-        off += 0.01;
-        off2 += 0.001;
-        y = math.sin(x) + 0.4 * math.sin((x+off)*3) + 0.2 * math.sin((x+off2)*2)
-        outs = "{:.6f}".format(y) + "\n"  # float to string
-        return outs       # return value as string
+rate = 1000     # samples per second of the input (for the datagram header and time stamps)
+maxLatency = 0.05  # seconds a value may wait for its datagram to fill
+readBytes = 65536  # most bytes taken from stdin at once
+inUnit = 1E-3      # volts per input unit: mV lines. Raw ADC codes (adi_bin2csv): adcudp.ADC_SCALE
+step = 1E-5        # input units per count sent: 5 decimals of mV. Raw ADC codes: 1
+mtu = 1500         # datagrams are sized to fit one frame
+
+# ----------------------------------------------------
+# complete lines in a block of text -> (values, leftover partial line, lines rejected)
+# only rows of exactly nChan numbers are kept; blank lines are ignored
+
+def parseLines(text, nChan):
+    end = text.rfind(b"\n") + 1
+    rows = [line.split() for line in text[:end].replace(b",", b" ").split(b"\n")]
+    good = [r for r in rows if len(r) == nChan]
+    rejected = sum(1 for r in rows if r) - len(good)
+    try:
+        vals = np.array(good, dtype=np.float64).ravel()   # the whole block at once
+    except ValueError:                # some row is not all numbers: sort them out one by one
+        vals = []
+        for r in good:
+            try:
+                vals.append(np.array(r, dtype=np.float64))
+            except ValueError:
+                rejected += 1
+        vals = np.concatenate(vals) if vals else np.empty(0)
+    return vals, text[end:], rejected
+
+# number of columns of the first complete line that is all numbers (0: none yet)
+def countColumns(text):
+    for line in text.replace(b",", b" ").split(b"\n")[:-1]:
+        fields = line.split()
+        if not fields:
+            continue
+        try:
+            np.array(fields, dtype=np.float64)
+        except ValueError:
+            continue                  # header or message: not data
+        return len(fields)
+    return 0
 
 def main(args):
-    global exit
+    global exit, remote_host, portNum, rate, inUnit, step
     print("UDP Tx test")
     print("Press Ctrl+C to exit")
     print("")
 
-    sleep(.1)
-
-    #Generate a transmit socket object
-    txSocket = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
-
-    #Do not block when looking for received data (see above note)
-    #txSocket.setblocking(0)
-
-    print("Transmitting to " + remote_host + ": " + str(portNum))
+    if "-c" in args:      # raw codes: one count per code
+        args.remove("-c")
+        inUnit = ADC_SCALE
+        step = 1
+
+    if len(args) > 0:
+        remote_host = args[0]
+    if len(args) > 1:
+        portNum = int(args[1])
+    if len(args) > 2:
+        rate = int(args[2])
+
+    pub = UdpPublisher("%s:%d" % (remote_host, portNum))   # one receiver, a group, or subscribers
+
+    fd = sys.stdin.fileno()
+    rest = b""                    # partial line carried to the next block
+    nChan = 0
+    while nChan == 0:             # the first line of numbers sets the number of channels
+        block = os.read(fd, readBytes)
+        if len(block) == 0:
+            return                # no numbers at all on stdin
+        rest += block
+        nChan = countColumns(rest)
+    packer = UdpPacker(rate, nChan, FMT_INT32, scale=step * inUnit, mtu=mtu)
+    vals, rest, rejected = parseLines(rest, nChan)   # header lines before the data are counted here
+    pending = [np.rint(vals / step).astype(np.int32)]   # counts, interleaved, not yet sent
+    nPending = len(vals)           # values in them
+    tOldest = time.monotonic()    # when the oldest pending value was read
+    sent = 0
+
+    print("Transmitting %d channel(s) to %s, up to %d samples per datagram, %.0f ms max latency" %
+          (nChan, pub.mode, packer.maxSamples, maxLatency * 1000))
     while True:
-    # for line in sys.stdin:  # get input from STDIN one line at a time
-
         try:
-            txString = ""
-            for j in range(packetSize):
-                line = sys.stdin.readline()  # one line, includes newline
-                txString += line
-
-            # Transmit string as bytes to the local server on the agreed-upon port
-            if (len(txString) > 0):
-                txSocket.sendto(txString.encode(),(remote_host,portNum))
-                # print(".",end='',flush=True)
+            timeout = None if tOldest is None else max(0.0, tOldest + maxLatency - time.monotonic())
+            ready, _, _ = select.select([fd], [], [], timeout)
+            eof = False
+            if ready:
+                block = os.read(fd, readBytes)   # whatever is there, up to readBytes
+                eof = (len(block) == 0)
+                vals, rest, bad = parseLines(rest + block + (b"\n" if eof else b""), nChan)
+                if bad and rejected == 0:
+                    print("Skipping lines that are not %d numbers" % nChan)
+                rejected += bad
+                if len(vals):
+                    pending.append(np.rint(vals / step).astype(np.int32))
+                    nPending += len(vals)
+                    if tOldest is None:
+                        tOldest = time.monotonic()
+
+            full = packer.maxSamples * nChan
+            late = tOldest is not None and time.monotonic() >= tOldest + maxLatency
+            if nPending and (nPending >= full or late or eof):
+                words = np.concatenate(pending)
+                n = len(words) if (late or eof) else (len(words) // full) * full
+                tStart = time.time_ns() - int(n // nChan * 1E9 / rate)
+                for gram in packer.pack(words[:n], tStart):
+                    pub.send(gram)
+                    sent += 1
+                pending = [words[n:]] if n < len(words) else []
+                nPending = len(words) - n
+                tOldest = time.monotonic() if nPending else None
+            if eof:
+                break
 
         except socket.error as msg:
             # If no data is received you end up here, but you can ignore
@@ -71,9 +159,11 @@ def main(args):
             exit = True
             print("Received Ctrl+C... initiating exit")
             break
-        sleep(.2)
 
+    print("Sent %d datagrams, %d samples per channel, %d lines rejected;  %s" %
+          (sent, packer.first, rejected, pub.status()))
+    pub.close()
     return
 
 if __name__=="__main__":
-    main(sys.argv[1:0])
+    main(sys.argv[1:])
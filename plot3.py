@@ -8,7 +8,8 @@ import adi
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import numpy as np
-from struct import unpack
+from adcdecode import decodeRaw
+from adchistory import History  # long-term log, flat memory and draw cost
 import sys
 import datetime
 import csv      # write data to CSV file
@@ -18,6 +19,7 @@ setDur = 2.0       # duration of 1 set in seconds
 rate = 1000        # readings per second
 samples = int(setDur * rate) # record this many points at one time
 R = 100            # decimation ratio: points averaged together before saving
+histPoints = 1000  # most points drawn on the lower graph, however long the run
 
 datfile = "tdat.csv"  # save ADC readings
 my_ip = "ip:analog.local" # local RPi with ADC
@@ -63,7 +65,7 @@ fig.set_size_inches(figW, figH)
 # ax = fig.add_subplot(111)
 lastMean = 0
 lastTime = datetime.datetime.now()
-dataLog = np.array([])  # log for sub-sampled data
+dataLog = History()  # log for sub-sampled data
 
 my_ad7124 = initADC(rate, samples)
 
@@ -86,8 +88,7 @@ with open(datfile, "a") as fout:  # append each batch of readings
     data_raw = my_ad7124.rx()
     frameNum += 1
 
-    fmt = "%dI" % samples
-    yr = np.array( list(unpack(fmt, data_raw)) )
+    yr = decodeRaw(data_raw, samples)
     y = calcTemp(yr)  # convert raw readings into Temp, deg.C
     totalDur = frameNum * setDur  # total seconds recorded so far
     
@@ -95,7 +96,7 @@ with open(datfile, "a") as fout:  # append each batch of readings
     yD = y.reshape(-1, R).mean(axis=1) # average each set of R values
     np.savetxt(fout, yD, fmt='%0.5f')  # save out readings to disk
     fout.flush()  # update file on disk
-    dataLog = np.append(dataLog, yD)  # save data in array
+    dataLog.append(yD)  # save data in array
         
     x = np.arange(1,len(y)+1)
     slope,offset = np.polyfit(x, y, 1)  # find best-fit line
@@ -153,8 +154,10 @@ with open(datfile, "a") as fout:  # append each batch of readings
     xpos4 = xmin + 0.5*xrange
     ypos4 = ymin + 0.03*yrange
 
-    x2 = np.arange(0,totalDur,totalDur/len(dataLog))
-    ax2.plot(x2, dataLog)   # plot of past data
+    x2, yMin, yMean, yMax = dataLog.view(histPoints)
+    x2 = x2 * setDur * R / samples  # point number to seconds
+    ax2.fill_between(x2, yMin, yMax, alpha=0.3, linewidth=0)  # min..max of each point
+    ax2.plot(x2, yMean)   # plot of past data
     ax2.set_xlabel("seconds", fontsize = 12)
     ax2.grid(color='gray', linestyle='dotted' )
     # print(frameNum, len(dataLog))
@@ -6,11 +6,12 @@
 
 import adi
 import numpy as np
-from struct import unpack
+from adcdecode import decodeRaw
 import sys
 import datetime      # time of day
 import queue         # transfer ADC data between threads
 import threading     # producer and consumer threads
+from adcacq import AcqThread  # acquisition thread state machine
 import time          # for time.sleep()
 import logging       # thread-safe log info
 
@@ -43,8 +44,7 @@ def initADC(rate, samples, adc1_ip):
 def processData(q, samples, fout):
     while True:
         i,data_raw = q.get()
-        fmt = "%dI" % samples
-        yr = np.array( list(unpack(fmt, data_raw)) )
+        yr = decodeRaw(data_raw, samples)
         print(i,yr)
         # yD = yr.reshape(-1, R).mean(axis=1) # average each set of R values        
         #np.savetxt(fout, yr, fmt='%+0.5f')  # save out readings to disk        
@@ -53,17 +53,11 @@ def processData(q, samples, fout):
         q.task_done()  # finished handling this queue item
 
 # ----------------------------------------------------    
-# put the ADC data on the queue
-
-def getData(q, eRun, eStop, adc1):
-    i = 0  # count of received data packets    
-    while (not eStop.is_set()):
-        while eRun.is_set():
-        #for i in range(20):
-            data_raw = adc1.rx()  # retrieve one buffer of data using Pyadi-iio  
-            q.put((i,data_raw))
-            i += 1
-    logging.debug('now finished getData')
+# put one ADC packet on the queue; called repeatedly by the acquisition thread
+
+def getData(q, adc1, acq):
+    data_raw = adc1.rx()  # retrieve one buffer of data using Pyadi-iio  
+    q.put((acq.packets,data_raw))  # packets: count of received data packets
     
 # ----------------------------------------------------    
 # --- Main Program starts here -----------------------
@@ -74,8 +68,6 @@ if __name__ == '__main__':
                     format='(%(threadName)-9s) %(message)s',)
                     
     q = queue.Queue()                   # create a queue object
-    eRun = threading.Event()            # event controls when data aq runs
-    eStop = threading.Event()           # event controls when data aq exits
     
     adc1 = initADC(rate, samples, adc1_ip)  # initialize ADC with configuration
 
@@ -93,8 +85,8 @@ if __name__ == '__main__':
     data_raw = adc1.rx()  # first buffer we just throw away (turn-on transient)
 
     # start thread that acquires the data
-    dataq_worker = threading.Thread(target=getData, args=(q,eRun,eStop,adc1,), daemon=True)
-    dataq_worker.start()
+    acq = AcqThread(lambda: getData(q, adc1, acq))  # sleeps, not spins, while paused
+    acq.start()
 
     # ----------------------------------------------------    
     # Producer and Consumer threads do all the work.
@@ -102,14 +94,16 @@ if __name__ == '__main__':
     
     for j in range(15):
         print("Starting up...")
-        eRun.set()   # start the data aq thread
+        acq.resume()  # start the data aq thread
         time.sleep(2)
-        eRun.clear() # stop the data aq thread
+        acq.pause()   # stop the data aq thread, waits for the current rx()
         print("Paused...")
+        acq.cpuPercent()     # start measuring CPU used while paused
         time.sleep(1)        # simulate some process being too busy
+        print("Acquisition thread CPU while paused: %.1f%%" % acq.cpuPercent())
 
-    eStop.set()          # tell data.aq thread to exit
-    dataq_worker.join()  # wait until data aquisition thread exits
+    acq.stop()           # tell data.aq thread to exit, wait until it does
+    logging.debug('now finished getData')
     q.join()             # then wait until item in queue is processed
 
     fout.close()         # close out data log file
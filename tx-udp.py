@@ -5,12 +5,18 @@
 
 # Older python2 version originally from
 # http://sfriederichs.github.io/how-to/python/udp/2017/12/07/UDP-Communication.html
+#
+# Usage:
+#   tx-udp.py [<remote_host> | <group> | sub] [<port>]
+#   a multicast group reaches every receiver that joined it; 'sub' sends to
+#   each receiver that registered on <port> (UDP-Rx-test.py -s)
 
 import socket
 from threading import Thread
 from time import sleep
 import math     # for generating sine wave
 import sys
+from adcudp import UdpPublisher   # one receiver, a multicast group, or subscribers
 
 exit = False
 remote_host = "192.168.1.154" # JPB laptop
@@ -34,21 +40,23 @@ def newValue(i):
         return outs       # return value as string
 
 def main(args):
-    global exit
+    global exit, remote_host, portNum
     print("UDP Tx test")
     print("Press Ctrl+C to exit")
     print("")
 
-    sleep(.1)
+    if len(args) > 0:
+        remote_host = args[0]
+    if len(args) > 1:
+        portNum = int(args[1])
 
-    #Generate a transmit socket object
-    txSocket = socket.socket(socket.AF_INET,socket.SOCK_DGRAM)
+    sleep(.1)
 
-    #Do not block when looking for received data (see above note)
-    txSocket.setblocking(0)
+    #Generate a transmit socket object (non-blocking), shared by all receivers
+    pub = UdpPublisher("%s:%d" % (remote_host, portNum))
 
     i = 0
-    print("Transmitting to " + remote_host + ": " + str(portNum))
+    print("Transmitting to " + pub.mode)
     while True:
         try:
 
@@ -60,7 +68,7 @@ def main(args):
                     i = 0
 
             #Transmit string as bytes to the local server on the agreed-upon port
-            txSocket.sendto(txString.encode(),(remote_host,portNum))
+            pub.send(txString.encode())
         except socket.error as msg:
             #If no data is received you end up here, but you can ignore
             #the error and continue
@@ -71,7 +79,8 @@ def main(args):
             break
         sleep(.2)
 
+    pub.close()
     return
 
 if __name__=="__main__":
-    main(sys.argv[1:0])
+    main(sys.argv[1:])